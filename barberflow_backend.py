@@ -1,9 +1,34 @@
 # -*- coding: utf-8 -*-
 import os
+import base64
+import csv
+import functools
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+import zipfile
+import click
 import psycopg2
 import psycopg2.extras 
-from flask import Flask, request, jsonify, render_template_string, session, redirect, url_for
-from datetime import datetime, date
+from flask import (Blueprint, Flask, Response, copy_current_request_context, current_app, g, has_request_context,
+                   request, jsonify, session)
+from datetime import datetime, date, timedelta, time as dt_time
+from contextlib import contextmanager
+from xml.sax.saxutils import escape as xml_escape
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+try:
+    import brotli  # Opcional (pip install Brotli): habilita a variante 'br' da página inicial
+except ImportError:
+    brotli = None
 
 # --- 1. CONFIGURAÇÃO E CONEXÃO COM POSTGRESQL ---
 # ATENÇÃO: Substitua estas variáveis pelas suas credenciais reais do PostgreSQL.
@@ -20,110 +45,1161 @@ FLASK_SECRET_KEY = 'e205e9ea1d4aaf49f7b810ef5666d7aaffad3a9f1c66dbe4763e03faffef
 ADMIN_KEY = 'barberflowadmin'
 FIXED_EXPENSES = 1500.00
 
+# Agenda: barbeiros atendendo, horário de funcionamento e granularidade dos horários oferecidos
+BARBERS = ['barber1', 'barber2']
+OPENING_TIME = '09:00'
+CLOSING_TIME = '19:00'
+SLOT_INTERVAL_MINUTES = 15
+DEFAULT_SERVICE_DURATION = 30      # usado quando o serviço do agendamento não existe mais
+AVAILABILITY_HORIZON_DAYS = 30     # até quantos dias à frente a busca de "próximos horários" olha
+
 def get_db_connection():
-    """Cria e retorna uma conexão com o banco de dados."""
+    """Cria e retorna uma conexão avulsa com o banco (usada em tarefas pontuais, fora do pool)."""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = open_connection(DB_CONFIG)
         return conn
     except Exception as e:
         print(f"Erro ao conectar ao PostgreSQL: {e}")
         return None
 
+# --- 1.1. MÉTRICAS (PROMETHEUS) ---
+# Expostas em GET /metrics. Sob o gunicorn (PROMETHEUS_MULTIPROC_DIR definido em gunicorn.conf.py)
+# cada worker grava os valores em arquivos nesse diretório e /metrics soma todos os processos.
+HTTP_REQUESTS = Counter('barberflow_http_requests_total', 'Requisições HTTP atendidas',
+                        ['method', 'route', 'status'])
+HTTP_REQUEST_SECONDS = Histogram('barberflow_http_request_duration_seconds', 'Duração das requisições HTTP',
+                                 ['method', 'route', 'status'])
+HTTP_IN_PROGRESS = Gauge('barberflow_http_requests_in_progress', 'Requisições HTTP em andamento',
+                         multiprocess_mode='livesum')
+DB_CONNECT_SECONDS = Histogram('barberflow_db_connect_duration_seconds', 'Tempo para abrir uma conexão com o PostgreSQL',
+                               buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+DB_CONNECT_ERRORS = Counter('barberflow_db_connect_errors_total', 'Falhas ao abrir uma conexão com o PostgreSQL')
+DB_QUERY_SECONDS = Histogram('barberflow_db_query_duration_seconds', 'Tempo de execução das consultas',
+                             ['route', 'operation'],
+                             buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+DB_ROWS_RETURNED = Histogram('barberflow_db_rows_returned', 'Linhas devolvidas por consulta',
+                             ['route', 'operation'], buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000))
+
+# Primeira palavra do SQL (ignorando comentários '--'): SELECT, INSERT, UPDATE, WITH, COPY...
+SQL_OPERATION_RE = re.compile(r'\s*(?:--[^\n]*\n\s*)*([A-Za-z]+)')
+
+def metrics_route():
+    """Rota da requisição atual (o padrão, ex.: /api/appointments/<int:appointment_id>), para os rótulos."""
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def sql_operation(query):
+    if isinstance(query, bytes):
+        query = query[:200].decode('utf-8', 'replace')
+    match = SQL_OPERATION_RE.match(query) if isinstance(query, str) else None
+    return match.group(1).upper() if match else 'OTHER'
+
+class InstrumentedCursorMixin:
+    """Mede cada execute/executemany/copy_expert (duração e linhas devolvidas)."""
+
+    def _observe(self, query, started):
+        elapsed = time.perf_counter() - started
+        route, operation = metrics_route(), sql_operation(query)
+        DB_QUERY_SECONDS.labels(route, operation).observe(elapsed)
+        # Cursores do lado do servidor (named) não sabem quantas linhas virão: rowcount = -1
+        if self.description is not None and self.rowcount >= 0:
+            DB_ROWS_RETURNED.labels(route, operation).observe(self.rowcount)
+        return elapsed
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        finally:
+            elapsed = self._observe(query, started)
+        # Só consultas que terminaram: uma que falhou não teria plano útil (e poderia nem ser válida)
+        if elapsed >= SLOW_QUERY_SECONDS > 0:
+            capture_slow_query(self, query, vars, elapsed)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._observe(query, started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._observe(sql, started)
+
+@functools.lru_cache(maxsize=None)
+def instrumented_cursor_class(cursor_class):
+    return type(f'Instrumented{cursor_class.__name__}', (InstrumentedCursorMixin, cursor_class), {})
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """Conexão cujos cursores (inclusive RealDictCursor e cursores nomeados) são instrumentados."""
+
+    def cursor(self, name=None, cursor_factory=None, **kwargs):
+        cursor_class = cursor_factory or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(name, cursor_factory=instrumented_cursor_class(cursor_class), **kwargs)
+
+def open_connection(connect_kwargs):
+    """Abre uma conexão instrumentada com o PostgreSQL, registrando o tempo de conexão."""
+    started = time.perf_counter()
+    try:
+        conn = psycopg2.connect(connection_factory=InstrumentedConnection, **connect_kwargs)
+    except psycopg2.Error:
+        DB_CONNECT_ERRORS.inc()
+        raise
+    DB_CONNECT_SECONDS.observe(time.perf_counter() - started)
+    return conn
+
+# --- 1.2. POOL DE CONEXÕES ---
+# As rotas não abrem mais uma conexão por requisição: pegam uma conexão do pool
+# com `db_connection()` e a devolvem ao final. Os limites são configuráveis por ambiente.
+POOL_CONFIG = {
+    'minconn': int(os.environ.get('PG_POOL_MIN', '1')),
+    'maxconn': int(os.environ.get('PG_POOL_MAX', '10')),
+    'timeout': float(os.environ.get('PG_POOL_TIMEOUT', '5')),           # segundos esperando uma conexão livre
+    'max_uses': int(os.environ.get('PG_POOL_MAX_USES', '1000')),        # reciclar após N checkouts
+    'max_age': float(os.environ.get('PG_POOL_MAX_AGE', '1800')),        # reciclar após N segundos de vida
+    'ping_after': float(os.environ.get('PG_POOL_PING_AFTER', '30')),    # testar com SELECT 1 se ociosa há N segundos
+}
+
+class DatabaseUnavailable(Exception):
+    """Não foi possível obter uma conexão com o PostgreSQL."""
+
+class PoolTimeout(DatabaseUnavailable):
+    """Nenhuma conexão livre no pool dentro do tempo limite."""
+
+class ConnectionPool:
+    """Pool de conexões PostgreSQL thread-safe, com health check e reciclagem."""
+
+    def __init__(self, connect_kwargs, minconn=1, maxconn=10, timeout=5.0,
+                 max_uses=1000, max_age=1800.0, ping_after=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError('Configuração de pool inválida: 0 <= min <= max e max >= 1.')
+        self.connect_kwargs = connect_kwargs
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []      # conexões livres (LIFO: a mais recente é reutilizada primeiro)
+        self._meta = {}      # id(conn) -> {'created', 'last_used', 'uses'}
+        self._size = 0       # conexões abertas (livres + em uso + sendo abertas)
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'wait_time_total': 0.0,
+        }
+
+        for _ in range(minconn):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append(conn)
+
+    def _connect(self):
+        try:
+            conn = open_connection(self.connect_kwargs)
+        except psycopg2.Error as e:
+            raise DatabaseUnavailable(str(e)) from e
+        now = time.monotonic()
+        self._meta[id(conn)] = {'created': now, 'last_used': now, 'uses': 0}
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._meta.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn):
+        """Descarta conexões fechadas e faz um SELECT 1 nas que ficaram ociosas por muito tempo."""
+        if conn.closed:
+            return False
+        meta = self._meta[id(conn)]
+        if time.monotonic() - meta['last_used'] < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1;')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Retira uma conexão do pool, aguardando até `timeout` segundos se estiver esgotado."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise DatabaseUnavailable('Pool de conexões encerrado.')
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    conn = None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'Nenhuma conexão livre após {self.timeout:.1f}s (máximo {self.maxconn}).')
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += time.monotonic() - start
+
+        # Abertura e health check acontecem fora do lock para não bloquear as outras threads.
+        try:
+            if conn is not None and not self._is_healthy(conn):
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        self._meta[id(conn)]['uses'] += 1
+        return conn
+
+    def putconn(self, conn):
+        """Devolve a conexão ao pool, desfazendo transações abertas e reciclando se necessário."""
+        meta = self._meta.get(id(conn))
+        discard = conn.closed or meta is None
+        if not discard and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        now = time.monotonic()
+        if not discard and (meta['uses'] >= self.max_uses or now - meta['created'] >= self.max_age):
+            discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+                self._stats['connections_recycled'] += 1
+            else:
+                meta['last_used'] = now
+                self._idle.append(conn)
+            self._cond.notify()
+
+        if discard or self._closed:
+            self._discard(conn)
+
+    def closeall(self):
+        """Fecha todas as conexões livres; as que estão em uso são fechadas ao serem devolvidas."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Retorna um retrato do estado do pool para monitoramento."""
+        with self._cond:
+            checkouts = self._stats['checkouts']
+            return {
+                'min': self.minconn,
+                'max': self.maxconn,
+                'size': self._size,
+                'idle': len(self._idle),
+                'inUse': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'timeouts': self._stats['timeouts'],
+                'connectionsCreated': self._stats['connections_created'],
+                'connectionsRecycled': self._stats['connections_recycled'],
+                'healthCheckFailures': self._stats['health_check_failures'],
+                'avgWaitMs': round(self._stats['wait_time_total'] / checkouts * 1000, 3) if checkouts else 0.0,
+            }
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Retorna o pool do processo atual, criando-o na primeira chamada (e de novo após um fork)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+                _pool_pid = pid
+    return _pool
+
+@contextmanager
+def db_connection():
+    """Empresta uma conexão do pool durante o bloco `with` e a devolve ao final (com rollback se necessário)."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+# --- 1.3. LOG DE CONSULTAS LENTAS ---
+# Consultas (execute) acima de SLOW_QUERY_MS entram, por amostragem, numa fila em memória. Uma thread
+# por processo roda o EXPLAIN numa conexão separada, fora da requisição, e grava em slow_query_log
+# (tabela limitada às SLOW_QUERY_LOG_MAX_ROWS linhas mais recentes). Só leituras simples são
+# reexecutadas (EXPLAIN ANALYZE, BUFFERS): SELECTs sem FOR UPDATE/SHARE e que só chamam funções sem
+# efeito colateral (nada de pg_advisory_lock, nextval...). O resto recebe só o plano estimado.
+# Textos dos parâmetros (nomes, telefones) não são gravados: viram <texto:N> no log.
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_MS', '200')) / 1000    # 0 desliga a captura
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', '0.2'))
+SLOW_QUERY_LOG_MAX_ROWS = int(os.environ.get('SLOW_QUERY_LOG_MAX_ROWS', '1000'))
+SLOW_QUERY_MAX_LIST_PARAMS = 20    # listas maiores (ex.: ids de uma ação em lote) são truncadas no log
+
+# Palavras-chave seguidas de "(" e funções que podem ser reexecutadas pelo EXPLAIN ANALYZE
+SLOW_QUERY_ANALYZE_CALLS = frozenset('''
+    select from where join on using and or not in exists any all values as over filter within
+    grouping sets rollup cube lateral materialized cast extract row array interval
+    numeric decimal varchar char timestamp time date
+    count sum min max avg coalesce nullif greatest least abs round floor ceil
+    lower upper length trim to_char to_date date_trunc date_part make_interval tsrange daterange
+    generate_series row_number rank dense_rank lag lead first_value last_value
+    json_build_object jsonb_build_object json_agg jsonb_agg array_agg string_agg
+'''.split())
+SQL_CALL_RE = re.compile(r'\b([A-Za-z_][A-Za-z_0-9]*)\s*\(')
+SQL_ROW_LOCK_RE = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+
+_slow_queries = queue.Queue(maxsize=100)   # cheia: a amostra é descartada
+_slow_query_local = threading.local()      # marca a thread de captura, cujas consultas não são capturadas
+_slow_query_pid = None
+_slow_query_lock = threading.Lock()
+
+def safe_to_analyze(template):
+    """EXPLAIN ANALYZE executa a consulta: só vale para SELECTs sem lock de linha e sem funções fora da lista."""
+    if sql_operation(template) != 'SELECT' or SQL_ROW_LOCK_RE.search(template):
+        return False
+    return all(name.lower() in SLOW_QUERY_ANALYZE_CALLS for name in SQL_CALL_RE.findall(template))
+
+def redact_param(value):
+    """Versão de um parâmetro que pode ir para o log: textos viram <texto:N> (exceto status e barbeiros)."""
+    if isinstance(value, str):
+        return value if value in BARBERS or value in APPOINTMENT_STATUSES else f'<texto:{len(value)}>'
+    if isinstance(value, (bytes, memoryview)):
+        return f'<bytes:{len(value)}>'
+    if isinstance(value, dict):
+        return {key: redact_param(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        redacted = [redact_param(item) for item in value[:SLOW_QUERY_MAX_LIST_PARAMS]]
+        if len(value) > SLOW_QUERY_MAX_LIST_PARAMS:
+            redacted.append(f'<+{len(value) - SLOW_QUERY_MAX_LIST_PARAMS} itens>')
+        return type(value)(redacted) if isinstance(value, tuple) else redacted
+    return value
+
+def _redacted_texts(value, redacted):
+    """Pares (texto original, substituto) para apagar os valores sensíveis do plano gravado."""
+    if isinstance(value, str):
+        # Textos muito curtos não identificam ninguém e apagariam pedaços do plano
+        return [(value, redacted)] if value != redacted and len(value) >= 3 else []
+    if isinstance(value, dict):
+        return [pair for key in value for pair in _redacted_texts(value[key], redacted[key])]
+    if isinstance(value, (list, tuple)):
+        return [pair for item, item_redacted in zip(value, redacted) for pair in _redacted_texts(item, item_redacted)]
+    return []
+
+def capture_slow_query(cur, query, vars, elapsed):
+    """Enfileira uma consulta lenta (SQL exato, parâmetros e duração) para EXPLAIN e registro."""
+    global _slow_query_pid
+    if getattr(_slow_query_local, 'capturing', False) or random.random() >= SLOW_QUERY_SAMPLE_RATE:
+        return
+    # DDL de migrações, SET, COPY etc. não interessam (nem teriam plano)
+    if sql_operation(query) not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+        return
+    template = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    params = redact_param(vars) if vars is not None else None
+    try:
+        logged_sql = cur.mogrify(query, params).decode('utf-8', 'replace')
+    except (psycopg2.Error, TypeError, ValueError, KeyError, IndexError):
+        logged_sql = template
+    entry = {
+        'route': metrics_route(),
+        'template': template,
+        # O SQL real só fica na fila em memória, para o EXPLAIN; no log vai a versão com os textos trocados
+        'sql': cur.query.decode('utf-8', 'replace') if cur.query else template,
+        'logged_sql': logged_sql,
+        'redacted_texts': _redacted_texts(vars, params) if vars is not None else [],
+        'analyze': safe_to_analyze(template),
+        'params': json.dumps(params, default=str) if params is not None else None,
+        'duration_ms': round(elapsed * 1000, 3),
+    }
+    try:
+        _slow_queries.put_nowait(entry)
+    except queue.Full:
+        return
+    if _slow_query_pid != os.getpid():
+        with _slow_query_lock:
+            if _slow_query_pid != os.getpid():
+                threading.Thread(target=_slow_query_writer, name='slow-query-log', daemon=True).start()
+                _slow_query_pid = os.getpid()
+
+def _slow_query_writer():
+    _slow_query_local.capturing = True
+    while True:
+        entry = _slow_queries.get()
+        try:
+            with db_connection() as conn:
+                record_slow_query(conn, entry)
+        except Exception as e:
+            print(f"Erro ao registrar consulta lenta: {e}")
+
+def record_slow_query(conn, entry):
+    """Roda o EXPLAIN da consulta (em transação desfeita em seguida) e grava o resultado em slow_query_log."""
+    analyze = entry['analyze']
+    options = 'ANALYZE, BUFFERS' if analyze else 'COSTS'
+    try:
+        with conn.cursor() as cur:
+            # Sem travar a aplicação: desiste se a consulta esbarrar em locks ou demorar demais
+            cur.execute("SET LOCAL lock_timeout = '1s'; SET LOCAL statement_timeout = '10s';")
+            cur.execute(f"EXPLAIN ({options}) {entry['sql']}")
+            plan = '\n'.join(row[0] for row in cur.fetchall())
+    except psycopg2.Error as e:
+        plan = f"EXPLAIN falhou: {e}"
+    conn.rollback()
+    # Literais do plano (ex.: Filter: client_name = '...') saem com os mesmos substitutos dos parâmetros
+    for text, redacted in entry['redacted_texts']:
+        plan = plan.replace(text, redacted)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO slow_query_log (route, query_hash, query_template, sql_text, params, duration_ms, plan, plan_analyzed)
+            VALUES (%s, md5(%s), %s, %s, %s, %s, %s, %s);
+        """, (entry['route'], entry['template'], entry['template'], entry['logged_sql'], entry['params'],
+              entry['duration_ms'], plan, analyze))
+        # Rotação: mantém só as linhas mais recentes
+        cur.execute("""
+            DELETE FROM slow_query_log
+            WHERE id <= (SELECT MAX(id) FROM slow_query_log) - %s;
+        """, (SLOW_QUERY_LOG_MAX_ROWS,))
+    conn.commit()
+
+# --- 1.4. MOTOR DE DISPONIBILIDADE ---
+# Os horários ocupados de um período são lidos em uma única consulta (índice em
+# appointment_date, barber_id) e os horários livres são calculados em memória.
+
+def _to_minutes(value):
+    """Converte 'HH:MM' em minutos desde a meia-noite."""
+    hours, minutes = str(value).strip().split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def _format_minutes(minutes):
+    """Converte minutos desde a meia-noite em 'HH:MM'."""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+def merge_intervals(intervals):
+    """Une intervalos [início, fim) sobrepostos ou encostados, retornando-os ordenados."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def compute_free_slots(busy, duration, day_start, day_end, step=SLOT_INTERVAL_MINUTES, not_before=None):
+    """Retorna os inícios (em minutos) em que um serviço de `duration` minutos cabe fora dos intervalos ocupados."""
+    def align(minute):
+        # Próximo horário da grade (day_start + k * step) a partir de `minute`
+        return day_start + max(0, -(-(minute - day_start) // step)) * step
+
+    merged = merge_intervals(busy)
+    slots = []
+    t = align(not_before) if not_before is not None else day_start
+    i = 0
+    while t + duration <= day_end:
+        while i < len(merged) and merged[i][1] <= t:
+            i += 1
+        if i < len(merged) and merged[i][0] < t + duration:
+            t = align(merged[i][1])
+            continue
+        slots.append(t)
+        t += step
+    return slots
+
+def load_busy_intervals(cur, start_date, end_date, barber_id=None):
+    """Lê os agendamentos não cancelados entre as datas e devolve {(barbeiro, data): [(início, fim), ...]}."""
+    query = """
+        SELECT a.barber_id, a.appointment_date, a.start_time, a.appointment_time,
+               COALESCE(a.duration_minutes, s.duration, %s) AS duration
+        FROM appointments a
+        LEFT JOIN services s ON s.name = a.service_name
+        WHERE a.appointment_date BETWEEN %s AND %s
+        AND a.status <> 'Cancelado'
+    """
+    params = [DEFAULT_SERVICE_DURATION, start_date, end_date]
+    if barber_id:
+        query += " AND a.barber_id = %s"
+        params.append(barber_id)
+    cur.execute(query + ";", params)
+
+    busy = {}
+    for barber, day, start_time, appt_time, duration in cur.fetchall():
+        if start_time is not None:
+            start = start_time.hour * 60 + start_time.minute
+        else:
+            try:
+                start = _to_minutes(appt_time)
+            except ValueError:
+                continue  # horário legado em formato inválido não bloqueia a agenda
+        busy.setdefault((barber, day), []).append((start, start + duration))
+    return busy
+
+def slot_is_taken(cur, barber_id, day, start_time, duration):
+    """Indica se [início, início + duração) cruza algum agendamento não cancelado do barbeiro (índice GiST)."""
+    cur.execute(f"""
+        SELECT 1 FROM appointments
+        WHERE barber_id = %s AND appointment_date = %s AND status <> 'Cancelado'
+        AND {APPOINTMENT_SLOT_SQL} && tsrange(%s + %s::time, %s + %s::time + make_interval(mins => %s), '[)')
+        LIMIT 1;
+    """, (barber_id, day, day, start_time, day, start_time, duration))
+    return cur.fetchone() is not None
+
+def lock_barber_day(cur, barber_id, day):
+    """Trava (advisory lock de transação) a agenda de um barbeiro em um dia até o commit/rollback."""
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s), %s);", (barber_id, day.toordinal()))
+
+def reactivation_conflicts(cur, ids):
+    """Ids cancelados que, voltando a um status ativo, cruzariam outro agendamento ativo (ou um do mesmo lote).
+
+    Trava as linhas e a agenda de cada barbeiro/dia envolvido (mesmo lock das reservas) até o commit.
+    """
+    cur.execute(f"""
+        SELECT id, barber_id, appointment_date, {APPOINTMENT_SLOT_SQL} AS slot
+        FROM appointments
+        WHERE id = ANY(%s) AND status = 'Cancelado'
+        ORDER BY id
+        FOR UPDATE;
+    """, (list(ids),))
+    candidates = cur.fetchall()
+    if not candidates:
+        return set()
+    # Locks sempre na mesma ordem: dois lotes concorrentes não se travam mutuamente
+    for barber_id, day in sorted({(row[1], row[2]) for row in candidates}):
+        lock_barber_day(cur, barber_id, day)
+
+    cur.execute(f"""
+        SELECT r.id
+        FROM appointments r
+        WHERE r.id = ANY(%s) AND r.status = 'Cancelado'
+        AND EXISTS (
+            SELECT 1 FROM appointments a
+            WHERE a.barber_id = r.barber_id AND a.appointment_date = r.appointment_date
+            AND a.id <> r.id AND a.status <> 'Cancelado'
+            AND tsrange(a.appointment_date + a.start_time,
+                        a.appointment_date + a.start_time + make_interval(mins => a.duration_minutes), '[)')
+             && tsrange(r.appointment_date + r.start_time,
+                        r.appointment_date + r.start_time + make_interval(mins => r.duration_minutes), '[)')
+        );
+    """, ([row[0] for row in candidates],))
+    conflicts = {row[0] for row in cur.fetchall()}
+
+    # Dentro do lote, o menor id fica com o horário
+    accepted = {}
+    for appointment_id, barber_id, day, slot in candidates:
+        if appointment_id in conflicts:
+            continue
+        taken = accepted.setdefault((barber_id, day), [])
+        if any(slot.lower < other.upper and other.lower < slot.upper for other in taken):
+            conflicts.add(appointment_id)
+        else:
+            taken.append(slot)
+    return conflicts
+
+def free_slots_for_day(busy_intervals, day, duration, now=None):
+    """Horários livres ('HH:MM') de um barbeiro em um dia, respeitando o expediente e o horário atual."""
+    now = now or datetime.now()
+    if day < now.date():
+        return []
+    not_before = now.hour * 60 + now.minute if day == now.date() else None
+    slots = compute_free_slots(busy_intervals, duration, _to_minutes(OPENING_TIME), _to_minutes(CLOSING_TIME),
+                               not_before=not_before)
+    return [_format_minutes(slot) for slot in slots]
+
+def invalid_slot_reason(day, start_time, duration, now=None):
+    """Motivo pelo qual o motor de disponibilidade nunca ofereceria este horário, ou None se ele é válido."""
+    now = now or datetime.now()
+    opening, closing = _to_minutes(OPENING_TIME), _to_minutes(CLOSING_TIME)
+    start = start_time.hour * 60 + start_time.minute
+    if start < opening or start + duration > closing:
+        return f'Horário fora do expediente ({OPENING_TIME} às {CLOSING_TIME}, considerando a duração do serviço).'
+    if (start - opening) % SLOT_INTERVAL_MINUTES:
+        return f'Horário fora da grade de {SLOT_INTERVAL_MINUTES} minutos a partir de {OPENING_TIME}.'
+    if datetime.combine(day, start_time) < now.replace(second=0, microsecond=0):
+        return 'Não é possível agendar em data ou horário passado.'
+    return None
+
+def find_next_free_slots(cur, duration, limit, barber_id=None, now=None):
+    """Próximos `limit` horários livres (de todos os barbeiros ou de um só) dentro do horizonte de busca."""
+    now = now or datetime.now()
+    first_day = now.date()
+    last_day = first_day + timedelta(days=AVAILABILITY_HORIZON_DAYS - 1)
+    busy = load_busy_intervals(cur, first_day, last_day, barber_id)
+    barbers = [barber_id] if barber_id else BARBERS
+
+    found = []
+    day = first_day
+    while day <= last_day and len(found) < limit:
+        day_slots = []
+        for barber in barbers:
+            for slot in free_slots_for_day(busy.get((barber, day), []), day, duration, now):
+                day_slots.append({'barberId': barber, 'date': day.strftime('%Y-%m-%d'), 'time': slot})
+        day_slots.sort(key=lambda s: (s['time'], s['barberId']))
+        found.extend(day_slots[:limit - len(found)])
+        day += timedelta(days=1)
+    return found
+
+# --- 1.5. ROLLUP DE RECEITA DIÁRIA ---
+# daily_revenue guarda, por dia/barbeiro/serviço, a receita e a quantidade de agendamentos
+# Concluídos, separadas em não arquivados (revenue/appointments, o que o dashboard mostra) e
+# arquivados (archived_revenue/archived_appointments); os relatórios somam as duas. Toda mudança
+# de status/arquivamento passa por update_appointments_tracked, que aplica a diferença no rollup
+# na mesma transação.
+REVENUE_STATUS = 'Concluído'
+
+def _revenue_delta(status, is_archived, price, sign):
+    """Contribuição de uma linha para (revenue, appointments, archived_revenue, archived_appointments)."""
+    if status != REVENUE_STATUS:
+        return (0, 0, 0, 0)
+    return (0, 0, sign * price, sign) if is_archived else (sign * price, sign, 0, 0)
+
+def apply_revenue_changes(cur, changes):
+    """Aplica em daily_revenue as diferenças de linhas de appointments que mudaram (estado antigo -> novo)."""
+    deltas = {}
+    for row in changes:
+        new = _revenue_delta(row['status'], row['is_archived'], row['service_price'], 1)
+        old = _revenue_delta(row['old_status'], row['old_is_archived'], row['service_price'], -1)
+        delta = tuple(a + b for a, b in zip(new, old))
+        if not any(delta):
+            continue
+        key = (row['appointment_date'], row['barber_id'], row['service_name'])
+        deltas[key] = tuple(a + b for a, b in zip(deltas.get(key, (0, 0, 0, 0)), delta))
+
+    if deltas:
+        # Chaves ordenadas: transações concorrentes travam as linhas do rollup sempre na mesma ordem
+        psycopg2.extras.execute_values(cur, """
+            INSERT INTO daily_revenue (revenue_date, barber_id, service_name, revenue, appointments,
+                                       archived_revenue, archived_appointments)
+            VALUES %s
+            ON CONFLICT (revenue_date, barber_id, service_name) DO UPDATE
+            SET revenue = daily_revenue.revenue + EXCLUDED.revenue,
+                appointments = daily_revenue.appointments + EXCLUDED.appointments,
+                archived_revenue = daily_revenue.archived_revenue + EXCLUDED.archived_revenue,
+                archived_appointments = daily_revenue.archived_appointments + EXCLUDED.archived_appointments;
+        """, [key + value for key, value in sorted(deltas.items())])
+
+def update_appointments_where(conn, set_sql, set_params, target_sql, target_params):
+    """UPDATE appointments SET <set_sql> nas linhas travadas por target_sql, mantendo o rollup.
+
+    target_sql é um SELECT id, status, is_archived ... FOR UPDATE [SKIP LOCKED] que escolhe e trava
+    as linhas; retorna as linhas alteradas (estado novo e antigo).
+    """
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(f"""
+            UPDATE appointments a
+            SET {set_sql}
+            FROM ({target_sql}) AS old
+            WHERE a.id = old.id
+            RETURNING a.id, a.appointment_date, a.barber_id, a.service_name, a.service_price,
+                      old.status AS old_status, old.is_archived AS old_is_archived, a.status, a.is_archived;
+        """, [*set_params, *target_params])
+        changed = cur.fetchall()
+        apply_revenue_changes(cur, changed)
+    return changed
+
+def update_appointments_tracked(conn, set_sql, set_params, ids):
+    """Executa UPDATE appointments SET <set_sql> nos ids dados e mantém o rollup; retorna as linhas alteradas."""
+    return update_appointments_where(
+        conn, set_sql, set_params,
+        "SELECT id, status, is_archived FROM appointments WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+        [list(ids)])
+
+def rebuild_daily_revenue(conn):
+    """Recalcula daily_revenue inteiro a partir de appointments (não faz commit); retorna o número de linhas."""
+    with conn.cursor() as cur:
+        # O lock segura as atualizações incrementais até o commit, para nenhuma diferença se perder
+        cur.execute("LOCK TABLE daily_revenue IN EXCLUSIVE MODE;")
+        cur.execute("DELETE FROM daily_revenue;")
+        cur.execute("""
+            INSERT INTO daily_revenue (revenue_date, barber_id, service_name, revenue, appointments,
+                                       archived_revenue, archived_appointments)
+            SELECT appointment_date, barber_id, service_name,
+                   COALESCE(SUM(service_price) FILTER (WHERE NOT is_archived), 0),
+                   COUNT(*) FILTER (WHERE NOT is_archived),
+                   COALESCE(SUM(service_price) FILTER (WHERE is_archived), 0),
+                   COUNT(*) FILTER (WHERE is_archived)
+            FROM appointments
+            WHERE status = %s
+            GROUP BY appointment_date, barber_id, service_name;
+        """, (REVENUE_STATUS,))
+        return cur.rowcount
+
+def load_daily_revenue_v9(conn):
+    """Migração 9 como foi publicada (só Concluídos não arquivados, sem as colunas da migração 15).
+
+    rebuild_daily_revenue usa as colunas de arquivados e só pode rodar depois da migração 15;
+    a migração 16 recalcula o rollup com o critério atual.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO daily_revenue (revenue_date, barber_id, service_name, revenue, appointments)
+            SELECT appointment_date, barber_id, service_name, SUM(service_price), COUNT(*)
+            FROM appointments
+            WHERE status = %s AND is_archived = FALSE
+            GROUP BY appointment_date, barber_id, service_name;
+        """, (REVENUE_STATUS,))
+
+# --- 1.6. PARTICIONAMENTO MENSAL DE APPOINTMENTS ---
+# appointments é particionada por RANGE (appointment_date), uma partição por mês
+# (appointments_AAAA_MM) e uma DEFAULT para datas sem partição. Consultas com filtro de data
+# só tocam as partições do período, e as listas ordenadas por data usam Append ordenado.
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', '3'))
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def _partition_name(month_start):
+    return f"appointments_{month_start:%Y_%m}"
+
+def create_appointment_partitions(conn, first_month, last_month):
+    """Cria as partições mensais que faltam entre first_month e last_month (não faz commit)."""
+    months, month = [], first_month.replace(day=1)
+    while month <= last_month:
+        months.append(month)
+        month = _add_months(month, 1)
+    return create_partitions_for_months(conn, months)
+
+def create_partitions_for_months(conn, months):
+    """Cria as partições que faltam para os meses dados (não faz commit).
+
+    Linhas desses meses que já estejam na partição DEFAULT são movidas para a partição nova.
+    Retorna os nomes das partições criadas.
+    """
+    created = []
+    with conn.cursor() as cur:
+        # Serializa criações concorrentes (vários workers subindo ao mesmo tempo)
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('barberflow.partitions'));")
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'appointments'::regclass;
+        """)
+        existing = {row[0] for row in cur.fetchall()}
+
+        for month in sorted({month.replace(day=1) for month in months}):
+            name = _partition_name(month)
+            next_month = _add_months(month, 1)
+            if name not in existing:
+                cur.execute(f"CREATE TABLE {name} (LIKE appointments INCLUDING DEFAULTS INCLUDING CONSTRAINTS);")
+                cur.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM appointments_default
+                        WHERE appointment_date >= %s AND appointment_date < %s
+                        RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved;
+                """, (month, next_month))
+                cur.execute(f"ALTER TABLE appointments ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s);",
+                            (month, next_month))
+                created.append(name)
+    return created
+
+def ensure_appointment_partitions(conn, months_ahead=None):
+    """Garante as partições do mês atual e dos próximos PARTITION_MONTHS_AHEAD meses (não faz commit)."""
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    this_month = date.today().replace(day=1)
+    return create_appointment_partitions(conn, this_month, _add_months(this_month, months_ahead))
+
+def partition_appointments(conn):
+    """Converte appointments em tabela particionada por mês, copiando os dados e recriando os índices."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = 'appointments'::regclass;")
+        if cur.fetchone()[0] == 'p':
+            return
+        cur.execute("LOCK TABLE appointments IN ACCESS EXCLUSIVE MODE;")
+        # Os índices das migrações anteriores são recriados iguais na tabela particionada
+        cur.execute("""
+            SELECT pg_get_indexdef(indexrelid) FROM pg_index
+            WHERE indrelid = 'appointments'::regclass AND NOT indisprimary ORDER BY indexrelid;
+        """)
+        index_definitions = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT DISTINCT date_trunc('month', appointment_date)::date FROM appointments;")
+        months = {row[0] for row in cur.fetchall()}
+        this_month = date.today().replace(day=1)
+        months.update(_add_months(this_month, n) for n in range(PARTITION_MONTHS_AHEAD + 1))
+
+        cur.execute("""
+            CREATE TABLE appointments_partitioned (LIKE appointments INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (appointment_date);
+        """)
+        cur.execute("CREATE TABLE appointments_default PARTITION OF appointments_partitioned DEFAULT;")
+        for month in sorted(months):
+            cur.execute(f"CREATE TABLE {_partition_name(month)} PARTITION OF appointments_partitioned "
+                        f"FOR VALUES FROM (%s) TO (%s);", (month, _add_months(month, 1)))
+        cur.execute("INSERT INTO appointments_partitioned SELECT * FROM appointments;")
+
+        cur.execute("ALTER SEQUENCE appointments_id_seq OWNED BY NONE;")
+        cur.execute("DROP TABLE appointments;")
+        cur.execute("ALTER TABLE appointments_partitioned RENAME TO appointments;")
+        cur.execute("ALTER SEQUENCE appointments_id_seq OWNED BY appointments.id;")
+        # A chave primária de uma tabela particionada precisa incluir a chave de partição
+        cur.execute("ALTER TABLE appointments ADD PRIMARY KEY (id, appointment_date);")
+        for definition in index_definitions:
+            cur.execute(definition)
+        cur.execute("ANALYZE appointments;")
+
+# --- 1.7. MIGRAÇÕES DE ESQUEMA ---
+# Intervalo ocupado por um agendamento. A mesma expressão é usada no índice GiST e nas consultas.
+APPOINTMENT_SLOT_SQL = ("tsrange(appointment_date + start_time, "
+                        "appointment_date + start_time + make_interval(mins => duration_minutes), '[)')")
+BACKFILL_BATCH_SIZE = 5000
+
+# Colunas das listas de agendamentos; os horários saem das colunas tipadas como 'HH:MM'
+APPOINTMENT_LIST_COLUMNS = """
+    id, barber_id, service_name, appointment_date,
+    COALESCE(to_char(start_time, 'HH24:MI'), appointment_time) AS appointment_time,
+    to_char(start_time + make_interval(mins => duration_minutes), 'HH24:MI') AS end_time,
+    client_name, service_price, status
+"""
+
+def backfill_appointment_times(conn, batch_size=BACKFILL_BATCH_SIZE):
+    """Converte appointment_time (texto) em start_time/duration_minutes em lotes, com um commit por lote.
+
+    Lotes curtos não indicam o fim: linhas travadas por requisições em andamento são puladas. Quando os
+    lotes com SKIP LOCKED se esgotam, os que sobraram são esperados (sem SKIP LOCKED) e, se mesmo assim
+    restar alguma pendente, a migração falha em vez de ser registrada.
+    """
+    pending_sql = """
+        SELECT id FROM appointments
+        WHERE start_time IS NULL
+        AND appointment_time ~ '^ *([01]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])? *$'
+    """
+    total = 0
+    skip_locked = True
+    while True:
+        # SKIP LOCKED + lotes pequenos: nenhuma linha fica travada por mais que um lote
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE appointments a
+                SET start_time = CAST(trim(a.appointment_time) AS TIME),
+                    duration_minutes = COALESCE((SELECT s.duration FROM services s WHERE s.name = a.service_name), %s)
+                WHERE a.id IN ({pending_sql} LIMIT %s FOR UPDATE {'SKIP LOCKED' if skip_locked else ''});
+            """, (DEFAULT_SERVICE_DURATION, batch_size))
+            updated = cur.rowcount
+        conn.commit()
+        total += updated
+        if updated == 0:
+            if not skip_locked:
+                break
+            skip_locked = False
+
+    with conn.cursor() as cur:
+        cur.execute(f"{pending_sql} LIMIT 1;")
+        if cur.fetchone() is not None:
+            raise RuntimeError('Backfill de horários incompleto: ainda há agendamentos sem start_time.')
+    if total:
+        print(f"Backfill de horários: {total} agendamentos convertidos.")
+    return total
+
+# Cada migração é aplicada uma única vez, em ordem crescente, e registrada em schema_version.
+# Migrações já publicadas não devem ser alteradas: mudanças novas entram no final da lista.
+MIGRATIONS = [
+    (1, 'Tabelas services, appointments e monthly_expenses', """
+        CREATE TABLE IF NOT EXISTS services (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL UNIQUE,
+            price NUMERIC(10, 2) NOT NULL,
+            duration INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS appointments (
+            id SERIAL PRIMARY KEY,
+            barber_id VARCHAR(50) NOT NULL,
+            service_name VARCHAR(100) NOT NULL,
+            appointment_date DATE NOT NULL,
+            appointment_time VARCHAR(10) NOT NULL,
+            client_name VARCHAR(100) NOT NULL,
+            client_phone VARCHAR(20),
+            client_email VARCHAR(100),
+            service_price NUMERIC(10, 2) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'Agendado',
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS monthly_expenses (
+            id SERIAL PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            amount NUMERIC(10, 2) NOT NULL,
+            expense_date DATE NOT NULL DEFAULT CURRENT_DATE
+        );
+    """),
+    (2, 'Coluna is_archived em appointments', """
+        ALTER TABLE appointments ADD COLUMN IF NOT EXISTS is_archived BOOLEAN NOT NULL DEFAULT FALSE;
+    """),
+    (3, 'Índices das listas de agendamentos, do dashboard e da disponibilidade', """
+        -- Lista de ativos: WHERE is_archived = FALSE ORDER BY appointment_date, appointment_time
+        CREATE INDEX IF NOT EXISTS idx_appointments_active_schedule
+            ON appointments (appointment_date, appointment_time) WHERE is_archived = FALSE;
+
+        -- Lista de arquivados: WHERE is_archived = TRUE ORDER BY appointment_date DESC, appointment_time DESC
+        CREATE INDEX IF NOT EXISTS idx_appointments_archived_schedule
+            ON appointments (appointment_date DESC, appointment_time DESC) WHERE is_archived = TRUE;
+
+        -- Dashboard: status = 'Concluído' AND is_archived = FALSE AND appointment_date >= início do mês
+        CREATE INDEX IF NOT EXISTS idx_appointments_completed_by_date
+            ON appointments (appointment_date) INCLUDE (service_price)
+            WHERE status = 'Concluído' AND is_archived = FALSE;
+
+        -- Disponibilidade: agendamentos de um dia (e de um barbeiro)
+        CREATE INDEX IF NOT EXISTS idx_appointments_date_barber ON appointments (appointment_date, barber_id);
+    """),
+    (4, 'Colunas tipadas start_time (TIME) e duration_minutes em appointments', """
+        -- Colunas anuláveis e sem DEFAULT: o ALTER não reescreve a tabela
+        ALTER TABLE appointments ADD COLUMN IF NOT EXISTS start_time TIME;
+        ALTER TABLE appointments ADD COLUMN IF NOT EXISTS duration_minutes INTEGER;
+    """),
+    (5, 'Backfill em lotes de start_time/duration_minutes', backfill_appointment_times),
+    (6, 'Índices sobre as colunas tipadas e índice GiST do intervalo do agendamento', f"""
+        CREATE INDEX IF NOT EXISTS idx_appointments_active_start
+            ON appointments (appointment_date, start_time) WHERE is_archived = FALSE;
+        CREATE INDEX IF NOT EXISTS idx_appointments_archived_start
+            ON appointments (appointment_date DESC, start_time DESC) WHERE is_archived = TRUE;
+        DROP INDEX IF EXISTS idx_appointments_active_schedule;
+        DROP INDEX IF EXISTS idx_appointments_archived_schedule;
+
+        -- Checagem de sobreposição (operador &&) na reserva
+        CREATE INDEX IF NOT EXISTS idx_appointments_slot
+            ON appointments USING gist (({APPOINTMENT_SLOT_SQL})) WHERE status <> 'Cancelado';
+    """),
+    (7, 'Índices das listas com a chave completa da paginação (data, horário, id)', """
+        CREATE INDEX IF NOT EXISTS idx_appointments_active_page
+            ON appointments (appointment_date, (COALESCE(start_time, TIME '00:00')), id) WHERE is_archived = FALSE;
+        CREATE INDEX IF NOT EXISTS idx_appointments_archived_page
+            ON appointments (appointment_date DESC, (COALESCE(start_time, TIME '00:00')) DESC, id DESC) WHERE is_archived = TRUE;
+        DROP INDEX IF EXISTS idx_appointments_active_start;
+        DROP INDEX IF EXISTS idx_appointments_archived_start;
+    """),
+    (8, 'Tabela de rollup daily_revenue (receita por dia, barbeiro e serviço)', """
+        CREATE TABLE IF NOT EXISTS daily_revenue (
+            revenue_date DATE NOT NULL,
+            barber_id VARCHAR(50) NOT NULL,
+            service_name VARCHAR(100) NOT NULL,
+            revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            appointments INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (revenue_date, barber_id, service_name)
+        );
+    """),
+    (9, 'Carga inicial de daily_revenue', load_daily_revenue_v9),
+    (10, 'Tabela cache_versions (invalidação de cache entre workers)', """
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name VARCHAR(50) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO cache_versions (name) VALUES ('services'), ('dashboard') ON CONFLICT (name) DO NOTHING;
+    """),
+    (11, 'Índice de monthly_expenses por data (consultas por período)', """
+        CREATE INDEX IF NOT EXISTS idx_monthly_expenses_date
+            ON monthly_expenses (expense_date) INCLUDE (amount);
+    """),
+    (12, 'Particionamento mensal de appointments por appointment_date', partition_appointments),
+    (13, 'Tabela slow_query_log (consultas lentas com plano de execução)', """
+        CREATE TABLE IF NOT EXISTS slow_query_log (
+            id BIGSERIAL PRIMARY KEY,
+            captured_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            route VARCHAR(200) NOT NULL,
+            query_hash CHAR(32) NOT NULL,
+            query_template TEXT NOT NULL,
+            sql_text TEXT NOT NULL,
+            params JSONB,
+            duration_ms NUMERIC(12, 3) NOT NULL,
+            plan TEXT NOT NULL,
+            plan_analyzed BOOLEAN NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_slow_query_log_hash ON slow_query_log (query_hash);
+    """),
+    (14, 'Remove idx_appointments_completed_by_date (o dashboard lê de daily_revenue)', """
+        -- Sem consultas que o usem desde o rollup; só custava escrita em cada conclusão
+        DROP INDEX IF EXISTS idx_appointments_completed_by_date;
+    """),
+    (15, 'Colunas de concluídos arquivados em daily_revenue (relatórios)', """
+        ALTER TABLE daily_revenue
+            ADD COLUMN IF NOT EXISTS archived_revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS archived_appointments INTEGER NOT NULL DEFAULT 0;
+    """),
+    (16, 'Recarga de daily_revenue com os concluídos arquivados', rebuild_daily_revenue),
+]
+
+def run_migrations(conn):
+    """Aplica, somente para frente, as migrações ainda não registradas em schema_version."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+        current_version = cur.fetchone()[0]
+    conn.commit()
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current_version:
+            continue
+        if callable(step):
+            # Migrações em Python controlam as próprias transações (ex.: backfill em lotes)
+            step(conn)
+            conn.commit()
+        with conn.cursor() as cur:
+            # Migrações SQL rodam na mesma transação que o seu registro
+            if not callable(step):
+                cur.execute(step)
+            cur.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s);", (version, description))
+        conn.commit()
+        print(f"Migração {version} aplicada: {description}")
+        applied.append(version)
+    return applied
+
 def initialize_db():
-    """Cria as tabelas Services, Appointments, Monthly_Expenses e garante a coluna 'is_archived'."""
+    """Aplica as migrações pendentes e insere os dados mock se as tabelas estiverem vazias.
+
+    Roda de forma explícita ('flask init-db', no deploy), nunca na importação do módulo. Um advisory
+    lock de sessão serializa execuções concorrentes (várias réplicas subindo ao mesmo tempo): a
+    segunda espera a primeira terminar e encontra as migrações já aplicadas. Retorna True se concluiu.
+    """
     conn = get_db_connection()
     if conn is None:
-        return
+        return False
 
     try:
         with conn.cursor() as cur:
-            # Tabela de Serviços
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS services (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(100) NOT NULL UNIQUE,
-                    price NUMERIC(10, 2) NOT NULL,
-                    duration INTEGER NOT NULL
-                );
-            """)
-
-            # Tabela de Agendamentos (Adicionando a coluna is_archived no SQL base para garantir)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS appointments (
-                    id SERIAL PRIMARY KEY,
-                    barber_id VARCHAR(50) NOT NULL,
-                    service_name VARCHAR(100) NOT NULL,
-                    appointment_date DATE NOT NULL,
-                    appointment_time VARCHAR(10) NOT NULL,
-                    client_name VARCHAR(100) NOT NULL,
-                    client_phone VARCHAR(20),
-                    client_email VARCHAR(100),
-                    service_price NUMERIC(10, 2) NOT NULL,
-                    status VARCHAR(20) NOT NULL DEFAULT 'Agendado',
-                    is_archived BOOLEAN NOT NULL DEFAULT FALSE, -- NOVA COLUNA
-                    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            # Tenta adicionar a coluna is_archived se não existir
-            try:
-                cur.execute("ALTER TABLE appointments ADD COLUMN is_archived BOOLEAN NOT NULL DEFAULT FALSE;")
-                print("Coluna 'is_archived' adicionada à tabela appointments (se não existisse).")
-            except psycopg2.errors.DuplicateColumn:
-                pass # Coluna já existe, ignora o erro
-
-            # Tabela de Despesas Mensais
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS monthly_expenses (
-                    id SERIAL PRIMARY KEY,
-                    description VARCHAR(255) NOT NULL,
-                    amount NUMERIC(10, 2) NOT NULL,
-                    expense_date DATE NOT NULL DEFAULT CURRENT_DATE
-                );
-            """)
+            cur.execute("SELECT pg_advisory_lock(hashtext('barberflow.init_db'));")
+        conn.commit()
+        run_migrations(conn)
+        created = ensure_appointment_partitions(conn)
+        conn.commit()
+        if created:
+            print(f"Partições criadas: {', '.join(created)}")
 
+        with conn.cursor() as cur:
             # Adicionar serviços mock se a tabela estiver vazia
-            cur.execute("SELECT COUNT(*) FROM services;")
-            if cur.fetchone()[0] == 0:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM services);")
+            if not cur.fetchone()[0]:
                 cur.execute("INSERT INTO services (name, price, duration) VALUES ('Corte Simples', 35.00, 45);")
                 cur.execute("INSERT INTO services (name, price, duration) VALUES ('Design de Barba', 25.00, 30);")
                 cur.execute("INSERT INTO services (name, price, duration) VALUES ('Corte + Barba', 55.00, 75);")
                 print("Serviços mock inseridos.")
 
             # Adicionar despesas mock se a tabela estiver vazia
-            cur.execute("SELECT COUNT(*) FROM monthly_expenses;")
-            if cur.fetchone()[0] == 0:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM monthly_expenses);")
+            if not cur.fetchone()[0]:
                 cur.execute("INSERT INTO monthly_expenses (description, amount) VALUES ('Aluguel (Mock)', 1200.00);")
                 cur.execute("INSERT INTO monthly_expenses (description, amount) VALUES ('Energia (Mock)', 200.00);")
                 print("Despesas mock inseridas.")
 
         conn.commit()
+        return True
     except Exception as e:
         print(f"Erro ao inicializar o banco de dados: {e}")
         conn.rollback()
+        return False
     finally:
+        # Fechar a conexão também libera o advisory lock
         conn.close()
 
-# Inicializa o banco de dados assim que o script é executado
-initialize_db()
-
 # --- 2. APLICAÇÃO FLASK E ROTAS API ---
 
-app = Flask(__name__)
-app.secret_key = FLASK_SECRET_KEY
+# As rotas, hooks e comandos ficam no blueprint; create_app() (no fim do arquivo) monta a aplicação.
+# cli_group=None registra os comandos direto em 'flask <comando>'.
+bp = Blueprint('barberflow', __name__, cli_group=None)
 
 def get_role():
     """Obtém a função do usuário da sessão Flask."""
     return session.get('role', 'none')
 
+@bp.before_app_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_in_progress = True
+    HTTP_IN_PROGRESS.inc()
+
+@bp.after_app_request
+def record_request_metrics(response):
+    """Registra contagem e latência da requisição por método, rota e status (inclusive erros 500)."""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        labels = (request.method, metrics_route(), str(response.status_code))
+        HTTP_REQUESTS.labels(*labels).inc()
+        HTTP_REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+    return response
+
+@bp.teardown_app_request
+def finish_request_metrics(exc):
+    # O teardown roda sempre, mesmo quando um after_request falha: o gauge nunca fica "preso"
+    if g.pop('metrics_in_progress', False):
+        HTTP_IN_PROGRESS.dec()
+
+@bp.after_app_request
+def cache_fingerprinted_assets(response):
+    """Arquivos de static/dist têm hash no nome e nunca mudam: cache de 1 ano, imutável."""
+    if request.path.startswith('/static/dist/') and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
 # --- Rotas de Autenticação e Configuração (Mantidas) ---
 
-@app.route('/', methods=['GET'])
+@bp.route('/', methods=['GET'])
 def index():
-    """Serve o arquivo HTML com o frontend."""
-    return render_template_string(HTML_TEMPLATE)
-
-@app.route('/api/login', methods=['POST'])
+    """Serve o arquivo HTML com o frontend (pré-renderizado e pré-comprimido uma vez por processo)."""
+    page = get_index_page()
+    encoding = page.choose_encoding(request.accept_encodings)
+    resp = Response(page.variants[encoding], mimetype='text/html')
+    if encoding != 'identity':
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.headers['Cache-Control'] = 'no-cache'
+    # ETag forte por variante: corpos com Content-Encoding diferente não podem compartilhar o validador
+    resp.set_etag(f"{page.etag}-{encoding}")
+    return resp.make_conditional(request)
+
+@bp.route('/api/login', methods=['POST'])
 def login():
     """Simula o login de cliente/admin."""
     data = request.get_json()
@@ -140,29 +1216,93 @@ def login():
     session['role'] = 'none'
     return jsonify({'message': 'Chave de acesso incorreta ou função inválida'}), 401
 
-@app.route('/api/logout', methods=['POST'])
+@bp.route('/api/logout', methods=['POST'])
 def logout():
     """Faz o logout do usuário."""
     session.pop('role', None)
     return jsonify({'message': 'Logout bem-sucedido'}), 200
 
+# --- CACHE DE RESPOSTAS (COMPARTILHADO ENTRE WORKERS) ---
+# Cada processo guarda o corpo JSON já serializado e o ETag. A validade vem de cache_versions:
+# as rotas de escrita incrementam a versão na mesma transação da alteração e invalidam o cache
+# local após o commit; os outros workers percebem a nova versão na próxima checagem (no máximo a
+# cada CACHE_VERSION_TTL segundos, uma leitura por chave primária).
+CACHE_VERSION_TTL = float(os.environ.get('CACHE_VERSION_TTL', '2'))
+
+def bump_cache_version(conn, name):
+    """Incrementa a versão de um cache na transação corrente (o commit fica com quem chamou)."""
+    with conn.cursor() as cur:
+        cur.execute("UPDATE cache_versions SET version = version + 1 WHERE name = %s;", (name,))
+
+class VersionedCache:
+    """Cache em processo de respostas JSON (corpo + ETag) validado por cache_versions."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        """Descarta as entradas deste processo e força a releitura da versão."""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def get(self, key, compute):
+        """Retorna (corpo, etag) de `key`; se a versão mudou, recalcula com compute(cur)."""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < CACHE_VERSION_TTL:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return entry
+
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("SELECT version FROM cache_versions WHERE name = %s;", (self.name,))
+            row = cur.fetchone()
+            version = row['version'] if row else 0
+            with self._lock:
+                if version != self._version:
+                    self._entries.clear()
+                    self._version = version
+                self._checked_at = time.monotonic()
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+
+            body = current_app.json.dumps(compute(cur)).encode('utf-8')
+            entry = (body, hashlib.sha256(body).hexdigest()[:32])
+
+        with self._lock:
+            # Se a versão foi invalidada durante o cálculo, o resultado é servido mas não guardado
+            if self._version == version:
+                self._entries[key] = entry
+        return entry
+
+def _json_response_with_etag(body, etag, cache_control):
+    """Monta a resposta JSON com ETag forte e responde 304 se o If-None-Match do cliente bater."""
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = cache_control
+    return resp.make_conditional(request)
+
+services_cache = VersionedCache('services')
+dashboard_cache = VersionedCache('dashboard')
+
 # --- Rotas de Serviços (Mantidas) ---
 
-@app.route('/api/services', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@bp.route('/api/services', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def manage_services():
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
-
     role = get_role()
     
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            if request.method == 'GET':
-                cur.execute("SELECT id, name, price, duration FROM services ORDER BY name;")
-                services = cur.fetchall()
-                return jsonify(services)
+        if request.method == 'GET':
+            # Catálogo servido do cache; o navegador revalida com If-None-Match e recebe 304
+            body, etag = services_cache.get('catalog', _load_services)
+            return _json_response_with_etag(body, etag, 'public, no-cache')
 
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             if role != 'admin':
                 return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem gerenciar serviços.'}), 403
 
@@ -178,14 +1318,18 @@ def manage_services():
                     # Edição (PUT lógico)
                     cur.execute("UPDATE services SET name = %s, price = %s, duration = %s WHERE id = %s RETURNING id;",
                                 (name, price, duration, service_id))
+                    bump_cache_version(conn, 'services')
                     conn.commit()
+                    services_cache.invalidate()
                     return jsonify({'message': f'Serviço ID {service_id} atualizado com sucesso.'})
                 else:
                     # Criação (POST)
                     cur.execute("INSERT INTO services (name, price, duration) VALUES (%s, %s, %s) RETURNING id;",
                                 (name, price, duration))
                     new_id = cur.fetchone()['id']
+                    bump_cache_version(conn, 'services')
                     conn.commit()
+                    services_cache.invalidate()
                     return jsonify({'message': f'Serviço "{name}" adicionado com ID {new_id}.'}), 201
 
             elif request.method == 'DELETE':
@@ -193,40 +1337,178 @@ def manage_services():
                 service_id = data.get('id')
                 cur.execute("DELETE FROM services WHERE id = %s RETURNING id;", (service_id,))
                 if cur.fetchone():
+                    bump_cache_version(conn, 'services')
                     conn.commit()
+                    services_cache.invalidate()
                     return jsonify({'message': f'Serviço ID {service_id} excluído com sucesso.'})
                 return jsonify({'message': 'Serviço não encontrado.'}), 404
 
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        conn.rollback()
         print(f"Erro na gestão de serviços: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
-    finally:
-        conn.close()
 
-# --- Rotas de Agendamentos (Atualizadas) ---
+def _load_services(cur):
+    """Lista completa de serviços (carga do cache do catálogo)."""
+    cur.execute("SELECT id, name, price, duration FROM services ORDER BY name;")
+    return cur.fetchall()
 
-@app.route('/api/appointments', methods=['GET', 'POST'])
-def manage_appointments():
-    """GET: Lista agendamentos ATIVOS. POST: Cria novo agendamento."""
-    conn = get_db_connection()
-    if conn is None:
+# --- ROTAS DE DISPONIBILIDADE ---
+
+def _get_service_duration(cur, service_id):
+    """Retorna a duração (minutos) do serviço ou None se ele não existir."""
+    cur.execute("SELECT duration FROM services WHERE id = %s;", (service_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+@bp.route('/api/availability', methods=['GET'])
+def get_availability():
+    """Horários livres de um barbeiro em uma data para o serviço escolhido."""
+    barber_id = request.args.get('barberId')
+    service_id = request.args.get('serviceId', type=int)
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Data inválida. Use o formato AAAA-MM-DD.'}), 400
+    if barber_id not in BARBERS:
+        return jsonify({'message': 'Barbeiro inválido.'}), 400
+    if service_id is None:
+        return jsonify({'message': 'Informe o serviço (serviceId).'}), 400
+
+    try:
+        with db_connection() as conn, conn.cursor() as cur:
+            duration = _get_service_duration(cur, service_id)
+            if duration is None:
+                return jsonify({'message': 'Serviço não encontrado.'}), 404
+            busy = load_busy_intervals(cur, day, day, barber_id)
+            slots = free_slots_for_day(busy.get((barber_id, day), []), day, duration)
+            return jsonify({'barberId': barber_id, 'date': day.strftime('%Y-%m-%d'), 'duration': duration, 'slots': slots})
+
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao calcular disponibilidade: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
+
+@bp.route('/api/availability/next', methods=['GET'])
+def get_next_available_slots():
+    """Próximos N horários livres para o serviço, de todos os barbeiros (ou de um, com barberId)."""
+    barber_id = request.args.get('barberId') or None
+    service_id = request.args.get('serviceId', type=int)
+    limit = min(max(request.args.get('limit', 5, type=int), 1), 50)
+    if barber_id is not None and barber_id not in BARBERS:
+        return jsonify({'message': 'Barbeiro inválido.'}), 400
+    if service_id is None:
+        return jsonify({'message': 'Informe o serviço (serviceId).'}), 400
+
+    try:
+        with db_connection() as conn, conn.cursor() as cur:
+            duration = _get_service_duration(cur, service_id)
+            if duration is None:
+                return jsonify({'message': 'Serviço não encontrado.'}), 404
+            slots = find_next_free_slots(cur, duration, limit, barber_id)
+            return jsonify({'duration': duration, 'slots': slots})
+
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao buscar próximos horários: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
 
+# --- Rotas de Agendamentos (Atualizadas) ---
+
+# Listas paginadas por keyset em (data, horário, id): cada página é uma busca no índice a partir
+# do último item da página anterior, sem OFFSET. Agendamentos legados sem horário válido
+# (start_time nulo) entram na ordenação como 00:00.
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+APPOINTMENT_SORT_TIME_SQL = "COALESCE(start_time, TIME '00:00')"
+EXACT_COUNT_THRESHOLD = 1000   # abaixo disso a contagem exata é barata e substitui a estimativa
+
+def _encode_page_cursor(appt_date, sort_time, appt_id):
+    """Cursor opaco (base64 url-safe) com a chave de ordenação do último item da página."""
+    raw = json.dumps([appt_date.isoformat(), sort_time.isoformat(), appt_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_page_cursor(token):
+    """Decodifica o cursor; levanta ValueError se ele for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        appt_date, sort_time, appt_id = json.loads(raw)
+        return date.fromisoformat(appt_date), dt_time.fromisoformat(sort_time), int(appt_id)
+    except Exception as e:
+        raise ValueError('Cursor de paginação inválido.') from e
+
+def _page_args():
+    """Lê `limit` e `cursor` da query string."""
+    limit = min(max(request.args.get('limit', PAGE_SIZE_DEFAULT, type=int), 1), PAGE_SIZE_MAX)
+    cursor = request.args.get('cursor')
+    return limit, (_decode_page_cursor(cursor) if cursor else None)
+
+def estimate_appointment_count(cur, archived):
+    """Total aproximado de agendamentos (ativos ou arquivados) pela estimativa do planejador, sem varrer a tabela."""
+    cur.execute("EXPLAIN (FORMAT JSON) SELECT 1 FROM appointments WHERE is_archived = %s;", (archived,))
+    row = cur.fetchone()
+    estimate = int(row['QUERY PLAN'][0]['Plan']['Plan Rows'])
+    if estimate < EXACT_COUNT_THRESHOLD:
+        cur.execute("SELECT COUNT(*) AS total FROM appointments WHERE is_archived = %s;", (archived,))
+        estimate = cur.fetchone()['total']
+    return estimate
+
+def fetch_appointment_page(cur, archived, limit, cursor=None, date_format='%d-%m-%Y'):
+    """Busca uma página da lista de ativos (ordem crescente) ou de arquivados (decrescente)."""
+    direction, comparison = ('DESC', '<') if archived else ('ASC', '>')
+    where = "is_archived = %s"
+    params = [archived]
+    if cursor:
+        # A condição redundante só em appointment_date permite descartar partições já percorridas
+        where += f" AND appointment_date {comparison}= %s AND (appointment_date, {APPOINTMENT_SORT_TIME_SQL}, id) {comparison} (%s, %s, %s)"
+        params.extend([cursor[0], *cursor])
+    cur.execute(f"""
+        SELECT {APPOINTMENT_LIST_COLUMNS}, {APPOINTMENT_SORT_TIME_SQL} AS sort_time
+        FROM appointments
+        WHERE {where}
+        ORDER BY appointment_date {direction}, {APPOINTMENT_SORT_TIME_SQL} {direction}, id {direction}
+        LIMIT %s;
+    """, params + [limit + 1])
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_page_cursor(last['appointment_date'], last['sort_time'], last['id'])
+    for row in rows:
+        del row['sort_time']
+        row['appointment_date'] = row['appointment_date'].strftime(date_format)
+    return rows, next_cursor
+
+@bp.route('/api/appointments', methods=['GET', 'POST'])
+def manage_appointments():
+    """GET: Lista agendamentos ATIVOS (paginado por cursor). POST: Cria novo agendamento."""
     role = get_role()
 
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             if request.method == 'GET':
                 if role != 'admin':
                     return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem ver agendamentos.'}), 403
                 
-                # RETORNA APENAS AGENDAMENTOS NÃO ARQUIVADOS (is_archived = FALSE)
-                cur.execute("SELECT id, barber_id, service_name, appointment_date, appointment_time, client_name, service_price, status FROM appointments WHERE is_archived = FALSE ORDER BY appointment_date, appointment_time ASC;")
-                appointments = cur.fetchall()
-                for appt in appointments:
-                    appt['appointment_date'] = appt['appointment_date'].strftime('%d-%m-%Y')
-                return jsonify(appointments)
+                try:
+                    limit, cursor = _page_args()
+                except ValueError as e:
+                    return jsonify({'message': str(e)}), 400
+
+                # RETORNA APENAS AGENDAMENTOS NÃO ARQUIVADOS (is_archived = FALSE), uma página por vez
+                appointments, next_cursor = fetch_appointment_page(cur, False, limit, cursor)
+                payload = {'items': appointments, 'nextCursor': next_cursor}
+                if cursor is None:
+                    payload['totalEstimate'] = estimate_appointment_count(cur, False)
+                return jsonify(payload)
 
             elif request.method == 'POST':
                 data = request.get_json()
@@ -238,139 +1520,1262 @@ def manage_appointments():
                 client_phone = data.get('clientPhone')
                 client_email = data.get('clientEmail')
                 service_price = data.get('servicePrice')
-                
+
+                try:
+                    day = datetime.strptime(appointment_date or '', '%Y-%m-%d').date()
+                    start_time = datetime.strptime((appointment_time or '').strip(), '%H:%M').time()
+                except ValueError:
+                    return jsonify({'message': 'Data ou horário inválido.'}), 400
+                appointment_time = start_time.strftime('%H:%M')
+                if barber_id not in BARBERS:
+                    return jsonify({'message': 'Barbeiro inválido.'}), 400
+
+                cur.execute("SELECT duration FROM services WHERE name = %s;", (service_name,))
+                service = cur.fetchone()
+                if service is None:
+                    return jsonify({'message': 'Serviço não encontrado.'}), 400
+                reason = invalid_slot_reason(day, start_time, service['duration'])
+                if reason:
+                    return jsonify({'message': reason}), 400
+
+                # Reservas do mesmo barbeiro no mesmo dia são serializadas até o commit,
+                # então a checagem de conflito abaixo não tem corrida com outra requisição.
+                lock_barber_day(cur, barber_id, day)
+                if slot_is_taken(cur, barber_id, day, start_time, service['duration']):
+                    return jsonify({'message': f'O horário {appointment_time} de {appointment_date} já está ocupado. Escolha outro horário.'}), 409
+
                 cur.execute("""
-                    INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, client_name, client_phone, client_email, service_price)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id;
-                """, (barber_id, service_name, appointment_date, appointment_time, client_name, client_phone, client_email, service_price))
+                    INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, start_time, duration_minutes, client_name, client_phone, client_email, service_price)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id;
+                """, (barber_id, service_name, day, appointment_time, start_time, service['duration'], client_name, client_phone, client_email, service_price))
                 
                 new_id = cur.fetchone()['id']
                 conn.commit()
                 return jsonify({'message': f'Agendamento submetido com ID {new_id}.', 'id': new_id}), 201
 
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        conn.rollback()
         print(f"Erro na gestão de agendamentos: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
-    finally:
-        conn.close()
 
-@app.route('/api/appointments/<int:id>/status', methods=['PUT'])
+@bp.route('/api/appointments/<int:id>/status', methods=['PUT'])
 def update_appointment_status(id):
     """Atualiza o status (Concluído/Cancelado/Agendado) de um agendamento."""
     if get_role() != 'admin':
         return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem atualizar status.'}), 403
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
-
     try:
         data = request.get_json()
         new_status = data.get('status')
-
-        with conn.cursor() as cur:
-            cur.execute("UPDATE appointments SET status = %s WHERE id = %s RETURNING id;", (new_status, id))
-            if cur.fetchone():
+        if new_status not in APPOINTMENT_STATUSES:
+            return jsonify({'message': 'Status inválido.'}), 400
+
+        with db_connection() as conn:
+            # Um cancelado que volta a valer precisa do horário livre, como numa reserva nova
+            if new_status != 'Cancelado':
+                with conn.cursor() as cur:
+                    if reactivation_conflicts(cur, [id]):
+                        return jsonify({'message': 'O horário deste agendamento já está ocupado por outro agendamento ativo.'}), 409
+            # O rollup de receita é atualizado na mesma transação
+            if update_appointments_tracked(conn, "status = %s", [new_status], [id]):
+                bump_cache_version(conn, 'dashboard')
                 conn.commit()
+                dashboard_cache.invalidate()
                 return jsonify({'message': f'Status do Agendamento {id} atualizado para {new_status}.'})
             return jsonify({'message': 'Agendamento não encontrado.'}), 404
             
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao atualizar status: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
+
+# --- OPERAÇÕES EM LOTE (STATUS / ARQUIVAMENTO) ---
+# Corpo: {"ids": [1, 2, ...]} ou {"filter": {"status": "Concluído", "before": "AAAA-MM-DD",
+# "isArchived": false, "barberId": "barber1"}} ("before" é exclusivo). Tudo em uma transação e
+# um único UPDATE; a resposta traz o resultado de cada id.
+APPOINTMENT_STATUSES = ('Agendado', 'Concluído', 'Cancelado')
+BULK_MAX_IDS = 5000
+
+def _bulk_target_ids(cur, data):
+    """Resolve os ids do lote a partir de 'ids' ou 'filter'. Lança ValueError se o pedido for inválido."""
+    if 'ids' in data:
+        ids = list(dict.fromkeys(int(i) for i in data['ids']))
+        if not ids:
+            raise ValueError('Nenhum agendamento selecionado.')
+        if len(ids) > BULK_MAX_IDS:
+            raise ValueError(f'Máximo de {BULK_MAX_IDS} agendamentos por lote.')
+        return ids
+
+    filters = data.get('filter') or {}
+    clauses, params = [], []
+    if 'status' in filters:
+        if filters['status'] not in APPOINTMENT_STATUSES:
+            raise ValueError('Status inválido no filtro.')
+        clauses.append("status = %s")
+        params.append(filters['status'])
+    if 'before' in filters:
+        clauses.append("appointment_date < %s")
+        params.append(datetime.strptime(filters['before'], '%Y-%m-%d').date())
+    if 'isArchived' in filters:
+        clauses.append("is_archived = %s")
+        params.append(bool(filters['isArchived']))
+    if 'barberId' in filters:
+        clauses.append("barber_id = %s")
+        params.append(filters['barberId'])
+    if not clauses:
+        raise ValueError('Informe "ids" ou um "filter" com ao menos um critério.')
+
+    # FOR UPDATE: uma linha alterada por outra transação é reavaliada contra o filtro (e fica de fora se
+    # não casar mais); as selecionadas ficam travadas até o commit, então o UPDATE por id vê o mesmo estado.
+    cur.execute(f"SELECT id FROM appointments WHERE {' AND '.join(clauses)} ORDER BY id LIMIT %s FOR UPDATE;",
+                params + [BULK_MAX_IDS + 1])
+    ids = [row[0] for row in cur.fetchall()]
+    if len(ids) > BULK_MAX_IDS:
+        raise ValueError(f'O filtro seleciona mais de {BULK_MAX_IDS} agendamentos; restrinja o período.')
+    return ids
+
+def _apply_bulk_update(set_sql, set_params, reactivates=False):
+    """Aplica o UPDATE aos ids do pedido, mantendo rollup e cache do dashboard; retorna a resposta.
+
+    Com reactivates=True (status ativo), cancelados cujo horário está ocupado ficam de fora.
+    """
+    data = request.get_json() or {}
+    conflicts = set()
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            ids = _bulk_target_ids(cur, data)
+            if reactivates and ids:
+                conflicts = reactivation_conflicts(cur, ids)
+        update_ids = [i for i in ids if i not in conflicts]
+        changed = update_appointments_tracked(conn, set_sql, set_params, update_ids) if update_ids else []
+        if changed:
+            bump_cache_version(conn, 'dashboard')
+        conn.commit()
+    if changed:
+        dashboard_cache.invalidate()
+
+    found = {row['id']: row for row in changed}
+    results = []
+    for appointment_id in ids:
+        row = found.get(appointment_id)
+        if appointment_id in conflicts:
+            results.append({'id': appointment_id, 'ok': False, 'message': 'Horário ocupado por outro agendamento ativo.'})
+        elif row is None:
+            results.append({'id': appointment_id, 'ok': False, 'message': 'Agendamento não encontrado.'})
+        else:
+            results.append({'id': appointment_id, 'ok': True, 'status': row['status'], 'isArchived': row['is_archived']})
+    return jsonify({
+        'message': f'{len(found)} de {len(ids)} agendamentos atualizados.',
+        'updated': len(found),
+        'results': results,
+    })
+
+@bp.route('/api/appointments/bulk/status', methods=['POST'])
+def bulk_update_appointment_status():
+    """Altera o status de vários agendamentos de uma vez."""
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem atualizar status.'}), 403
+
+    try:
+        new_status = (request.get_json() or {}).get('status')
+        if new_status not in APPOINTMENT_STATUSES:
+            return jsonify({'message': 'Status inválido.'}), 400
+        return _apply_bulk_update("status = %s", [new_status], reactivates=new_status != 'Cancelado')
+
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'message': f'Pedido inválido: {e}'}), 400
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao atualizar status em lote: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
+
+@bp.route('/api/appointments/bulk/archive', methods=['POST'])
+def bulk_archive_appointments():
+    """Arquiva ou desarquiva vários agendamentos de uma vez."""
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem arquivar.'}), 403
+
+    try:
+        is_archived = bool((request.get_json() or {}).get('isArchived', True))
+        return _apply_bulk_update("is_archived = %s", [is_archived])
+
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'message': f'Pedido inválido: {e}'}), 400
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao arquivar em lote: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
+
+# --- IMPORTAÇÃO EM MASSA (CSV) ---
+# O CSV é lido em streaming (linha a linha, sem carregar o arquivo), validado em Python e copiado
+# com COPY para uma tabela temporária; uma única instrução INSERT ... SELECT leva as linhas válidas
+# para a tabela final. Linhas rejeitadas (na validação ou na junção com services / checagem de
+# conflito de horário) são contadas e as primeiras IMPORT_MAX_REPORTED_REJECTS são devolvidas.
+# Tudo numa transação: ou todas as linhas válidas entram, ou nenhuma.
+IMPORT_MAX_REPORTED_REJECTS = 100
+IMPORT_WORK_MEM = os.environ.get('IMPORT_WORK_MEM', '64MB')
+IMPORT_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$|^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$')
+IMPORT_TIME_RE = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)(?::[0-5]\d)?$')
+IMPORT_AMOUNT_RE = re.compile(r'^-?\d+(?:\.\d{1,2})?$')
+IMPORT_AMOUNT_MAX_DIGITS = 8    # NUMERIC(10, 2): até 99.999.999,99
+# Janela de datas aceitas: um ano digitado errado (ex.: 2205) é rejeitado em vez de virar partição
+IMPORT_YEARS_BACK = int(os.environ.get('IMPORT_YEARS_BACK', '20'))
+IMPORT_YEARS_AHEAD = int(os.environ.get('IMPORT_YEARS_AHEAD', '2'))
+IMPORT_BOOLEANS = {'': False, '0': False, 'false': False, 'nao': False, 'não': False, 'no': False,
+                   '1': True, 'true': True, 'sim': True, 'yes': True}
+
+class InvalidImportFile(ValueError):
+    """CSV inválido como um todo (cabeçalho, codificação): nada é importado."""
+
+@contextmanager
+def _import_decoding():
+    """Converte erros de decodificação do arquivo (no cabeçalho ou nas linhas) em InvalidImportFile."""
+    try:
+        yield
+    except UnicodeDecodeError as e:
+        raise InvalidImportFile(f'O arquivo não está na codificação esperada ({e.reason}). Tente encoding=latin-1.') from e
+
+def _import_date(value, today):
+    """Aceita AAAA-MM-DD, DD/MM/AAAA e DD-MM-AAAA dentro da janela IMPORT_YEARS_BACK/AHEAD."""
+    match = IMPORT_DATE_RE.match(value)
+    if not match:
+        raise ValueError(f'data inválida: {value!r}')
+    year, month, day = match.group(1, 2, 3) if match.group(1) else match.group(6, 5, 4)
+    try:
+        parsed = date(int(year), int(month), int(day))
+    except ValueError:
+        raise ValueError(f'data inválida: {value!r}') from None
+    if not today.year - IMPORT_YEARS_BACK <= parsed.year <= today.year + IMPORT_YEARS_AHEAD:
+        raise ValueError(f'data fora do período aceito ({today.year - IMPORT_YEARS_BACK} a '
+                         f'{today.year + IMPORT_YEARS_AHEAD}): {value!r}')
+    return parsed
+
+def _import_time(value):
+    match = IMPORT_TIME_RE.match(value)
+    if not match:
+        raise ValueError(f'horário inválido: {value!r}')
+    return f'{int(match.group(1)):02d}:{match.group(2)}'
+
+def _import_amount(value, allow_negative=False):
+    """Aceita 35.00, 35,00, 1.200,50 e R$ 35,00 (negativos só com allow_negative, ex.: estornos de despesas)."""
+    value = value.replace('R$', '').strip()
+    if ',' in value:
+        value = value.replace('.', '').replace(',', '.')
+    if not IMPORT_AMOUNT_RE.match(value):
+        raise ValueError(f'valor inválido: {value!r}')
+    if value.startswith('-') and not allow_negative:
+        raise ValueError(f'valor negativo: {value!r}')
+    if len(value.lstrip('-').split('.')[0].lstrip('0')) > IMPORT_AMOUNT_MAX_DIGITS:
+        raise ValueError(f'valor acima do máximo (99999999.99): {value!r}')
+    return value
+
+def _import_text(value, name, max_length, required=True):
+    if required and not value:
+        raise ValueError(f'{name} é obrigatório')
+    if len(value) > max_length:
+        raise ValueError(f'{name} tem mais de {max_length} caracteres')
+    return value or None
+
+def _appointment_import_row(row, today):
+    """Valida uma linha do CSV de agendamentos e devolve os campos na ordem de IMPORT_SPECS."""
+    day = _import_date(row['date'], today)
+    status = row['status'] or ('Concluído' if day < today else 'Agendado')
+    if status not in APPOINTMENT_STATUSES:
+        raise ValueError(f"status inválido: {status!r} (use {', '.join(APPOINTMENT_STATUSES)})")
+    archived = IMPORT_BOOLEANS.get(row['isArchived'].lower())
+    if archived is None:
+        raise ValueError(f"isArchived inválido: {row['isArchived']!r}")
+    if row['barberId'] not in BARBERS:
+        raise ValueError(f"barberId inválido: {row['barberId']!r} (use {', '.join(BARBERS)})")
+    price = row['servicePrice']
+    return (
+        row['barberId'],
+        _import_text(row['serviceName'], 'serviceName', 100),
+        day,
+        _import_time(row['time']),
+        _import_text(row['clientName'], 'clientName', 100),
+        _import_text(row['clientPhone'], 'clientPhone', 20, required=False),
+        _import_text(row['clientEmail'], 'clientEmail', 100, required=False),
+        _import_amount(price) if price else None,
+        status,
+        archived,
+    )
+
+def _expense_import_row(row, today):
+    """Valida uma linha do CSV de despesas."""
+    return (
+        _import_text(row['description'], 'description', 255),
+        _import_amount(row['amount'], allow_negative=True),
+        _import_date(row['date'], today) if row['date'] else today,
+    )
+
+# Rejeições na junção/checagem em SQL: serviço inexistente e conflito de horário (com a agenda
+# existente ou com outra linha do próprio arquivo), só para agendamentos não cancelados
+APPOINTMENT_IMPORT_MERGE_SQL = f"""
+    WITH RECURSIVE slots AS MATERIALIZED (
+        SELECT s.*, sv.name IS NOT NULL AS known_service, sv.duration,
+               COALESCE(s.service_price, sv.price) AS price,
+               tsrange(s.appointment_date + s.start_time,
+                       s.appointment_date + s.start_time + make_interval(mins => sv.duration), '[)') AS slot
+        FROM import_appointments s
+        LEFT JOIN services sv ON sv.name = s.service_name
+    ),
+    -- Conflitos por junção (hash join por barbeiro/dia) em vez de uma busca por linha; o intervalo
+    -- de datas do arquivo limita as partições lidas
+    busy AS (
+        SELECT DISTINCT s.line
+        FROM slots s
+        JOIN appointments a ON a.barber_id = s.barber_id AND a.appointment_date = s.appointment_date
+        WHERE s.status <> 'Cancelado' AND a.status <> 'Cancelado'
+        AND a.appointment_date BETWEEN %(first_date)s AND %(last_date)s
+        AND tsrange(a.appointment_date + a.start_time,
+                    a.appointment_date + a.start_time + make_interval(mins => a.duration_minutes), '[)') && s.slot
+    ),
+    -- Conflito dentro do próprio arquivo, resolvido em ordem de início (e de linha) por barbeiro/dia:
+    -- a linha entra se começa depois do fim da última linha ACEITA, então uma linha rejeitada não
+    -- derruba as seguintes. A recursão avança uma posição por vez em todos os barbeiros/dias juntos
+    -- (profundidade = linhas do dia mais cheio de um barbeiro)
+    ordered AS MATERIALIZED (
+        SELECT line, barber_id, appointment_date, slot,
+               ROW_NUMBER() OVER day_order AS position,
+               MAX(upper(slot)) OVER (day_order ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS previous_end
+        FROM slots
+        WHERE known_service AND status <> 'Cancelado' AND line NOT IN (SELECT line FROM busy)
+        WINDOW day_order AS (PARTITION BY barber_id, appointment_date ORDER BY lower(slot), line)
+    ),
+    -- Só os barbeiros/dias com alguma sobreposição passam pela recursão; nos outros, todas entram
+    candidates AS MATERIALIZED (
+        SELECT line, barber_id, appointment_date, slot, position
+        FROM ordered
+        WHERE (barber_id, appointment_date) IN (
+            SELECT barber_id, appointment_date FROM ordered WHERE lower(slot) < previous_end)
+    ),
+    accepted AS (
+        SELECT barber_id, appointment_date, position, line, upper(slot) AS accepted_end, TRUE AS ok
+        FROM candidates
+        WHERE position = 1
+        UNION ALL
+        SELECT c.barber_id, c.appointment_date, c.position, c.line,
+               CASE WHEN lower(c.slot) >= p.accepted_end THEN upper(c.slot) ELSE p.accepted_end END,
+               lower(c.slot) >= p.accepted_end
+        FROM accepted p
+        JOIN candidates c ON c.barber_id = p.barber_id AND c.appointment_date = p.appointment_date
+                         AND c.position = p.position + 1
+    ),
+    clashes AS (
+        SELECT line FROM accepted WHERE NOT ok
+    ),
+    checked AS MATERIALIZED (
+        SELECT slots.*,
+               CASE
+                   WHEN NOT known_service THEN 'serviço não encontrado: ' || service_name
+                   WHEN busy.line IS NOT NULL
+                       THEN 'horário ocupado: ' || barber_id || ' ' || appointment_date || ' ' || to_char(start_time, 'HH24:MI')
+                   WHEN clashes.line IS NOT NULL THEN 'horário em conflito com outra linha do arquivo'
+               END AS error
+        FROM slots
+        LEFT JOIN busy USING (line)
+        LEFT JOIN clashes USING (line)
+    ),
+    inserted AS (
+        INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, start_time,
+                                  duration_minutes, client_name, client_phone, client_email, service_price,
+                                  status, is_archived)
+        SELECT barber_id, service_name, appointment_date, to_char(start_time, 'HH24:MI'), start_time,
+               duration, client_name, client_phone, client_email, price, status, is_archived
+        FROM checked
+        WHERE error IS NULL
+        ORDER BY line
+        RETURNING appointment_date, barber_id, service_name, service_price, status, is_archived
+    ),
+    revenue AS (
+        -- Mesmo critério de rebuild_daily_revenue (Concluído, arquivado ou não), em ordem de chave
+        INSERT INTO daily_revenue (revenue_date, barber_id, service_name, revenue, appointments,
+                                   archived_revenue, archived_appointments)
+        SELECT appointment_date, barber_id, service_name,
+               COALESCE(SUM(service_price) FILTER (WHERE NOT is_archived), 0),
+               COUNT(*) FILTER (WHERE NOT is_archived),
+               COALESCE(SUM(service_price) FILTER (WHERE is_archived), 0),
+               COUNT(*) FILTER (WHERE is_archived)
+        FROM inserted
+        WHERE status = '{REVENUE_STATUS}'
+        GROUP BY appointment_date, barber_id, service_name
+        ORDER BY appointment_date, barber_id, service_name
+        ON CONFLICT (revenue_date, barber_id, service_name) DO UPDATE
+        SET revenue = daily_revenue.revenue + EXCLUDED.revenue,
+            appointments = daily_revenue.appointments + EXCLUDED.appointments,
+            archived_revenue = daily_revenue.archived_revenue + EXCLUDED.archived_revenue,
+            archived_appointments = daily_revenue.archived_appointments + EXCLUDED.archived_appointments
+    )
+    SELECT (SELECT COUNT(*) FROM inserted) AS imported,
+           (SELECT COUNT(*) FROM checked WHERE error IS NOT NULL) AS rejected,
+           (SELECT COALESCE(json_agg(json_build_object('line', line, 'message', error) ORDER BY line), '[]')
+            FROM (SELECT line, error FROM checked WHERE error IS NOT NULL ORDER BY line LIMIT %(max_rejects)s) r) AS rejects;
+"""
+
+EXPENSE_IMPORT_MERGE_SQL = """
+    WITH inserted AS (
+        INSERT INTO monthly_expenses (description, amount, expense_date)
+        SELECT description, amount, expense_date FROM import_expenses ORDER BY line
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM inserted) AS imported, 0 AS rejected, '[]'::json AS rejects;
+"""
+
+IMPORT_SPECS = {
+    'appointments': {
+        'required': ('barberId', 'serviceName', 'date', 'time', 'clientName'),
+        'optional': ('clientPhone', 'clientEmail', 'servicePrice', 'status', 'isArchived'),
+        'row': _appointment_import_row,
+        'staging': """
+            CREATE TEMP TABLE import_appointments (
+                line INTEGER NOT NULL, barber_id TEXT, service_name TEXT, appointment_date DATE, start_time TIME,
+                client_name TEXT, client_phone TEXT, client_email TEXT, service_price NUMERIC(10, 2),
+                status TEXT, is_archived BOOLEAN
+            ) ON COMMIT DROP;
+        """,
+        'copy': """COPY import_appointments (line, barber_id, service_name, appointment_date, start_time, client_name,
+                   client_phone, client_email, service_price, status, is_archived) FROM STDIN WITH (FORMAT csv)""",
+        'merge': APPOINTMENT_IMPORT_MERGE_SQL,
+    },
+    'expenses': {
+        'required': ('description', 'amount'),
+        'optional': ('date',),
+        'row': _expense_import_row,
+        'staging': """
+            CREATE TEMP TABLE import_expenses (
+                line INTEGER NOT NULL, description TEXT, amount NUMERIC(10, 2), expense_date DATE
+            ) ON COMMIT DROP;
+        """,
+        'copy': "COPY import_expenses (line, description, amount, expense_date) FROM STDIN WITH (FORMAT csv)",
+        'merge': EXPENSE_IMPORT_MERGE_SQL,
+    },
+}
+
+class CsvCopyStream:
+    """Objeto "arquivo" lido pelo COPY ... FROM STDIN (FORMAT csv): serializa as linhas sob demanda."""
+
+    def __init__(self, rows, batch_size=1000):
+        self.rows = iter(rows)
+        self.batch_size = batch_size
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+        self.pending = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            batch = list(itertools.islice(self.rows, self.batch_size))
+            if not batch:
+                break
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.writer.writerows(batch)
+            self.pending += self.buffer.getvalue()
+        if size < 0:
+            data, self.pending = self.pending, ''
+        else:
+            data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+def import_csv(conn, kind, text_stream):
+    """Importa um CSV (arquivo texto, lido em streaming) de agendamentos ou despesas (não faz commit).
+
+    O separador (',' ou ';') é detectado pelo cabeçalho, que usa os nomes de campo da API
+    (ex.: date, time, barberId, serviceName, clientName). Retorna {'imported', 'rejected', 'rejects'}.
+    """
+    spec = IMPORT_SPECS[kind]
+    with _import_decoding():
+        header_line = text_stream.readline()
+    if not header_line.strip():
+        raise InvalidImportFile('Arquivo vazio: a primeira linha deve ser o cabeçalho.')
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+    header = [name.strip().lower() for name in next(csv.reader([header_line], delimiter=delimiter), [])]
+    missing = [name for name in spec['required'] if name.lower() not in header]
+    if missing:
+        raise InvalidImportFile(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(missing)}.")
+    columns = spec['required'] + spec['optional']
+    positions = [(name, header.index(name.lower())) for name in columns if name.lower() in header]
+    # Colunas opcionais ausentes do cabeçalho (ou linhas com menos campos) valem ''
+    blank = dict.fromkeys(columns, '')
+    width = max(position for _, position in positions) + 1
+
+    rejects, rejected = [], 0
+    today = date.today()
+    reader = csv.reader(text_stream, delimiter=delimiter)
+
+    def valid_rows():
+        nonlocal rejected
+        for fields in reader:
+            if not ''.join(fields).strip():
+                continue
+            # Número da linha no arquivo (o cabeçalho é a linha 1)
+            line = reader.line_num + 1
+            if len(fields) < width:
+                fields += [''] * (width - len(fields))
+            row = {**blank, **{name: fields[position].strip() for name, position in positions}}
+            try:
+                yield (line, *spec['row'](row, today))
+            except ValueError as e:
+                rejected += 1
+                if len(rejects) < IMPORT_MAX_REPORTED_REJECTS:
+                    rejects.append({'line': line, 'message': str(e)})
+
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(spec['staging'])
+        with _import_decoding():
+            cur.copy_expert(spec['copy'], CsvCopyStream(valid_rows()), size=1 << 16)
+
+        if kind == 'appointments':
+            cur.execute("""
+                SELECT MIN(appointment_date) AS first, MAX(appointment_date) AS last,
+                       ARRAY_AGG(DISTINCT date_trunc('month', appointment_date)::date) AS months
+                FROM import_appointments;
+            """)
+            period = cur.fetchone()
+            if period['first'] is not None:
+                # Datas históricas ganham partição própria em vez de cair na DEFAULT: só os meses
+                # presentes no arquivo, não todos os meses entre a primeira e a última data
+                create_partitions_for_months(conn, period['months'])
+            # Mesmo lock das reservas (lock_barber_day) para os dias ainda reserváveis: a checagem de
+            # conflito não corre contra um agendamento feito durante a importação
+            cur.execute("""
+                SELECT pg_advisory_xact_lock(hashtext(barber_id), appointment_date - DATE '0001-01-01' + 1)
+                FROM (SELECT DISTINCT barber_id, appointment_date FROM import_appointments
+                      WHERE appointment_date >= CURRENT_DATE ORDER BY 1, 2) days;
+            """)
+            cur.execute("ANALYZE import_appointments;")
+            # Ordenações e hashes da junção em memória em vez de arquivos temporários
+            cur.execute("SET LOCAL work_mem = %s;", (IMPORT_WORK_MEM,))
+
+        params = {'max_rejects': IMPORT_MAX_REPORTED_REJECTS}
+        if kind == 'appointments':
+            params.update(first_date=period['first'], last_date=period['last'])
+        cur.execute(spec['merge'], params)
+        result = cur.fetchone()
+
+    rejects = sorted(rejects + result['rejects'], key=lambda reject: reject['line'])[:IMPORT_MAX_REPORTED_REJECTS]
+    return {'imported': result['imported'], 'rejected': rejected + result['rejected'], 'rejects': rejects}
+
+def run_import(kind, binary_stream, encoding='utf-8-sig'):
+    """Executa import_csv numa transação, atualizando as versões de cache; inclui o tempo gasto."""
+    started = time.perf_counter()
+    text_stream = io.TextIOWrapper(binary_stream, encoding=encoding, newline='')
+    with db_connection() as conn:
+        result = import_csv(conn, kind, text_stream)
+        if result['imported']:
+            bump_cache_version(conn, 'dashboard')
+        conn.commit()
+    dashboard_cache.invalidate()
+    elapsed = time.perf_counter() - started
+    result['seconds'] = round(elapsed, 3)
+    result['rowsPerSecond'] = round((result['imported'] + result['rejected']) / elapsed) if elapsed else None
+    return result
+
+@bp.route('/api/import/<kind>', methods=['POST'])
+def import_route(kind):
+    """Importa um CSV de agendamentos (/api/import/appointments) ou despesas (/api/import/expenses).
+
+    Aceita multipart/form-data (campo 'file') ou o CSV direto no corpo; ?encoding= (padrão utf-8).
+    """
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem importar dados.'}), 403
+    if kind not in IMPORT_SPECS:
+        return jsonify({'message': f"Tipo de importação inválido. Use: {', '.join(IMPORT_SPECS)}."}), 404
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'message': "Envie o CSV no campo 'file'."}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+    if not isinstance(stream, io.BufferedIOBase):
+        stream = io.BufferedReader(stream)
+
+    try:
+        result = run_import(kind, stream, request.args.get('encoding', 'utf-8-sig'))
+    except (InvalidImportFile, LookupError) as e:
+        return jsonify({'message': str(e)}), 400
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro na importação de {kind}: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
+    return jsonify(result)
+
+# --- ARQUIVAMENTO AUTOMÁTICO ---
+# Arquiva agendamentos Concluído/Cancelado com mais de AUTO_ARCHIVE_AFTER_DAYS dias em lotes curtos
+# (commit por lote, SKIP LOCKED para não esperar linhas em uso). Roda pelo comando
+# 'flask auto-archive' ou, com AUTO_ARCHIVE_INTERVAL_SECONDS > 0, numa thread de cada worker;
+# um advisory lock de sessão garante uma execução por vez no cluster inteiro.
+AUTO_ARCHIVE_AFTER_DAYS = int(os.environ.get('AUTO_ARCHIVE_AFTER_DAYS', '7'))
+AUTO_ARCHIVE_BATCH_SIZE = int(os.environ.get('AUTO_ARCHIVE_BATCH_SIZE', '1000'))
+AUTO_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('AUTO_ARCHIVE_INTERVAL_SECONDS', '0'))
+AUTO_ARCHIVE_STATUSES = ('Concluído', 'Cancelado')
+
+def auto_archive(conn, older_than_days=None, batch_size=None):
+    """Arquiva em lotes os agendamentos finalizados antigos.
+
+    Retorna {'archived', 'batches', 'seconds'}, ou None se outra execução já detém o lock.
+    """
+    older_than_days = AUTO_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or AUTO_ARCHIVE_BATCH_SIZE
+    cutoff = date.today() - timedelta(days=older_than_days)
+    started = time.monotonic()
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(hashtext('barberflow.auto_archive'));")
+        locked = cur.fetchone()[0]
+    conn.commit()
+    if not locked:
+        return None
+
+    archived = batches = 0
+    try:
+        while True:
+            changed = update_appointments_where(conn, "is_archived = TRUE", [], """
+                SELECT id, status, is_archived FROM appointments
+                WHERE is_archived = FALSE AND status = ANY(%s) AND appointment_date < %s
+                LIMIT %s FOR UPDATE SKIP LOCKED
+            """, [list(AUTO_ARCHIVE_STATUSES), cutoff, batch_size])
+            if changed:
+                bump_cache_version(conn, 'dashboard')
+            conn.commit()
+            if not changed:
+                break
+            archived += len(changed)
+            batches += 1
+            dashboard_cache.invalidate()
+            if len(changed) < batch_size:
+                break
     finally:
-        conn.close()
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(hashtext('barberflow.auto_archive'));")
+        conn.commit()
+
+    return {'archived': archived, 'batches': batches, 'seconds': round(time.monotonic() - started, 3)}
+
+_auto_archiver_pid = None
+_auto_archiver_lock = threading.Lock()
+
+def _auto_archiver_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with db_connection() as conn:
+                result = auto_archive(conn)
+            if result and result['archived']:
+                print(f"Arquivamento automático: {result['archived']} agendamentos em "
+                      f"{result['batches']} lotes ({result['seconds']}s).")
+        except Exception as e:
+            print(f"Erro no arquivamento automático: {e}")
+
+@bp.before_app_request
+def ensure_auto_archiver():
+    """Inicia a thread de arquivamento automático neste processo (uma vez por PID, após o fork)."""
+    global _auto_archiver_pid
+    if AUTO_ARCHIVE_INTERVAL_SECONDS <= 0 or _auto_archiver_pid == os.getpid():
+        return
+    with _auto_archiver_lock:
+        if _auto_archiver_pid != os.getpid():
+            threading.Thread(target=_auto_archiver_loop, args=(AUTO_ARCHIVE_INTERVAL_SECONDS,),
+                             name='auto-archiver', daemon=True).start()
+            _auto_archiver_pid = os.getpid()
+
+# --- MANUTENÇÃO DAS PARTIÇÕES ---
+# Cria as partições dos próximos meses numa thread de cada worker, a cada
+# PARTITION_CHECK_INTERVAL_SECONDS, independente do arquivamento automático. Com 0, a thread
+# fica desligada e 'flask ensure-partitions' precisa rodar num cron (ao menos uma vez por mês).
+PARTITION_CHECK_INTERVAL_SECONDS = int(os.environ.get('PARTITION_CHECK_INTERVAL_SECONDS', '21600'))
+
+_partition_maintainer_pid = None
+_partition_maintainer_lock = threading.Lock()
+
+def _partition_maintainer_loop(interval):
+    while True:
+        try:
+            with db_connection() as conn:
+                created = ensure_appointment_partitions(conn)
+                conn.commit()
+            if created:
+                print(f"Partições criadas: {', '.join(created)}")
+        except Exception as e:
+            print(f"Erro na manutenção das partições: {e}")
+        time.sleep(interval)
+
+@bp.before_app_request
+def ensure_partition_maintainer():
+    """Inicia a thread de manutenção das partições neste processo (uma vez por PID, após o fork)."""
+    global _partition_maintainer_pid
+    if PARTITION_CHECK_INTERVAL_SECONDS <= 0 or _partition_maintainer_pid == os.getpid():
+        return
+    with _partition_maintainer_lock:
+        if _partition_maintainer_pid != os.getpid():
+            threading.Thread(target=_partition_maintainer_loop, args=(PARTITION_CHECK_INTERVAL_SECONDS,),
+                             name='partition-maintainer', daemon=True).start()
+            _partition_maintainer_pid = os.getpid()
 
 # --- NOVA ROTA: LISTA DE AGENDAMENTOS ARQUIVADOS ---
 
-@app.route('/api/appointments/archived', methods=['GET'])
+@bp.route('/api/appointments/archived', methods=['GET'])
 def get_archived_appointments():
-    """Retorna a lista de agendamentos ARQUIVADOS (is_archived = TRUE)."""
+    """Retorna uma página da lista de agendamentos ARQUIVADOS (is_archived = TRUE)."""
     if get_role() != 'admin':
         return jsonify({'message': 'Acesso negado.'}), 403
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
-
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            # Apenas agendamentos ARQUIVADOS
-            cur.execute("SELECT id, barber_id, service_name, appointment_date, appointment_time, client_name, service_price, status FROM appointments WHERE is_archived = TRUE ORDER BY appointment_date DESC, appointment_time DESC;")
-            appointments = cur.fetchall()
-            for appt in appointments:
-                appt['appointment_date'] = appt['appointment_date'].strftime('%Y-%m-%d')
-            return jsonify(appointments)
+        limit, cursor = _page_args()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
+    try:
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            # Apenas agendamentos ARQUIVADOS, do mais recente para o mais antigo, uma página por vez
+            appointments, next_cursor = fetch_appointment_page(cur, True, limit, cursor, date_format='%Y-%m-%d')
+            payload = {'items': appointments, 'nextCursor': next_cursor}
+            if cursor is None:
+                payload['totalEstimate'] = estimate_appointment_count(cur, True)
+            return jsonify(payload)
+
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
         print(f"Erro ao obter agendamentos arquivados: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
+
+
+# --- EXPORTAÇÃO DO HISTÓRICO ARQUIVADO (STREAMING) ---
+# As linhas vêm de um cursor nomeado (server-side) em blocos de EXPORT_ITERSIZE e são escritas na
+# resposta conforme chegam, então a memória do worker não cresce com o tamanho do arquivo.
+EXPORT_ITERSIZE = 2000
+EXPORT_CHUNK_ROWS = 500      # linhas agrupadas por pedaço escrito na resposta
+
+def _export_chunk(lines, fmt, first):
+    """Junta as linhas de um pedaço no formato de saída (NDJSON ou elementos de um array JSON)."""
+    if fmt == 'json':
+        return ('' if first else ',\n') + ',\n'.join(lines)
+    return '\n'.join(lines) + '\n'
+
+def stream_archived_appointments(fmt='ndjson'):
+    """Gera o histórico arquivado como NDJSON (uma linha por agendamento) ou como um array JSON."""
+    with db_connection() as conn, conn.cursor(name='archived_export', cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.itersize = EXPORT_ITERSIZE
+        cur.execute(f"""
+            SELECT {APPOINTMENT_LIST_COLUMNS}
+            FROM appointments
+            WHERE is_archived = TRUE
+            ORDER BY appointment_date DESC, {APPOINTMENT_SORT_TIME_SQL} DESC, id DESC;
+        """)
+        # O primeiro pedaço sai só depois do checkout da conexão e do DECLARE do cursor
+        yield '[' if fmt == 'json' else ''
+        buffer = []
+        first = True
+        for row in cur:
+            row['appointment_date'] = row['appointment_date'].strftime('%Y-%m-%d')
+            buffer.append(json.dumps(row, default=str, ensure_ascii=False))
+            if len(buffer) >= EXPORT_CHUNK_ROWS:
+                yield _export_chunk(buffer, fmt, first)
+                buffer = []
+                first = False
+        if buffer:
+            yield _export_chunk(buffer, fmt, first)
+        if fmt == 'json':
+            yield ']\n'
+
+@bp.route('/api/appointments/archived/export', methods=['GET'])
+def export_archived_appointments():
+    """Exporta todo o histórico arquivado em streaming (?format=ndjson padrão, ou ?format=json)."""
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado.'}), 403
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'message': 'Formato inválido. Use ndjson ou json.'}), 400
+
+    filename = f"agendamentos_arquivados_{date.today().strftime('%Y-%m-%d')}.{fmt}"
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return streaming_download(stream_archived_appointments(fmt), mimetype, filename, 'agendamentos arquivados')
+
+# --- EXPORTAÇÃO FINANCEIRA (CSV/XLSX, STREAMING) ---
+# Agendamentos (por padrão só os Concluído, arquivados ou não) e despesas de um período, para a
+# contabilidade. O CSV sai direto do PostgreSQL via COPY (SELECT ...) TO STDOUT: o psycopg2 só
+# entrega o COPY a um arquivo, então ele roda numa thread que escreve numa fila limitada, lida pela
+# resposta. O XLSX é montado em streaming a partir de um cursor nomeado. Nos dois casos a memória do
+# worker não cresce com o tamanho do arquivo. Os cabeçalhos são os nomes de campo da API, os mesmos
+# aceitos por /api/import/<kind>.
+EXPORT_COPY_CHUNK_BYTES = 64 * 1024
+EXPORT_COPY_QUEUE_CHUNKS = 16
+EXPORT_SPECS = {
+    'appointments': {
+        'table': 'appointments',
+        'date_column': 'appointment_date',
+        'order': 'appointment_date, start_time, id',
+        'filename': 'agendamentos',
+        # (cabeçalho, expressão SQL, tipo da célula no XLSX)
+        'columns': (
+            ('date', 'appointment_date', 'date'),
+            ('time', 'appointment_time', 'text'),
+            ('barberId', 'barber_id', 'text'),
+            ('serviceName', 'service_name', 'text'),
+            ('clientName', 'client_name', 'text'),
+            ('clientPhone', 'client_phone', 'text'),
+            ('clientEmail', 'client_email', 'text'),
+            ('servicePrice', 'service_price', 'money'),
+            ('durationMinutes', 'duration_minutes', 'number'),
+            ('status', 'status', 'text'),
+            ('isArchived', 'is_archived::text', 'text'),
+        ),
+    },
+    'expenses': {
+        'table': 'monthly_expenses',
+        'date_column': 'expense_date',
+        'order': 'expense_date, id',
+        'filename': 'despesas',
+        'columns': (
+            ('date', 'expense_date', 'date'),
+            ('description', 'description', 'text'),
+            ('amount', 'amount', 'money'),
+        ),
+    },
+}
+
+def export_filters(kind, args):
+    """Lê os filtros da exportação (from, to, barberId, status) da query string."""
+    filters = {}
+    for name in ('from', 'to'):
+        if args.get(name):
+            try:
+                filters[name] = date.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f"Data inválida em '{name}'. Use AAAA-MM-DD.") from None
+    if 'from' in filters and 'to' in filters and filters['from'] > filters['to']:
+        raise ValueError("'from' deve ser anterior ou igual a 'to'.")
+    if kind == 'appointments':
+        filters['status'] = args.get('status', REVENUE_STATUS)
+        if filters['status'] not in APPOINTMENT_STATUSES:
+            raise ValueError(f"Status inválido. Use: {', '.join(APPOINTMENT_STATUSES)}.")
+        if args.get('barberId'):
+            filters['barberId'] = args['barberId']
+    elif args.get('barberId') or args.get('status'):
+        raise ValueError('Despesas não são filtradas por barbeiro ou status.')
+    return filters
+
+def export_query(kind, filters):
+    """Monta o SELECT da exportação; retorna (sql, parâmetros)."""
+    spec = EXPORT_SPECS[kind]
+    conditions = []
+    if 'from' in filters:
+        conditions.append(f"{spec['date_column']} >= %(from)s")
+    if 'to' in filters:
+        conditions.append(f"{spec['date_column']} <= %(to)s")
+    if 'status' in filters:
+        conditions.append("status = %(status)s")
+    if 'barberId' in filters:
+        conditions.append("barber_id = %(barberId)s")
+    columns = ', '.join(f'{expression} AS "{header}"' for header, expression, _ in spec['columns'])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"SELECT {columns} FROM {spec['table']} {where} ORDER BY {spec['order']}", filters
+
+class ExportCancelled(Exception):
+    """O cliente deixou de ler a exportação (conexão encerrada)."""
+
+class QueueWriter:
+    """Arquivo de escrita para o COPY TO: agrupa as linhas em pedaços e os entrega a uma fila limitada.
+
+    Com a fila cheia o COPY espera o cliente ler (backpressure); se a leitura for cancelada, a
+    próxima escrita levanta ExportCancelled e interrompe o COPY.
+    """
+
+    def __init__(self, chunks, cancelled, chunk_bytes=EXPORT_COPY_CHUNK_BYTES):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.chunk_bytes = chunk_bytes
+        self.pending = []
+        self.pending_bytes = 0
+        self.started = False
+
+    def write(self, data):
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        # A primeira escrita (o cabeçalho) sai sozinha: a resposta começa assim que o COPY começa
+        if self.pending_bytes >= self.chunk_bytes or not self.started:
+            self.flush()
+            self.started = True
+        return len(data)
+
+    def flush(self):
+        if self.pending:
+            self.put(b''.join(self.pending))
+            self.pending = []
+            self.pending_bytes = 0
+
+    def put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+def stream_copy_csv(kind, filters):
+    """Gera o CSV (com cabeçalho) de COPY (SELECT ...) TO STDOUT em pedaços de bytes."""
+    chunks = queue.Queue(maxsize=EXPORT_COPY_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+
+    def copy_worker():
+        writer = QueueWriter(chunks, cancelled)
+        try:
+            with db_connection() as conn, conn.cursor() as cur:
+                # COPY não aceita parâmetros: o SELECT vai com os valores já escapados pelo psycopg2
+                sql = cur.mogrify(*export_query(kind, filters)).decode(psycopg2.extensions.encodings[conn.encoding])
+                cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", writer)
+                writer.flush()
+            writer.put(done)
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            try:
+                writer.put(e)
+            except ExportCancelled:
+                pass
+
+    if has_request_context():
+        copy_worker = copy_current_request_context(copy_worker)
+    threading.Thread(target=copy_worker, name=f'export-{kind}', daemon=True).start()
+    try:
+        first = True
+        while True:
+            item = chunks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            # BOM no início: o Excel abre o UTF-8 (acentos) corretamente
+            yield b'\xef\xbb\xbf' + item if first else item
+            first = False
     finally:
-        conn.close()
+        cancelled.set()
+
+XLSX_EPOCH = date(1899, 12, 30)     # dia 0 das datas seriais do Excel
+XLSX_INVALID_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')   # proibidos no XML
+XLSX_STYLES = {'date': 1, 'money': 2, 'header': 3}
+XLSX_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XLSX_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XLSX_PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        f'<Relationships xmlns="{XLSX_PACKAGE_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{XLSX_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        f'<Relationships xmlns="{XLSX_PACKAGE_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{XLSX_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{XLSX_REL_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilos na ordem de XLSX_STYLES: 1 = data (formato curto do sistema), 2 = valor (#,##0.00), 3 = cabeçalho em negrito
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{XLSX_MAIN_NS}">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+def _xlsx_text_cell(value, style=''):
+    text = xml_escape(XLSX_INVALID_CHARS_RE.sub('', str(value)))
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
 
+def _xlsx_number_cell(value, style=''):
+    return f'<c{style}><v>{value}</v></c>'
+
+def _xlsx_date_cell(value):
+    return f'<c s="{XLSX_STYLES["date"]}"><v>{(value - XLSX_EPOCH).days}</v></c>'
+
+XLSX_CELL_WRITERS = {
+    'text': _xlsx_text_cell,
+    'number': _xlsx_number_cell,
+    'money': lambda value: _xlsx_number_cell(value, f' s="{XLSX_STYLES["money"]}"'),
+    'date': _xlsx_date_cell,
+}
+
+class ChunkSink(io.RawIOBase):
+    """Destino não posicionável do zipfile: acumula os bytes escritos até serem retirados com drain()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class XlsxStreamWriter:
+    """Planilha .xlsx de uma aba (strings inline, sem dependências) gerada em streaming.
+
+    start(), write_rows() e close() devolvem os bytes do arquivo produzidos até ali. A aba é uma
+    entrada do zip escrita aos poucos (descritor de dados no fim), então nada é mantido em memória.
+    """
+
+    def __init__(self, columns, sheet_name='Dados'):
+        self.headers = [header for header, _ in columns]
+        self.cell_writers = [XLSX_CELL_WRITERS[cell_type] for _, cell_type in columns]
+        self.sheet_name = sheet_name
+        self.output = ChunkSink()
+        self.zip = zipfile.ZipFile(self.output, 'w', zipfile.ZIP_DEFLATED)
+        self.sheet = None
+
+    def start(self):
+        for name, xml in XLSX_STATIC_PARTS.items():
+            self.zip.writestr(name, xml)
+        self.zip.writestr('xl/workbook.xml', (
+            f'<workbook xmlns="{XLSX_MAIN_NS}" xmlns:r="{XLSX_REL_NS}"><sheets>'
+            f'<sheet name="{xml_escape(self.sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        self.sheet = self.zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        header_style = f' s="{XLSX_STYLES["header"]}"'
+        self.sheet.write((
+            f'<worksheet xmlns="{XLSX_MAIN_NS}"><sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+            '<sheetData><row>' + ''.join(_xlsx_text_cell(header, header_style) for header in self.headers) + '</row>'
+        ).encode('utf-8'))
+        return self.output.drain()
+
+    def write_rows(self, rows):
+        cell_writers = self.cell_writers
+        self.sheet.write(''.join(
+            '<row>' + ''.join('<c/>' if value is None else write(value)
+                              for write, value in zip(cell_writers, row)) + '</row>'
+            for row in rows
+        ).encode('utf-8'))
+        return self.output.drain()
+
+    def close(self):
+        self.sheet.write(b'</sheetData></worksheet>')
+        self.sheet.close()
+        self.zip.close()
+        return self.output.drain()
+
+def stream_xlsx(kind, filters):
+    """Gera a exportação como .xlsx, lendo as linhas de um cursor nomeado em blocos."""
+    spec = EXPORT_SPECS[kind]
+    with db_connection() as conn, conn.cursor(name=f'export_{kind}') as cur:
+        cur.itersize = EXPORT_ITERSIZE
+        cur.execute(*export_query(kind, filters))
+        writer = XlsxStreamWriter([(header, cell_type) for header, _, cell_type in spec['columns']],
+                                  sheet_name=spec['filename'].capitalize())
+        yield writer.start()
+        while True:
+            rows = cur.fetchmany(EXPORT_ITERSIZE)
+            if not rows:
+                break
+            chunk = writer.write_rows(rows)
+            # O deflate só libera bytes quando acumula o suficiente
+            if chunk:
+                yield chunk
+        yield writer.close()
+
+def streaming_download(chunks, mimetype, filename, description):
+    """Resposta de download em streaming; falhas até o primeiro pedaço ainda viram um erro 500 em JSON."""
+    try:
+        # Antecipa o primeiro pedaço para que falhas de conexão ainda virem uma resposta 500
+        first_chunk = next(chunks)
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao exportar {description}: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
+
+    def generate():
+        try:
+            yield first_chunk
+            yield from chunks
+        except Exception as e:
+            # Com o status 200 já enviado, só resta registrar o erro e encerrar o stream
+            print(f"Erro durante a exportação de {description}: {e}")
+        finally:
+            chunks.close()
+
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',
+    })
+
+@bp.route('/api/export/<kind>', methods=['GET'])
+def export_financial(kind):
+    """Exporta agendamentos (/api/export/appointments) ou despesas (/api/export/expenses) de um período.
+
+    ?format=csv (padrão) ou xlsx; filtros ?from=AAAA-MM-DD&to=AAAA-MM-DD e, para agendamentos,
+    ?barberId= e ?status= (padrão Concluído).
+    """
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado.'}), 403
+    if kind not in EXPORT_SPECS:
+        return jsonify({'message': f"Tipo de exportação inválido. Use: {', '.join(EXPORT_SPECS)}."}), 404
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'xlsx'):
+        return jsonify({'message': 'Formato inválido. Use csv ou xlsx.'}), 400
+    try:
+        filters = export_filters(kind, request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if fmt == 'csv':
+        chunks, mimetype = stream_copy_csv(kind, filters), 'text/csv'
+    else:
+        chunks, mimetype = stream_xlsx(kind, filters), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    period = f"{filters.get('from', 'inicio')}_{filters.get('to', date.today())}"
+    filename = f"{EXPORT_SPECS[kind]['filename']}_{period}.{fmt}"
+    return streaming_download(chunks, mimetype, filename, EXPORT_SPECS[kind]['filename'])
 
 # --- NOVA ROTA: ARQUIVAR/DESARQUIVAR AGENDAMENTO ---
 
-@app.route('/api/appointments/<int:id>/archive', methods=['PUT'])
+@bp.route('/api/appointments/<int:id>/archive', methods=['PUT'])
 def archive_appointment(id):
     """Arquiva ou desarquiva (toggle) um agendamento."""
     if get_role() != 'admin':
         return jsonify({'message': 'Acesso negado.'}), 403
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
-
     try:
         data = request.get_json()
         # O padrão é arquivar (True) se não for especificado
         is_archived = data.get('isArchived', True) 
 
-        with conn.cursor() as cur:
-            cur.execute("UPDATE appointments SET is_archived = %s WHERE id = %s RETURNING id;", (is_archived, id))
-            if cur.fetchone():
+        with db_connection() as conn:
+            # O rollup de receita é atualizado na mesma transação
+            if update_appointments_tracked(conn, "is_archived = %s", [is_archived], [id]):
+                bump_cache_version(conn, 'dashboard')
                 conn.commit()
+                dashboard_cache.invalidate()
                 action = 'Arquivado' if is_archived else 'Desarquivado'
                 return jsonify({'message': f'Agendamento {id} {action} com sucesso.'})
             return jsonify({'message': 'Agendamento não encontrado.'}), 404
             
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao arquivar/desarquivar agendamento: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
-    finally:
-        conn.close()
 
 # --- Rotas de Despesas (Mantidas) ---
 
-@app.route('/api/expenses', methods=['GET', 'POST'])
+def month_range(year, month):
+    """Intervalo semiaberto [primeiro dia do mês, primeiro dia do mês seguinte)."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def _period_args():
+    """Lê ?year=&month= (mês ou ano inteiro) ou ?from=&to= (datas inclusivas) e retorna [início, fim).
+
+    Usado pelas despesas e pelos relatórios.
+
+    Sem parâmetros, usa o mês atual. Lança ValueError para valores inválidos.
+    """
+    args = request.args
+    if args.get('from') or args.get('to'):
+        start = datetime.strptime(args['from'], '%Y-%m-%d').date()
+        try:
+            end = datetime.strptime(args['to'], '%Y-%m-%d').date() + timedelta(days=1)
+        except OverflowError:
+            # to=9999-12-31: o dia seguinte não cabe em date
+            raise ValueError('data final fora do intervalo suportado')
+        if end <= start:
+            raise ValueError('período vazio')
+        return start, end
+    today = date.today()
+    year = int(args.get('year', today.year))
+    if 'month' not in args and 'year' in args:
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    return month_range(year, int(args.get('month', today.month)))
+
+def fetch_expenses(cur, start, end):
+    """Despesas em [start, end) com o total do período e os totais por mês, em uma única consulta."""
+    cur.execute("""
+        SELECT id, description, amount, expense_date,
+               SUM(amount) OVER () AS period_total,
+               SUM(amount) OVER (PARTITION BY date_trunc('month', expense_date)) AS month_total
+        FROM monthly_expenses
+        WHERE expense_date >= %s AND expense_date < %s
+        ORDER BY expense_date DESC, id DESC;
+    """, (start, end))
+    rows = cur.fetchall()
+
+    items = []
+    monthly_totals = {}
+    for row in rows:
+        monthly_totals[row['expense_date'].strftime('%Y-%m')] = float(row['month_total'])
+        items.append({
+            'id': row['id'],
+            'description': row['description'],
+            'amount': float(row['amount']),
+            'expense_date': row['expense_date'].strftime('%d-%m-%Y'),
+        })
+    return {
+        'from': start.strftime('%Y-%m-%d'),
+        'to': (end - timedelta(days=1)).strftime('%Y-%m-%d'),
+        'items': items,
+        'total': float(rows[0]['period_total']) if rows else 0.0,
+        'monthlyTotals': [{'month': month, 'total': total} for month, total in sorted(monthly_totals.items())],
+    }
+
+@bp.route('/api/expenses', methods=['GET', 'POST'])
 def manage_expenses():
     """Gerencia a listagem e adição de despesas mensais."""
     if get_role() != 'admin':
         return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem gerenciar despesas.'}), 403
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
-
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             if request.method == 'GET':
-                # Pega despesas do mês atual
-                cur.execute("""
-                    SELECT id, description, amount, expense_date 
-                    FROM monthly_expenses
-                    WHERE EXTRACT(MONTH FROM expense_date) = EXTRACT(MONTH FROM CURRENT_DATE)
-                    AND EXTRACT(YEAR FROM expense_date) = EXTRACT(YEAR FROM CURRENT_DATE)
-                    ORDER BY expense_date DESC;
-                """)
-                expenses = cur.fetchall()
-                for exp in expenses:
-                    exp['expense_date'] = exp['expense_date'].strftime('%d-%m-%Y')
-                    exp['amount'] = float(exp['amount'])
-                return jsonify(expenses)
+                # Despesas do período pedido (padrão: mês atual) com os totais na mesma consulta
+                try:
+                    start, end = _period_args()
+                except (KeyError, ValueError):
+                    return jsonify({'message': 'Período inválido. Use year/month ou from/to (AAAA-MM-DD).'}), 400
+                return jsonify(fetch_expenses(cur, start, end))
 
             elif request.method == 'POST':
                 data = request.get_json()
@@ -384,125 +2789,512 @@ def manage_expenses():
                 """, (description, amount, expense_date))
                 
                 new_id = cur.fetchone()['id']
+                bump_cache_version(conn, 'dashboard')
                 conn.commit()
+                dashboard_cache.invalidate()
                 return jsonify({'message': f'Despesa "{description}" adicionada com ID {new_id}.'}), 201
 
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        conn.rollback()
         print(f"Erro na gestão de despesas: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
-    finally:
-        conn.close()
 
-@app.route('/api/expenses/<int:id>', methods=['DELETE'])
+@bp.route('/api/expenses/<int:id>', methods=['DELETE'])
 def delete_expense(id):
     """Exclui uma despesa pelo ID."""
     if get_role() != 'admin':
         return jsonify({'message': 'Acesso negado.'}), 403
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
-
     try:
-        with conn.cursor() as cur:
+        with db_connection() as conn, conn.cursor() as cur:
             cur.execute("DELETE FROM monthly_expenses WHERE id = %s RETURNING id;", (id,))
             if cur.fetchone():
+                bump_cache_version(conn, 'dashboard')
                 conn.commit()
+                dashboard_cache.invalidate()
                 return jsonify({'message': f'Despesa ID {id} excluída com sucesso.'})
             return jsonify({'message': 'Despesa não encontrada.'}), 404
             
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao excluir despesa: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
-    finally:
-        conn.close()
 
 
 # --- ROTA DO DASHBOARD (Mantida) ---
 
-@app.route('/api/dashboard', methods=['GET'])
+def _compute_dashboard(cur, today):
+    """Executa as consultas do dashboard e retorna o payload."""
+    # Mês corrente como intervalo semiaberto [início, início do mês seguinte)
+    first_day_of_month, first_day_of_next_month = month_range(today.year, today.month)
+    
+    # 1. Receita Total e Agendamentos Concluídos do Mês (rollup daily_revenue: Concluídos e NÃO ARQUIVADOS)
+    cur.execute("""
+        SELECT SUM(revenue) as total_revenue, SUM(appointments) as completed_count
+        FROM daily_revenue
+        WHERE revenue_date >= %s AND revenue_date < %s;
+    """, (first_day_of_month, first_day_of_next_month))
+    
+    revenue_result = cur.fetchone()
+    total_revenue = float(revenue_result['total_revenue'] or 0.0)
+    completed_count = int(revenue_result['completed_count'] or 0)
+
+    # 2. Despesas Totais do Mês
+    cur.execute("""
+        SELECT SUM(amount) as total_expenses
+        FROM monthly_expenses
+        WHERE expense_date >= %s AND expense_date < %s;
+    """, (first_day_of_month, first_day_of_next_month))
+    
+    expense_result = cur.fetchone()
+    total_expenses = float(expense_result['total_expenses'] or 0.0)
+
+    net_income = total_revenue - total_expenses
+    
+    # 3. Dados Diários para o Gráfico (últimos 30 dias, a partir do rollup)
+    cur.execute("""
+        SELECT 
+            revenue_date as appointment_date,
+            SUM(revenue) as daily_revenue,
+            SUM(appointments) as daily_appointments
+        FROM daily_revenue
+        WHERE revenue_date >= %s
+        GROUP BY revenue_date
+        HAVING SUM(appointments) > 0
+        ORDER BY revenue_date;
+    """, (today - timedelta(days=30),))
+    daily_data_raw = cur.fetchall()
+    
+    daily_data = []
+    for row in daily_data_raw:
+        date_str = row['appointment_date'].strftime('%Y-%m-%d')
+        daily_data.append({
+            'date': date_str,
+            'revenue': float(row['daily_revenue'] or 0.0),
+            'appointments': int(row['daily_appointments'] or 0)
+        })
+
+    return {
+        'totalRevenue': total_revenue,
+        'completedAppointments': completed_count,
+        'totalExpenses': total_expenses,
+        'netIncome': net_income,
+        'dailyData': daily_data 
+    }
+
+@bp.route('/api/dashboard', methods=['GET'])
 def get_dashboard_data():
     """Calcula e retorna dados do dashboard, incluindo dados diários para o gráfico."""
     if get_role() != 'admin':
         return jsonify({'message': 'Acesso negado.'}), 403
 
-    conn = get_db_connection()
-    if conn is None:
+    today = date.today()
+    try:
+        # Chaveado pelo dia, que define o mês dos totais e a janela de 30 dias do gráfico
+        body, etag = dashboard_cache.get(today, lambda cur: _compute_dashboard(cur, today))
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao obter dados do dashboard: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
+
+    return _json_response_with_etag(body, etag, 'private, no-cache')
+
+
+# --- RELATÓRIOS FINANCEIROS ---
+# Receita (rollup daily_revenue: todos os Concluídos, inclusive os já arquivados, ao contrário do
+# dashboard, que só mostra os não arquivados), agendamentos, despesas lançadas e a despesa fixa mensal (FIXED_EXPENSES, rateada pelos dias de
+# cada mês) por dia/semana/mês, por barbeiro e por serviço, para o período pedido e para o período
+# anterior (mesma duração). Tudo numa consulta: um calendário de dias dos dois períodos recebe os
+# fatos das duas tabelas e GROUPING SETS devolve cada agregação como um conjunto de linhas.
+REPORT_BUCKETS = ('day', 'week', 'month')     # semanas começam na segunda-feira (date_trunc)
+REPORT_MAX_DAYS = 3 * 366                     # período atual; o anterior é lido junto
+
+REPORT_SQL = """
+    WITH days AS (
+        SELECT day::date AS day,
+               day >= %(start)s AS current,
+               date_trunc(%(bucket)s, day)::date AS bucket,
+               %(fixed_expenses)s / EXTRACT(DAY FROM date_trunc('month', day) + INTERVAL '1 month - 1 day')
+                   AS fixed_expenses
+        FROM generate_series(%(previous_start)s::timestamp, %(end)s::timestamp - INTERVAL '1 day',
+                             INTERVAL '1 day') AS day
+    ),
+    facts AS (
+        SELECT d.current, d.bucket, r.barber_id, r.service_name,
+               r.revenue + r.archived_revenue AS revenue, r.appointments + r.archived_appointments AS appointments,
+               0 AS expenses, 0 AS fixed_expenses
+        FROM daily_revenue r
+        JOIN days d ON d.day = r.revenue_date
+        WHERE r.revenue_date >= %(previous_start)s AND r.revenue_date < %(end)s
+        UNION ALL
+        SELECT d.current, d.bucket, NULL, NULL, 0, 0, e.amount, 0
+        FROM monthly_expenses e
+        JOIN days d ON d.day = e.expense_date
+        WHERE e.expense_date >= %(previous_start)s AND e.expense_date < %(end)s
+        UNION ALL
+        SELECT current, bucket, NULL, NULL, 0, 0, 0, fixed_expenses
+        FROM days
+    )
+    SELECT current, bucket, barber_id, service_name,
+           GROUPING(bucket, barber_id, service_name) AS grouping_set,
+           SUM(revenue) AS revenue, SUM(appointments) AS appointments,
+           SUM(expenses) AS expenses, SUM(fixed_expenses) AS fixed_expenses,
+           -- Participação na receita do período (relevante nas linhas por barbeiro e por serviço)
+           SUM(revenue) / NULLIF(SUM(SUM(revenue)) OVER (
+               PARTITION BY current, GROUPING(bucket, barber_id, service_name)), 0) AS revenue_share
+    FROM facts
+    GROUP BY GROUPING SETS ((current, bucket), (current, barber_id), (current, service_name), (current))
+    -- Despesas não têm barbeiro/serviço: ficam fora dos conjuntos por barbeiro e por serviço
+    HAVING (GROUPING(barber_id) = 1 OR barber_id IS NOT NULL)
+       AND (GROUPING(service_name) = 1 OR service_name IS NOT NULL)
+    ORDER BY current, grouping_set, bucket, revenue DESC;
+"""
+# Valor de GROUPING(bucket, barber_id, service_name) de cada conjunto (bit 1 = coluna agregada)
+REPORT_SERIES, REPORT_BY_BARBER, REPORT_BY_SERVICE, REPORT_TOTALS = 0b011, 0b101, 0b110, 0b111
+
+def _report_figures(row):
+    revenue = float(row['revenue'])
+    expenses = float(row['expenses'])
+    fixed_expenses = round(float(row['fixed_expenses']), 2)
+    return {
+        'revenue': revenue,
+        'appointments': int(row['appointments']),
+        'expenses': expenses,
+        'fixedExpenses': fixed_expenses,
+        'netIncome': round(revenue - expenses - fixed_expenses, 2),
+    }
+
+def _percent_change(current, previous):
+    """Variação percentual em relação ao período anterior (None se o anterior é zero).
+
+    Divide pelo valor absoluto: com base negativa (ex.: prejuízo), o sinal continua dizendo se melhorou.
+    """
+    return round((current - previous) / abs(previous) * 100, 1) if previous else None
+
+def _report_breakdown(current_rows, previous_rows, key, label):
+    """Receita e agendamentos por barbeiro/serviço, com participação e comparação com o período anterior."""
+    previous = {row[key]: row for row in previous_rows}
+    breakdown = []
+    for row in current_rows:
+        before = previous.pop(row[key], None)
+        revenue = float(row['revenue'])
+        previous_revenue = float(before['revenue']) if before else 0.0
+        breakdown.append({
+            label: row[key],
+            'revenue': revenue,
+            'appointments': int(row['appointments']),
+            'revenueShare': round(float(row['revenue_share'] or 0), 4),
+            'previousRevenue': previous_revenue,
+            'previousAppointments': int(before['appointments']) if before else 0,
+            'revenueChange': _percent_change(revenue, previous_revenue),
+        })
+    # Quem só aparece no período anterior (ex.: barbeiro que saiu) também entra, com receita 0
+    for row in previous.values():
+        breakdown.append({
+            label: row[key], 'revenue': 0.0, 'appointments': 0, 'revenueShare': 0.0,
+            'previousRevenue': float(row['revenue']), 'previousAppointments': int(row['appointments']),
+            'revenueChange': -100.0 if float(row['revenue']) else None,
+        })
+    return breakdown
+
+def previous_period_start(start, end):
+    """Início do período anterior a [start, end): os mesmos N meses antes, se o período é de meses inteiros
+    (mês anterior, ano anterior), senão o mesmo número de dias antes."""
+    if start.day == 1 and end.day == 1:
+        months = (end.year - start.year) * 12 + end.month - start.month
+        year, month = divmod(start.year * 12 + start.month - 1 - months, 12)
+        return date(year, month + 1, 1)
+    return start - (end - start)
+
+def build_report(cur, start, end, bucket):
+    """Relatório de [start, end) por `bucket` (day/week/month) comparado ao período anterior."""
+    previous_start = previous_period_start(start, end)
+    cur.execute(REPORT_SQL, {
+        'start': start, 'end': end, 'previous_start': previous_start, 'bucket': bucket,
+        'fixed_expenses': FIXED_EXPENSES,
+    })
+    sets = {(current, grouping_set): [] for current in (True, False)
+            for grouping_set in (REPORT_SERIES, REPORT_BY_BARBER, REPORT_BY_SERVICE, REPORT_TOTALS)}
+    for row in cur.fetchall():
+        sets[(row['current'], row['grouping_set'])].append(row)
+
+    empty = {'revenue': 0, 'appointments': 0, 'expenses': 0, 'fixed_expenses': 0}
+    totals = _report_figures((sets[(True, REPORT_TOTALS)] or [empty])[0])
+    previous_totals = _report_figures((sets[(False, REPORT_TOTALS)] or [empty])[0])
+    return {
+        'from': start.strftime('%Y-%m-%d'),
+        'to': (end - timedelta(days=1)).strftime('%Y-%m-%d'),
+        'bucket': bucket,
+        'previousPeriod': {
+            'from': previous_start.strftime('%Y-%m-%d'),
+            'to': (start - timedelta(days=1)).strftime('%Y-%m-%d'),
+        },
+        'totals': totals,
+        'previousTotals': previous_totals,
+        'change': {name: _percent_change(totals[name], previous_totals[name])
+                   for name in ('revenue', 'appointments', 'expenses', 'netIncome')},
+        'series': [{'bucket': row['bucket'].strftime('%Y-%m-%d'), **_report_figures(row)}
+                   for row in sets[(True, REPORT_SERIES)]],
+        'previousSeries': [{'bucket': row['bucket'].strftime('%Y-%m-%d'), **_report_figures(row)}
+                           for row in sets[(False, REPORT_SERIES)]],
+        'byBarber': _report_breakdown(sets[(True, REPORT_BY_BARBER)], sets[(False, REPORT_BY_BARBER)],
+                                      'barber_id', 'barberId'),
+        'byService': _report_breakdown(sets[(True, REPORT_BY_SERVICE)], sets[(False, REPORT_BY_SERVICE)],
+                                       'service_name', 'serviceName'),
+    }
+
+@bp.route('/api/reports', methods=['GET'])
+def get_report():
+    """Relatório financeiro por período (?year=&month= ou ?from=&to=, padrão mês atual) e ?bucket=day|week|month."""
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado.'}), 403
 
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            # Data Inicial do Mês
-            first_day_of_month = date.today().replace(day=1).strftime('%Y-%m-%d')
-            
-            # 1. Receita Total e Agendamentos Concluídos do Mês (Apenas Agendamentos NÃO ARQUIVADOS)
-            cur.execute("""
-                SELECT SUM(service_price) as total_revenue, COUNT(*) as completed_count
-                FROM appointments
-                WHERE status = 'Concluído' 
-                AND is_archived = FALSE -- APENAS NÃO ARQUIVADOS
-                AND appointment_date >= %s;
-            """, (first_day_of_month,))
-            
-            revenue_result = cur.fetchone()
-            total_revenue = float(revenue_result['total_revenue'] or 0.0)
-            completed_count = revenue_result['completed_count'] or 0
+        start, end = _period_args()
+        # O período de comparação também precisa caber em date (ex.: year=1)
+        previous_period_start(start, end)
+    except (KeyError, ValueError, OverflowError):
+        return jsonify({'message': 'Período inválido. Use year/month ou from/to (AAAA-MM-DD).'}), 400
+    if (end - start).days > REPORT_MAX_DAYS:
+        return jsonify({'message': f'Período muito longo (máximo de {REPORT_MAX_DAYS} dias).'}), 400
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in REPORT_BUCKETS:
+        return jsonify({'message': f"Agrupamento inválido. Use: {', '.join(REPORT_BUCKETS)}."}), 400
 
-            # 2. Despesas Totais do Mês
-            cur.execute("""
-                SELECT SUM(amount) as total_expenses
-                FROM monthly_expenses
-                WHERE expense_date >= %s;
-            """, (first_day_of_month,))
-            
-            expense_result = cur.fetchone()
-            total_expenses = float(expense_result['total_expenses'] or 0.0)
+    try:
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            return jsonify(build_report(cur, start, end, bucket))
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
+    except Exception as e:
+        print(f"Erro ao gerar relatório: {e}")
+        return jsonify({'message': f'Erro interno: {e}'}), 500
 
-            net_income = total_revenue - total_expenses
-            
-            # 3. Dados Diários para o Gráfico (últimos 30 dias de agendamentos CONCLUÍDOS e NÃO ARQUIVADOS)
-            cur.execute("""
-                SELECT 
-                    appointment_date,
-                    SUM(service_price) as daily_revenue,
-                    COUNT(*) as daily_appointments
-                FROM appointments
-                WHERE status = 'Concluído' 
-                AND is_archived = FALSE -- APENAS NÃO ARQUIVADOS
-                AND appointment_date >= (CURRENT_DATE - INTERVAL '30 days')
-                GROUP BY appointment_date
-                ORDER BY appointment_date;
-            """)
-            daily_data_raw = cur.fetchall()
-            
-            daily_data = []
-            for row in daily_data_raw:
-                date_str = row['appointment_date'].strftime('%Y-%m-%d')
-                daily_data.append({
-                    'date': date_str,
-                    'revenue': float(row['daily_revenue'] or 0.0),
-                    'appointments': row['daily_appointments'] or 0
-                })
-
-            return jsonify({
-                'totalRevenue': total_revenue,
-                'completedAppointments': completed_count,
-                'totalExpenses': total_expenses,
-                'netIncome': net_income,
-                'dailyData': daily_data 
-            })
+# --- ROTA DE MONITORAMENTO DO POOL ---
+
+@bp.route('/api/health/pool', methods=['GET'])
+def get_pool_stats():
+    """Retorna estatísticas do pool de conexões deste processo (tamanho, uso, esperas e reciclagens)."""
+    # Detalhes internos: só para o admin ou para quem tem o token das métricas
+    if not monitoring_authorized():
+        return jsonify({'message': 'Acesso negado.'}), 403
+    try:
+        return jsonify(get_pool().stats())
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 503
 
+# --- CONSULTAS LENTAS (ADMIN) ---
+
+@bp.route('/api/admin/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Consultas lentas capturadas, agrupadas pelo SQL (sem parâmetros) e ordenadas pelo tempo total."""
+    if get_role() != 'admin':
+        return jsonify({'message': 'Acesso negado. Apenas Barbeiros (Admin) podem ver consultas lentas.'}), 403
+    limit = request.args.get('limit', default=20, type=int)
+    if limit is None or not 1 <= limit <= 100:
+        return jsonify({'message': 'limit deve estar entre 1 e 100.'}), 400
+
+    try:
+        with db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            # Totais por consulta + a amostra mais lenta (SQL exato, parâmetros e plano) de cada uma
+            cur.execute("""
+                SELECT totals.*, slowest.route, slowest.sql_text, slowest.params, slowest.plan,
+                       slowest.plan_analyzed, slowest.captured_at AS slowest_at
+                FROM (
+                    SELECT query_hash, MIN(query_template) AS query_template, COUNT(*) AS samples,
+                           SUM(duration_ms) AS total_ms, AVG(duration_ms) AS avg_ms, MAX(duration_ms) AS max_ms,
+                           MAX(captured_at) AS last_seen
+                    FROM slow_query_log
+                    GROUP BY query_hash
+                    ORDER BY total_ms DESC
+                    LIMIT %s
+                ) totals
+                CROSS JOIN LATERAL (
+                    SELECT route, sql_text, params, plan, plan_analyzed, captured_at
+                    FROM slow_query_log l
+                    WHERE l.query_hash = totals.query_hash
+                    ORDER BY duration_ms DESC
+                    LIMIT 1
+                ) slowest
+                ORDER BY totals.total_ms DESC;
+            """, (limit,))
+            rows = cur.fetchall()
+    except DatabaseUnavailable as e:
+        print(f"Erro ao conectar ao PostgreSQL: {e}")
+        return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     except Exception as e:
-        print(f"Erro ao obter dados do dashboard: {e}")
+        print(f"Erro ao listar consultas lentas: {e}")
         return jsonify({'message': f'Erro interno: {e}'}), 500
-    finally:
-        conn.close()
+
+    return jsonify([{
+        'queryHash': row['query_hash'],
+        'query': row['query_template'],
+        'samples': row['samples'],
+        'totalMs': float(row['total_ms']),
+        'avgMs': round(float(row['avg_ms']), 3),
+        'maxMs': float(row['max_ms']),
+        'lastSeen': row['last_seen'].isoformat(),
+        'slowest': {
+            'route': row['route'],
+            'sql': row['sql_text'],
+            'params': row['params'],
+            'plan': row['plan'],
+            'planAnalyzed': row['plan_analyzed'],
+            'capturedAt': row['slowest_at'].isoformat(),
+        },
+    } for row in rows])
+
+# --- MÉTRICAS (PROMETHEUS) ---
+# Opcional: com METRICS_TOKEN definido, /metrics exige 'Authorization: Bearer <token>'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+def monitoring_authorized():
+    """Sessão de admin ou 'Authorization: Bearer <METRICS_TOKEN>' (quando o token está definido)."""
+    if get_role() == 'admin':
+        return True
+    return bool(METRICS_TOKEN) and request.headers.get('Authorization') == f'Bearer {METRICS_TOKEN}'
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas no formato texto do Prometheus (somadas entre os workers do gunicorn)."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'message': 'Acesso negado.'}), 403
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+# --- COMANDOS DE MANUTENÇÃO (flask --app barberflow_backend <comando>) ---
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Aplica as migrações pendentes, cria as partições e insere os dados iniciais (rodar no deploy)."""
+    if not initialize_db():
+        raise SystemExit(1)
+    print("Banco de dados pronto.")
+
+@bp.cli.command('rebuild-revenue')
+def rebuild_revenue_command():
+    """Recalcula a tabela daily_revenue a partir de appointments."""
+    with db_connection() as conn:
+        rows = rebuild_daily_revenue(conn)
+        conn.commit()
+    print(f"daily_revenue reconstruída: {rows} linhas.")
+
+@bp.cli.command('ensure-partitions')
+@click.option('--months-ahead', type=int, default=None, help='Meses futuros (padrão: PARTITION_MONTHS_AHEAD).')
+def ensure_partitions_command(months_ahead):
+    """Cria as partições mensais futuras de appointments (rodar periodicamente, ex.: cron diário)."""
+    with db_connection() as conn:
+        created = ensure_appointment_partitions(conn, months_ahead)
+        conn.commit()
+    print(f"Partições criadas: {', '.join(created)}" if created else "Nenhuma partição nova necessária.")
+
+@bp.cli.command('auto-archive')
+@click.option('--days', type=int, default=None, help='Idade mínima em dias (padrão: AUTO_ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Linhas por lote (padrão: AUTO_ARCHIVE_BATCH_SIZE).')
+def auto_archive_command(days, batch_size):
+    """Arquiva agendamentos Concluído/Cancelado antigos em lotes."""
+    with db_connection() as conn:
+        result = auto_archive(conn, days, batch_size)
+    if result is None:
+        print("Outra execução do arquivamento automático está em andamento.")
+    else:
+        print(f"{result['archived']} agendamentos arquivados em {result['batches']} lotes ({result['seconds']}s).")
+
+@bp.cli.command('import-csv')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_SPECS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--encoding', default='utf-8-sig', show_default=True, help='Codificação do arquivo (ex.: latin-1).')
+def import_csv_command(kind, path, encoding):
+    """Importa um CSV de agendamentos ou despesas (validação, COPY e INSERT em lote)."""
+    try:
+        with open(path, 'rb') as f:
+            result = run_import(kind, f, encoding)
+    except (InvalidImportFile, LookupError) as e:
+        raise click.ClickException(str(e))
+    print(f"{result['imported']} linhas importadas, {result['rejected']} rejeitadas "
+          f"({result['seconds']}s, {result['rowsPerSecond']} linhas/s).")
+    for reject in result['rejects']:
+        print(f"  linha {reject['line']}: {reject['message']}")
 
 
 # --- 3. CONTEÚDO HTML E JAVASCRIPT (ATUALIZADO) ---
 
+# Assets gerados por build_assets.py (static/manifest.json -> arquivos com hash em static/dist/).
+# Sem o build, ou para uma etapa que falhou, a página volta a usar as CDNs originais.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ASSET_CDN_FALLBACKS = {
+    'chart.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.3/dist/chart.umd.min.js',
+    'inter.css': 'https://fonts.googleapis.com/css2?family=Inter:wght@100..900&display=swap',
+    'background': 'https://raw.githubusercontent.com/Rainando025/barberflow/refs/heads/main/barbearia5.jpg',
+    'logo': 'https://raw.githubusercontent.com/Rainando025/barberflow/refs/heads/main/logo.png',
+}
+
+def load_asset_manifest():
+    """Lê static/manifest.json, ignorando entradas cujo arquivo não existe; {} se não houver build."""
+    try:
+        with open(os.path.join(STATIC_DIR, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: f"/static/{path}" for name, path in manifest.items()
+            if os.path.isfile(os.path.join(STATIC_DIR, path))}
+
+def asset_head_tags(assets):
+    """<link>/<script> do CSS, da fonte e do Chart.js (locais se compilados, senão CDN)."""
+    if 'tailwind.css' in assets:
+        tailwind = f'<link rel="stylesheet" href="{assets["tailwind.css"]}">'
+    else:
+        # Fallback: Tailwind Play CDN (compila o CSS no navegador)
+        tailwind = '<script src="https://cdn.tailwindcss.com"></script>'
+    font = assets.get('inter.css', ASSET_CDN_FALLBACKS['inter.css'])
+    chart = assets.get('chart.js', ASSET_CDN_FALLBACKS['chart.js'])
+    return (f'{tailwind}\n'
+            f'    <link rel="stylesheet" href="{font}">\n'
+            f'    <script src="{chart}"></script>')
+
+def _background_image_set(assets, width):
+    fallback = assets['background-1920.jpg']
+    webp = assets.get(f'background-{width}.webp', fallback)
+    return f"image-set(url('{webp}') type('image/webp'), url('{fallback}') type('image/jpeg'))"
+
+def background_css(assets):
+    """Declarações background-image do body: WebP 1920px com JPEG para navegadores sem WebP."""
+    if 'background-1920.jpg' not in assets:
+        return f"background-image: url('{ASSET_CDN_FALLBACKS['background']}');"
+    return (f"background-image: url('{assets['background-1920.jpg']}');\n"
+            f"            background-image: {_background_image_set(assets, 1920)};")
+
+def background_media_css(assets):
+    """Regras @media que trocam o fundo por variantes menores em telas estreitas."""
+    if 'background-1920.jpg' not in assets:
+        return ''
+    return '\n        '.join(f"@media (max-width: {width}px) {{ body {{ background-image: {_background_image_set(assets, width)}; }} }}"
+                     for width in (1280, 768))
+
+def logo_img(assets, css_class):
+    """<picture> do logo com WebP 1x/2x e PNG de fallback."""
+    attrs = f'alt="Logo BarberFlow" onerror="this.style.display=\'none\'"\n                         class="{css_class}"'
+    if 'logo-192.png' not in assets:
+        return f'<img src="{ASSET_CDN_FALLBACKS["logo"]}" {attrs}>'
+    srcset = ', '.join(f"{assets[f'logo-{size}.webp']} {size // 96}x" for size in (96, 192) if f'logo-{size}.webp' in assets)
+    return (f'<picture><source type="image/webp" srcset="{srcset}">'
+            f'<img src="{assets["logo-192.png"]}" width="96" height="96" {attrs}></picture>')
+
+ASSETS = load_asset_manifest()
+
 # O frontend é injetado como um template de string em Flask.
 HTML_TEMPLATE = f"""
 <!DOCTYPE html>
@@ -511,24 +3303,22 @@ HTML_TEMPLATE = f"""
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>BarberFlow - Agendamento e Gestão </title>
-    <!-- Carrega Tailwind CSS -->
-    <script src="https://cdn.tailwindcss.com"></script>
-    <!-- Carrega Chart.js para gráficos dinâmicos -->
-    <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.3/dist/chart.umd.min.js"></script>
+    <!-- Tailwind CSS compilado, fonte Inter e Chart.js (static/dist via build_assets.py, ou CDN) -->
+    {asset_head_tags(ASSETS)}
     
     <!-- Configuração de Fonte Inter -->
     <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@100..900&display=swap');
         body {{
             font-family: 'Inter', sans-serif;
             background-color: #f3f4f6;
-            background-image: url('https://raw.githubusercontent.com/Rainando025/barberflow/refs/heads/main/barbearia5.jpg');
+            {background_css(ASSETS)}
             background-size: cover;
             background-position: center;
             background-repeat: no-repeat;
             background-attachment: fixed;
             color: #eee;
         }}
+        {background_media_css(ASSETS)}
         #loading-overlay {{
             z-index: 50;
         }}
@@ -571,8 +3361,7 @@ HTML_TEMPLATE = f"""
                 <div class="flex flex-col items-center space-y-4 mb-6">
                   <!-- LOGO opcional -->
                   <div class="bg-black border-2 border-yellow-500 rounded-full p-2">
-                    <img src="https://raw.githubusercontent.com/Rainando025/barberflow/refs/heads/main/logo.png" alt="Logo BarberFlow" onerror="this.style.display='none'"
-                         class="w-24 h-24 rounded-full object-cover shadow-lg">
+                    {logo_img(ASSETS, 'w-24 h-24 rounded-full object-cover shadow-lg')}
                   </div>
                   <h2 class="text-3xl font-extrabold text-yellow-400 tracking-wide text-center">
                     Autêntica<span class="text-white">Barbershop</span>
@@ -647,7 +3436,7 @@ HTML_TEMPLATE = f"""
                                 <div>
                                     <label for="time" class="block text-sm font-medium text-yellow-500">Horários Disponíveis</label>
                                     <select id="time" required class="mt-1 block w-full pl-3 pr-10 py-3 text-black border-gray-300 rounded-lg shadow-sm focus:ring-red-500 focus:border-red-500 sm:text-sm">
-                                        <option value="">-- Selecione um Barbeiro e Data --</option>
+                                        <option value="">-- Selecione Barbeiro, Serviço e Data --</option>
                                     </select>
                                 </div>
                             </div>
@@ -708,9 +3497,23 @@ HTML_TEMPLATE = f"""
                         <p class="text-sm text-orange-500 mb-4">Apenas agendamentos Ativos (não arquivados) são exibidos aqui. Arquive os agendamentos antigos/finalizados.</p>
                         <div class="bg-gray-50 p-4 rounded-lg shadow-inner">
                             <p class="text-sm text-gray-600 mb-4">Atualize o status para calcular o Fluxo de Caixa.</p>
+                            <!-- Ações em lote sobre os agendamentos marcados -->
+                            <div class="flex flex-wrap items-center gap-2 mb-4">
+                                <label class="flex items-center text-sm text-gray-700"><input type="checkbox" onchange="toggleSelectAll('appointments-list', this.checked)" class="mr-2">Selecionar todos</label>
+                                <select id="bulk-status" class="py-1 px-2 border border-gray-300 rounded-lg text-sm text-gray-900">
+                                    <option value="Concluído">Concluído</option>
+                                    <option value="Cancelado">Cancelado</option>
+                                    <option value="Agendado">Agendado</option>
+                                </select>
+                                <button onclick="bulkUpdateSelected('status')" class="px-3 py-1 text-xs font-medium rounded-full text-white bg-red-600 hover:bg-red-700 transition-colors duration-200">Aplicar status aos selecionados</button>
+                                <button onclick="bulkUpdateSelected('archive')" class="px-3 py-1 text-xs font-medium rounded-full text-white bg-gray-500 hover:bg-gray-600 transition-colors duration-200">Arquivar selecionados</button>
+                                <button onclick="archiveCompletedBeforeToday()" class="px-3 py-1 text-xs font-medium rounded-full text-white bg-gray-700 hover:bg-gray-800 transition-colors duration-200">Arquivar todos os concluídos até ontem</button>
+                            </div>
+                            <p id="appointments-list-total" class="text-xs text-gray-500 mb-2"></p>
                             <div id="appointments-list" class="space-y-4">
                                 <p class="text-center text-gray-500">Carregando agendamentos...</p>
                             </div>
+                            <div id="appointments-list-sentinel" class="h-4"></div>
                         </div>
                     </div>
 
@@ -718,10 +3521,17 @@ HTML_TEMPLATE = f"""
                     <div id="archived-tab" class="tab-content hidden">
                         <h3 class="text-xl font-semibold text-white mb-4">Agendamentos Arquivados</h3>
                         <p class="text-sm text-orange-500 mb-4">Histórico de agendamentos arquivados. Eles não afetam o dashboard principal, mas podem ser desarquivados.</p>
+                        <a href="/api/appointments/archived/export?format=json" class="inline-block mb-4 px-3 py-1 text-xs font-medium rounded-full text-white bg-gray-700 hover:bg-gray-800 transition-colors duration-200">Exportar histórico (JSON)</a>
                         <div class="bg-gray-50 p-4 rounded-lg shadow-inner">
+                            <div class="flex flex-wrap items-center gap-2 mb-4">
+                                <label class="flex items-center text-sm text-gray-700"><input type="checkbox" onchange="toggleSelectAll('archived-appointments-list', this.checked)" class="mr-2">Selecionar todos</label>
+                                <button onclick="bulkUpdateSelected('unarchive')" class="px-3 py-1 text-xs font-medium rounded-full text-white bg-blue-500 hover:bg-blue-600 transition-colors duration-200">Desarquivar selecionados</button>
+                            </div>
+                            <p id="archived-appointments-list-total" class="text-xs text-gray-500 mb-2"></p>
                             <div id="archived-appointments-list" class="space-y-4">
                                 <p class="text-center text-gray-500">Carregando agendamentos arquivados...</p>
                             </div>
+                            <div id="archived-appointments-list-sentinel" class="h-4"></div>
                         </div>
                     </div>
 
@@ -754,7 +3564,10 @@ HTML_TEMPLATE = f"""
 
                     <!-- 2.3. Gerenciamento de Despesas (Mantida) -->
                     <div id="expenses-tab" class="tab-content hidden">
-                        <h3 class="text-xl font-semibold text-white mb-4">Gerenciar Despesas do Mês</h3>
+                        <div class="flex justify-between items-center mb-4">
+                            <h3 class="text-xl font-semibold text-white">Gerenciar Despesas do Mês</h3>
+                            <input type="month" id="expenses-month" onchange="loadExpenses()" class="py-1 px-2 border border-gray-300 rounded-lg text-gray-900">
+                        </div>
                         
                         <!-- Formulário de Adição de Despesa -->
                         <form id="expense-form" onsubmit="handleExpenseSubmit(event)" class="bg-gray-50 p-6 rounded-lg shadow mb-6 space-y-4">
@@ -1060,6 +3873,50 @@ HTML_TEMPLATE = f"""
                 console.error("Erro ao carregar serviços:", error);
                 serviceSelect.innerHTML = '<option value="">-- Erro ao carregar serviços --</option>';
             }}
+            loadAvailableTimes();
+        }}
+
+        // Busca no servidor os horários livres do barbeiro para o serviço e a data escolhidos
+        let availabilityRequestId = 0;
+
+        async function loadAvailableTimes() {{
+            const barberId = document.getElementById('barber').value;
+            const serviceId = document.getElementById('service').value;
+            const date = document.getElementById('date').value;
+            const timeSelect = document.getElementById('time');
+
+            if (!barberId || !serviceId || !date) {{
+                timeSelect.innerHTML = '<option value="">-- Selecione Barbeiro, Serviço e Data --</option>';
+                return;
+            }}
+
+            const requestId = ++availabilityRequestId;
+            timeSelect.innerHTML = '<option value="">-- Carregando Horários... --</option>';
+
+            try {{
+                const params = new URLSearchParams({{ barberId: barberId, serviceId: serviceId, date: date }});
+                const response = await fetch(`/api/availability?${{params}}`);
+                const data = await response.json();
+                if (requestId !== availabilityRequestId) return; // Resposta de uma seleção anterior
+                if (!response.ok) throw new Error(data.message || 'Falha ao buscar horários.');
+
+                if (data.slots.length === 0) {{
+                    timeSelect.innerHTML = '<option value="">-- Nenhum horário livre nesta data --</option>';
+                    return;
+                }}
+
+                timeSelect.innerHTML = '<option value="">-- Selecione o Horário --</option>';
+                data.slots.forEach(slot => {{
+                    const option = document.createElement('option');
+                    option.value = slot;
+                    option.textContent = slot;
+                    timeSelect.appendChild(option);
+                }});
+            }} catch (error) {{
+                if (requestId !== availabilityRequestId) return;
+                console.error("Erro ao carregar horários:", error);
+                timeSelect.innerHTML = '<option value="">-- Erro ao carregar horários --</option>';
+            }}
         }}
         
         async function handleAppointmentSubmit(event) {{
@@ -1099,10 +3956,12 @@ HTML_TEMPLATE = f"""
 
                 const result = await response.json();
 
+                if (response.status === 409) loadAvailableTimes(); // Horário foi ocupado por outra pessoa
                 if (!response.ok) throw new Error(result.message || 'Erro ao agendar.');
                 
                 openModal('Agendamento Confirmado!', `Seu agendamento para ${{appointmentData.date}} às ${{appointmentData.time}} foi confirmado. Barbeiro: ${{form.barber.options[form.barber.selectedIndex].text.split('(')[0].trim()}}`, true);
                 form.reset();
+                loadAvailableTimes();
                 
             }} catch (error) {{
                 console.error("Erro ao submeter agendamento:", error);
@@ -1124,12 +3983,13 @@ HTML_TEMPLATE = f"""
         }}
 
         // Função Genérica para Renderizar Agendamentos (Usada para Ativos e Arquivados)
-        function renderAppointmentList(appointments, listElementId, isArchivedList = false) {{
+        // Com append = true, os itens são acrescentados ao final (páginas seguintes da rolagem infinita).
+        function renderAppointmentList(appointments, listElementId, isArchivedList = false, append = false) {{
             const appointmentsListEl = document.getElementById(listElementId);
-            appointmentsListEl.innerHTML = '';
+            if (!append) appointmentsListEl.innerHTML = '';
 
             if (appointments.length === 0) {{
-                appointmentsListEl.innerHTML = `<p class="text-center text-gray-500 p-4">Nenhum agendamento ${{isArchivedList ? 'arquivado' : 'ativo'}} encontrado.</p>`;
+                if (!append) appointmentsListEl.innerHTML = `<p class="text-center text-gray-500 p-4">Nenhum agendamento ${{isArchivedList ? 'arquivado' : 'ativo'}} encontrado.</p>`;
                 return;
             }}
 
@@ -1157,9 +4017,12 @@ HTML_TEMPLATE = f"""
                 
                 const appointmentHtml = `
                     <div id="appt-${{appointmentId}}" class="p-4 bg-white rounded-lg shadow flex flex-col sm:flex-row justify-between items-start sm:items-center transition-all duration-200 hover:shadow-md">
-                        <div class="mb-2 sm:mb-0">
-                            <p class="font-bold text-lg text-gray-800">${{appointment.appointment_time}} (${{appointment.appointment_date}})</p>
+                        <div class="mb-2 sm:mb-0 flex items-start">
+                            <input type="checkbox" class="appointment-select mt-2 mr-3" value="${{appointmentId}}">
+                            <div>
+                            <p class="font-bold text-lg text-gray-800">${{appointment.appointment_time}}${{appointment.end_time ? ' - ' + appointment.end_time : ''}} (${{appointment.appointment_date}})</p>
                             <p class="text-sm text-gray-600">${{appointment.client_name}} - ${{appointment.service_name}} c/ ${{barberName}} (R$ ${{formattedPrice}})</p>
+                            </div>
                         </div>
                         <div class="flex items-center space-x-2 mt-2 sm:mt-0">
                             <span class="px-3 py-1 text-xs font-semibold rounded-full ${{statusClass}}">${{appointment.status}}</span>
@@ -1178,7 +4041,61 @@ HTML_TEMPLATE = f"""
             }});
         }}
 
-        // Carrega Agendamentos ATIVOS
+        // --- Paginação por cursor (rolagem infinita) das listas de agendamentos ---
+        const APPOINTMENTS_PAGE_SIZE = 50;
+        const appointmentPages = {{
+            active: {{ url: '/api/appointments', listId: 'appointments-list', archived: false, label: 'ativos' }},
+            archived: {{ url: '/api/appointments/archived', listId: 'archived-appointments-list', archived: true, label: 'arquivados' }},
+        }};
+        Object.values(appointmentPages).forEach(page => Object.assign(page, {{ cursor: null, done: false, loading: false, generation: 0 }}));
+
+        // Carrega a próxima página da lista (ou a primeira, com reset = true)
+        async function loadAppointmentPage(kind, reset = false) {{
+            if (userRole !== 'admin') return;
+            const page = appointmentPages[kind];
+            if (reset) {{
+                page.generation++;
+                page.cursor = null;
+                page.done = false;
+                page.loading = false;
+            }}
+            if (page.loading || page.done) return;
+
+            const generation = page.generation;
+            page.loading = true;
+            try {{
+                const params = new URLSearchParams({{ limit: APPOINTMENTS_PAGE_SIZE }});
+                if (page.cursor) params.set('cursor', page.cursor);
+                const response = await fetch(`${{page.url}}?${{params}}`);
+                if (!response.ok) throw new Error(`Falha ao buscar agendamentos ${{page.label}}.`);
+                const data = await response.json();
+                if (generation !== page.generation) return; // A lista foi recarregada nesse meio tempo
+
+                renderAppointmentList(data.items, page.listId, page.archived, !reset);
+                if (data.totalEstimate !== undefined) {{
+                    document.getElementById(`${{page.listId}}-total`).textContent = `${{data.totalEstimate}} agendamento(s) ${{page.label}} (aprox.)`;
+                }}
+                page.cursor = data.nextCursor;
+                page.done = !data.nextCursor;
+            }} finally {{
+                if (generation === page.generation) page.loading = false;
+            }}
+
+            // Se o sentinela ainda estiver visível (página curta), observar de novo dispara a próxima carga
+            const sentinel = document.getElementById(`${{page.listId}}-sentinel`);
+            appointmentsObserver.unobserve(sentinel);
+            if (!page.done) appointmentsObserver.observe(sentinel);
+        }}
+
+        const appointmentsObserver = new IntersectionObserver(entries => {{
+            entries.forEach(entry => {{
+                if (!entry.isIntersecting) return;
+                const kind = entry.target.id.startsWith('archived') ? 'archived' : 'active';
+                loadAppointmentPage(kind).catch(error => console.error("Erro ao carregar mais agendamentos:", error));
+            }});
+        }});
+
+        // Carrega Agendamentos ATIVOS (primeira página)
         async function loadAppointments() {{
             if (userRole !== 'admin') return; 
 
@@ -1186,12 +4103,7 @@ HTML_TEMPLATE = f"""
             appointmentsListEl.innerHTML = '<p class="text-center text-gray-500">Carregando agendamentos ativos...</p>';
             
             try {{
-                const response = await fetch('/api/appointments');
-                if (!response.ok) throw new Error('Falha ao buscar agendamentos ativos.');
-                const appointments = await response.json();
-
-                renderAppointmentList(appointments, 'appointments-list', false);
-                loadCashFlow(); // Recarrega o dashboard
+                await loadAppointmentPage('active', true);
             }} catch (error) {{
                 console.error("Erro ao carregar agendamentos ativos:", error);
                 openModal('Erro de Dados', error.message, false);
@@ -1199,7 +4111,7 @@ HTML_TEMPLATE = f"""
             }}
         }}
 
-        // Carrega Agendamentos ARQUIVADOS (NOVA FUNÇÃO)
+        // Carrega Agendamentos ARQUIVADOS (primeira página)
         async function loadArchivedAppointments() {{
             if (userRole !== 'admin') return; 
 
@@ -1207,11 +4119,7 @@ HTML_TEMPLATE = f"""
             archivedListEl.innerHTML = '<p class="text-center text-gray-500">Carregando agendamentos arquivados...</p>';
             
             try {{
-                const response = await fetch('/api/appointments/archived');
-                if (!response.ok) throw new Error('Falha ao buscar agendamentos arquivados.');
-                const appointments = await response.json();
-
-                renderAppointmentList(appointments, 'archived-appointments-list', true);
+                await loadAppointmentPage('archived', true);
             }} catch (error) {{
                 console.error("Erro ao carregar agendamentos arquivados:", error);
                 openModal('Erro de Dados', error.message, false);
@@ -1273,6 +4181,68 @@ HTML_TEMPLATE = f"""
             }}
         }}
 
+        // --- Ações em lote (um único request para todos os selecionados) ---
+
+        function toggleSelectAll(listElementId, checked) {{
+            document.querySelectorAll(`#${{listElementId}} .appointment-select`).forEach(box => {{ box.checked = checked; }});
+        }}
+
+        function selectedAppointmentIds(listElementId) {{
+            return Array.from(document.querySelectorAll(`#${{listElementId}} .appointment-select:checked`)).map(box => parseInt(box.value, 10));
+        }}
+
+        async function sendBulkRequest(url, payload) {{
+            showLoading(true);
+            try {{
+                const response = await fetch(url, {{
+                    method: 'POST',
+                    headers: {{ 'Content-Type': 'application/json' }},
+                    body: JSON.stringify(payload)
+                }});
+                const result = await response.json();
+                if (!response.ok) throw new Error(result.message || 'Erro na operação em lote.');
+
+                // Agrupa as falhas pelo motivo informado pelo servidor (não encontrado, horário ocupado...)
+                const failures = {{}};
+                result.results.filter(r => !r.ok).forEach(r => {{
+                    (failures[r.message] = failures[r.message] || []).push(`#${{r.id}}`);
+                }});
+                const details = Object.entries(failures).map(([message, ids]) => ` ${{message.replace(/\\.$/, '')}}: ${{ids.join(', ')}}.`).join('');
+                openModal('Operação em Lote', result.message + details, details === '');
+                loadAppointments();
+                loadArchivedAppointments();
+                loadCashFlow();
+            }} catch (error) {{
+                console.error("Erro na operação em lote:", error);
+                openModal('Erro', `Não foi possível concluir a operação em lote. ${{error.message}}`, false);
+            }} finally {{
+                showLoading(false);
+            }}
+        }}
+
+        async function bulkUpdateSelected(action) {{
+            if (userRole !== 'admin') return openModal('Permissão Negada', 'Apenas Barbeiros (Admin) podem alterar agendamentos.', false);
+            const listId = action === 'unarchive' ? 'archived-appointments-list' : 'appointments-list';
+            const ids = selectedAppointmentIds(listId);
+            if (ids.length === 0) return openModal('Nenhum Selecionado', 'Marque ao menos um agendamento.', false);
+
+            if (action === 'status') {{
+                await sendBulkRequest('/api/appointments/bulk/status', {{ ids, status: document.getElementById('bulk-status').value }});
+            }} else {{
+                await sendBulkRequest('/api/appointments/bulk/archive', {{ ids, isArchived: action === 'archive' }});
+            }}
+        }}
+
+        async function archiveCompletedBeforeToday() {{
+            if (userRole !== 'admin') return openModal('Permissão Negada', 'Apenas Barbeiros (Admin) podem gerenciar o arquivamento.', false);
+            const now = new Date();
+            const today = `${{now.getFullYear()}}-${{String(now.getMonth() + 1).padStart(2, '0')}}-${{String(now.getDate()).padStart(2, '0')}}`;
+            await sendBulkRequest('/api/appointments/bulk/archive', {{
+                filter: {{ status: 'Concluído', before: today, isArchived: false }},
+                isArchived: true
+            }});
+        }}
+
         // --- Lógica do Dashboard (Mantida) ---
         
         let myChart;
@@ -1343,12 +4313,19 @@ HTML_TEMPLATE = f"""
             }});
         }}
 
+        // ETag do último payload renderizado: se o servidor responder 304, o navegador devolve o mesmo
+        // corpo do cache e o dashboard não precisa ser redesenhado.
+        let dashboardEtag = null;
+
         async function loadCashFlow() {{
             if (userRole !== 'admin') return;
             
             try {{
-                const response = await fetch('/api/dashboard');
+                const response = await fetch('/api/dashboard', {{ cache: 'no-cache' }});
                 if (!response.ok) throw new Error('Falha ao buscar dados do dashboard.');
+                const etag = response.headers.get('ETag');
+                if (etag && etag === dashboardEtag) return;
+                dashboardEtag = etag;
                 const data = await response.json();
                 
                 const format = (value) => `R$ ${{parseFloat(value).toFixed(2).replace('.', ',')}}`;
@@ -1515,14 +4492,22 @@ HTML_TEMPLATE = f"""
 
             const expensesListEl = document.getElementById('current-expenses-list');
             expensesListEl.innerHTML = '<tr><td colspan="4" class="text-center text-gray-500 p-4">Carregando despesas...</td></tr>';
+
+            // Mês selecionado (AAAA-MM); vazio = mês atual
+            const monthInput = document.getElementById('expenses-month');
+            if (!monthInput.value) {{
+                const now = new Date();
+                monthInput.value = `${{now.getFullYear()}}-${{String(now.getMonth() + 1).padStart(2, '0')}}`;
+            }}
+            const [year, month] = monthInput.value.split('-');
             
             try {{
-                const response = await fetch('/api/expenses');
+                const response = await fetch(`/api/expenses?year=${{year}}&month=${{parseInt(month, 10)}}`);
                 if (!response.ok) throw new Error('Falha ao buscar despesas.');
-                const expenses = await response.json();
+                const data = await response.json();
+                const expenses = data.items;
 
                 expensesListEl.innerHTML = ''; 
-                let totalAmount = 0;
                 
                 if (expenses.length === 0) {{
                     expensesListEl.innerHTML = '<tr><td colspan="4" class="text-center text-gray-500 p-4">Nenhuma despesa registrada para este mês.</td></tr>';
@@ -1530,7 +4515,6 @@ HTML_TEMPLATE = f"""
                 }}
 
                 expenses.forEach((expense) => {{
-                    totalAmount += expense.amount;
                     const formattedAmount = expense.amount.toFixed(2).replace('.', ',');
                     
                     const listItem = `
@@ -1552,7 +4536,7 @@ HTML_TEMPLATE = f"""
                 expensesListEl.insertAdjacentHTML('beforeend', `
                     <tr class="bg-gray-100 font-bold">
                         <td class="px-6 py-4 whitespace-nowrap text-base text-gray-900" colspan="2">TOTAL DESPESAS (MÊS)</td>
-                        <td class="px-6 py-4 whitespace-nowrap text-base text-red-700">R$ ${{totalAmount.toFixed(2).replace('.', ',')}}</td>
+                        <td class="px-6 py-4 whitespace-nowrap text-base text-red-700">R$ ${{data.total.toFixed(2).replace('.', ',')}}</td>
                         <td class="px-6 py-4 whitespace-nowrap"></td>
                     </tr>
                 `);
@@ -1630,6 +4614,13 @@ HTML_TEMPLATE = f"""
             // Define a data atual no campo de despesa
             document.getElementById('expense-date').valueAsDate = new Date();
 
+            // Agendamento: não permite datas passadas e recarrega os horários livres a cada mudança
+            const dateInput = document.getElementById('date');
+            dateInput.min = new Date(Date.now() - new Date().getTimezoneOffset() * 60000).toISOString().split('T')[0];
+            ['barber', 'service', 'date'].forEach(id => {{
+                document.getElementById(id).addEventListener('change', loadAvailableTimes);
+            }});
+
             // Checa se já existe uma sessão de usuário ao carregar a página
             fetch('/api/login', {{ method: 'GET' }})
                 .then(response => response.json())
@@ -1672,6 +4663,9 @@ HTML_TEMPLATE = f"""
         window.handleExpenseSubmit = handleExpenseSubmit;
         window.deleteExpense = deleteExpense;
         window.archiveAppointment = archiveAppointment; // NOVO
+        window.toggleSelectAll = toggleSelectAll;
+        window.bulkUpdateSelected = bulkUpdateSelected;
+        window.archiveCompletedBeforeToday = archiveCompletedBeforeToday;
         window.loadArchivedAppointments = loadArchivedAppointments; // NOVO
         
         window.handleRoleSelection = handleRoleSelection;
@@ -1683,8 +4677,46 @@ HTML_TEMPLATE = f"""
 </html>
 """
 
+# --- 4. PÁGINA INICIAL PRÉ-RENDERIZADA ---
+# HTML_TEMPLATE não tem variáveis de template: a página é montada uma vez por processo e guardada
+# sem compressão, em gzip e (se o módulo brotli estiver instalado) em brotli. A montagem (~0,2s com
+# brotli no nível máximo) acontece no primeiro acesso, não na importação; com preload_app o
+# gunicorn.conf.py a faz no master, antes do fork.
+
+class PrebuiltPage:
+    """Corpo de uma página estática em cada Content-Encoding suportado, com ETag pelo conteúdo."""
+
+    def __init__(self, html):
+        raw = html.encode('utf-8')
+        self.etag = hashlib.sha256(raw).hexdigest()[:32]
+        self.variants = {'identity': raw, 'gzip': gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(raw, quality=11)
+
+    def choose_encoding(self, accept_encodings):
+        """Escolhe a menor variante aceita pelo cliente (br > gzip > identity)."""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return 'identity'
+
+@functools.lru_cache(maxsize=None)
+def get_index_page():
+    return PrebuiltPage(HTML_TEMPLATE)
+
+def create_app(config=None):
+    """Cria a aplicação Flask (usada pelo gunicorn, pelo 'flask' CLI e pelos scripts de benchmark)."""
+    app = Flask(__name__)
+    app.secret_key = FLASK_SECRET_KEY
+    if config:
+        app.config.update(config)
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Servidor de desenvolvimento; em produção use gunicorn (gunicorn.conf.py / Procfile.txt)
+    initialize_db()
+    create_app().run(debug=os.environ.get('FLASK_DEBUG') == '1')
 
 
 
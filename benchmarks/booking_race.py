@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Teste de estresse de reservas concorrentes contra um PostgreSQL local.
+
+Dispara centenas de POST /api/appointments ao mesmo tempo para o mesmo barbeiro e dia
+e depois confere no banco que nenhum par de agendamentos não cancelados se sobrepõe.
+
+Uso:
+    python benchmarks/booking_race.py --requests 300 --threads 50
+
+As credenciais vêm das mesmas variáveis PG_* usadas pela aplicação.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barberflow_backend as backend  # noqa: E402
+
+CLIENT_PREFIX = 'stress-'
+
+OVERLAP_SQL = """
+    SELECT COUNT(*)
+    FROM appointments a
+    JOIN appointments b ON b.barber_id = a.barber_id AND b.appointment_date = a.appointment_date AND a.id < b.id
+    WHERE a.appointment_date = %s AND a.barber_id = %s
+    AND a.status <> 'Cancelado' AND b.status <> 'Cancelado'
+    AND a.start_time < b.start_time + make_interval(mins => b.duration_minutes)
+    AND b.start_time < a.start_time + make_interval(mins => a.duration_minutes);
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='total de reservas disparadas')
+    parser.add_argument('--threads', type=int, default=50, help='clientes simultâneos')
+    parser.add_argument('--barber', default=backend.BARBERS[0])
+    args = parser.parse_args()
+
+    # Um dia bem no futuro para não colidir com dados reais
+    day = date.today() + timedelta(days=3650 + random.randint(0, 3650))
+    opening = backend._to_minutes(backend.OPENING_TIME)
+    closing = backend._to_minutes(backend.CLOSING_TIME)
+    grid = [backend._format_minutes(m) for m in range(opening, closing, backend.SLOT_INTERVAL_MINUTES)]
+
+    with backend.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT name, price FROM services;")
+        services = cur.fetchall()
+    if not services:
+        sys.exit('Nenhum serviço cadastrado; rode a aplicação uma vez para criar os dados iniciais.')
+
+    jobs = list(range(args.requests))
+    jobs_lock = threading.Lock()
+    barrier = threading.Barrier(args.threads)
+    results = []  # (status, segundos)
+    results_lock = threading.Lock()
+
+    def worker():
+        client = backend.create_app().test_client()
+        barrier.wait()
+        while True:
+            with jobs_lock:
+                if not jobs:
+                    return
+                n = jobs.pop()
+            name, price = random.choice(services)
+            payload = {
+                'barberId': args.barber,
+                'serviceName': name,
+                'servicePrice': float(price),
+                'date': day.strftime('%Y-%m-%d'),
+                'time': random.choice(grid),
+                'clientName': f'{CLIENT_PREFIX}{n}',
+            }
+            started = time.perf_counter()
+            response = client.post('/api/appointments', json=payload)
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                results.append((response.status_code, elapsed))
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    try:
+        with backend.db_connection() as conn, conn.cursor() as cur:
+            cur.execute(OVERLAP_SQL, (day, args.barber))
+            overlaps = cur.fetchone()[0]
+    finally:
+        with backend.db_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM appointments WHERE appointment_date = %s AND client_name LIKE %s;",
+                        (day, CLIENT_PREFIX + '%'))
+            conn.commit()
+
+    latencies = sorted(elapsed for _, elapsed in results)
+    by_status = {}
+    for status, _ in results:
+        by_status[status] = by_status.get(status, 0) + 1
+
+    print(f'Dia testado: {day}  barbeiro: {args.barber}')
+    print(f'Requisições: {len(results)} em {wall:.2f}s ({len(results) / wall:.1f} req/s) com {args.threads} threads')
+    print(f'Status: {dict(sorted(by_status.items()))}')
+    print(f'Latência p50={latencies[len(latencies) // 2] * 1000:.1f}ms '
+          f'p95={latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms')
+    print(f'Sobreposições encontradas: {overlaps}')
+    print(f'Pool: {backend.get_pool().stats()}')
+
+    unexpected = set(by_status) - {201, 409}
+    if overlaps or unexpected:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Confere com EXPLAIN que as consultas quentes de appointments, do rollup e de despesas usam os índices das migrações.
+
+Insere uma massa sintética grande (por padrão 200 mil linhas, ~95% arquivadas, e anos de rollup) dentro de
+uma transação, roda ANALYZE e EXPLAIN em cada consulta e, no final, faz ROLLBACK: nada
+fica no banco, nem as estatísticas. Sai com código 1 se alguma consulta não usar o índice.
+
+Uso:
+    python benchmarks/explain_indexes.py --rows 200000
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barberflow_backend as backend  # noqa: E402
+
+SYNTHETIC_ROWS_SQL = """
+    INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, start_time,
+                              duration_minutes, client_name, service_price, status, is_archived)
+    SELECT
+        'barber' || (1 + n %% 2),
+        'Corte Simples',
+        CURRENT_DATE - (n %% 1095),
+        to_char(TIME '09:00' + (n %% 40) * INTERVAL '15 minutes', 'HH24:MI'),
+        TIME '09:00' + (n %% 40) * INTERVAL '15 minutes',
+        45,
+        'explain-' || n,
+        35.00,
+        (ARRAY['Agendado', 'Concluído', 'Concluído', 'Cancelado'])[1 + n %% 4],
+        (n %% 20) <> 0
+    FROM generate_series(1, %s) AS n;
+"""
+
+SYNTHETIC_EXPENSES_SQL = """
+    INSERT INTO monthly_expenses (description, amount, expense_date)
+    SELECT 'explain-' || n, 10.00 + n %% 90, CURRENT_DATE - (n %% 1095)
+    FROM generate_series(1, %s) AS n;
+"""
+
+# O rollup cresce com dias x barbeiros x serviços, não com o número de agendamentos:
+# simula --rollup-years anos de histórico com 2 barbeiros e 8 serviços
+SYNTHETIC_ROLLUP_SQL = """
+    INSERT INTO daily_revenue (revenue_date, barber_id, service_name, revenue, appointments)
+    SELECT CURRENT_DATE - d, 'barber' || b, 'explain-' || s, 35.00 * (1 + d %% 5), 1 + d %% 5
+    FROM generate_series(0, 365 * %s) AS d, generate_series(1, 2) AS b, generate_series(1, 8) AS s
+    ON CONFLICT (revenue_date, barber_id, service_name) DO NOTHING;
+"""
+
+# (descrição, consulta, parâmetros, índice esperado no plano)
+HOT_QUERIES = [
+    ('lista de ativos (primeira página)',
+     f"SELECT {backend.APPOINTMENT_LIST_COLUMNS} FROM appointments WHERE is_archived = FALSE "
+     f"ORDER BY appointment_date, {backend.APPOINTMENT_SORT_TIME_SQL}, id LIMIT 51;",
+     (), 'idx_appointments_active_page'),
+    # Mesmo WHERE de fetch_appointment_page com cursor (inclusive o appointment_date redundante)
+    ('lista de ativos (página seguinte, keyset)',
+     f"SELECT {backend.APPOINTMENT_LIST_COLUMNS} FROM appointments WHERE is_archived = FALSE "
+     f"AND appointment_date >= %s AND (appointment_date, {backend.APPOINTMENT_SORT_TIME_SQL}, id) > (%s, TIME '10:00', 0) "
+     f"ORDER BY appointment_date, {backend.APPOINTMENT_SORT_TIME_SQL}, id LIMIT 51;",
+     (date.today(), date.today()), 'idx_appointments_active_page'),
+    ('lista de arquivados (página seguinte, keyset)',
+     f"SELECT {backend.APPOINTMENT_LIST_COLUMNS} FROM appointments WHERE is_archived = TRUE "
+     f"AND appointment_date <= %s AND (appointment_date, {backend.APPOINTMENT_SORT_TIME_SQL}, id) < (%s, TIME '10:00', 0) "
+     f"ORDER BY appointment_date DESC, {backend.APPOINTMENT_SORT_TIME_SQL} DESC, id DESC LIMIT 51;",
+     (date.today().replace(year=date.today().year - 1),) * 2, 'idx_appointments_archived_page'),
+    # O dashboard lê do rollup daily_revenue (mesmas consultas de _compute_dashboard)
+    ('dashboard: receita do mês (rollup)',
+     "SELECT SUM(revenue), SUM(appointments) FROM daily_revenue WHERE revenue_date >= %s AND revenue_date < %s;",
+     backend.month_range(date.today().year, date.today().month), 'daily_revenue_pkey'),
+    ('dashboard: últimos 30 dias (rollup)',
+     "SELECT revenue_date, SUM(revenue), SUM(appointments) FROM daily_revenue WHERE revenue_date >= %s "
+     "GROUP BY revenue_date HAVING SUM(appointments) > 0 ORDER BY revenue_date;",
+     (date.today() - timedelta(days=30),), 'daily_revenue_pkey'),
+    ('disponibilidade de um barbeiro/dia',
+     "SELECT a.barber_id, a.appointment_date, a.appointment_time FROM appointments a "
+     "WHERE a.appointment_date BETWEEN %s AND %s AND a.status <> 'Cancelado' AND a.barber_id = %s;",
+     (date.today(), date.today(), 'barber1'), 'idx_appointments_date_barber'),
+    ('sobreposição de intervalos (&&)',
+     f"SELECT 1 FROM appointments WHERE status <> 'Cancelado' "
+     f"AND {backend.APPOINTMENT_SLOT_SQL} && tsrange(%s + TIME '10:00', %s + TIME '10:45', '[)');",
+     (date.today(), date.today()), 'idx_appointments_slot'),
+    ('despesas do mês (intervalo semiaberto + totais)',
+     "SELECT id, description, amount, expense_date, SUM(amount) OVER () FROM monthly_expenses "
+     "WHERE expense_date >= %s AND expense_date < %s ORDER BY expense_date DESC, id DESC;",
+     backend.month_range(date.today().year, date.today().month), 'idx_monthly_expenses_date'),
+    ('dashboard: despesas do mês',
+     "SELECT SUM(amount) FROM monthly_expenses WHERE expense_date >= %s AND expense_date < %s;",
+     backend.month_range(date.today().year, date.today().month), 'idx_monthly_expenses_date'),
+]
+
+def plan_indexes(node):
+    """Nomes de todos os índices citados em um plano JSON do EXPLAIN."""
+    found = set()
+    if 'Index Name' in node:
+        found.add(node['Index Name'])
+    for child in node.get('Plans', []):
+        found |= plan_indexes(child)
+    return found
+
+def root_indexes(cur, names):
+    """Troca índices de partições pelo índice da tabela particionada (o nome criado na migração)."""
+    roots = set()
+    for name in names:
+        cur.execute("SELECT COALESCE(pg_partition_root(%s::regclass), %s::regclass)::text;", (name, name))
+        roots.add(cur.fetchone()[0])
+    return roots
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--rollup-years', type=int, default=10, help='anos de histórico sintético em daily_revenue')
+    args = parser.parse_args()
+
+    backend.initialize_db()
+    failures = 0
+    conn = backend.get_db_connection()
+    if conn is None:
+        sys.exit('Sem conexão com o PostgreSQL.')
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SYNTHETIC_ROWS_SQL, (args.rows,))
+            cur.execute(SYNTHETIC_EXPENSES_SQL, (args.rows // 10,))
+            cur.execute(SYNTHETIC_ROLLUP_SQL, (args.rollup_years,))
+            cur.execute("ANALYZE appointments;")
+            cur.execute("ANALYZE monthly_expenses;")
+            cur.execute("ANALYZE daily_revenue;")
+            for description, query, params, expected in HOT_QUERIES:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cur.fetchone()[0][0]['Plan']
+                used = root_indexes(cur, plan_indexes(plan))
+                ok = expected in used
+                failures += not ok
+                print(f"[{'OK' if ok else 'FALHOU'}] {description}: esperado {expected}, usados {sorted(used) or 'nenhum'}")
+                if not ok:
+                    print(json.dumps(plan, indent=2))
+    finally:
+        conn.rollback()
+        conn.close()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Pico de memória (RSS) da exportação do histórico arquivado e da exportação financeira.
+
+Insere N agendamentos arquivados sintéticos (padrão: 1 milhão), mede em processos separados
+o pico de RSS da exportação em streaming (cursor nomeado + gerador), da exportação financeira
+do mesmo período em CSV (COPY TO STDOUT) e XLSX e, para comparação, da abordagem antiga
+(fetchall + jsonify de tudo), e remove as linhas sintéticas no final.
+
+Uso:
+    python benchmarks/export_memory.py --rows 1000000
+    python benchmarks/export_memory.py --rows 1000000 --skip-materialize
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barberflow_backend as backend  # noqa: E402
+
+CLIENT_NAME = 'rss-bench'
+
+def peak_rss_mb():
+    # ru_maxrss é em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def financial_export_url(rows, fmt):
+    """Exportação financeira do período das linhas sintéticas (40 por dia a partir de 2000-01-01)."""
+    last_day = date(2000, 1, 1) + timedelta(days=rows // 40)
+    return f'/api/export/appointments?format={fmt}&from=2000-01-01&to={last_day}'
+
+def run_child(mode, rows):
+    """Executa a exportação neste processo e imprime 'linhas bytes segundos pico_mb'."""
+    app = backend.create_app()
+    client = app.test_client()
+    client.post('/api/login', json={'role': 'admin', 'adminKey': backend.ADMIN_KEY})
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    total_bytes = 0
+    lines = 0
+    if mode in ('stream', 'csv', 'xlsx'):
+        url = '/api/appointments/archived/export?format=ndjson' if mode == 'stream' else financial_export_url(rows, mode)
+        response = client.get(url, buffered=False)
+        for chunk in response.response:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            total_bytes += len(data)
+            lines += data.count(b'\n')
+        response.close()
+        if mode == 'xlsx':
+            lines = '-'   # comprimido: as linhas não são contáveis nos bytes
+    else:
+        # Como a rota fazia antes da paginação: tudo em memória e um único jsonify
+        with backend.db_connection() as conn, conn.cursor(cursor_factory=backend.psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(f"SELECT {backend.APPOINTMENT_LIST_COLUMNS} FROM appointments WHERE is_archived = TRUE "
+                        f"ORDER BY appointment_date DESC, {backend.APPOINTMENT_SORT_TIME_SQL} DESC, id DESC;")
+            rows = cur.fetchall()
+            for row in rows:
+                row['appointment_date'] = row['appointment_date'].strftime('%Y-%m-%d')
+        with app.app_context():
+            body = backend.jsonify(rows).get_data()
+        total_bytes = len(body)
+        lines = len(rows)
+    elapsed = time.perf_counter() - started
+    print(lines, total_bytes, f'{elapsed:.2f}', f'{peak_rss_mb() - baseline:.1f}', f'{peak_rss_mb():.1f}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--skip-materialize', action='store_true', help='não mede a abordagem fetchall')
+    parser.add_argument('--child', choices=['stream', 'csv', 'xlsx', 'materialize'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows)
+        return
+
+    backend.initialize_db()
+    with backend.db_connection() as conn, conn.cursor() as cur:
+        print(f'Inserindo {args.rows} agendamentos arquivados sintéticos...')
+        cur.execute("""
+            INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, start_time,
+                                      duration_minutes, client_name, service_price, status, is_archived)
+            SELECT 'barber1', 'Corte Simples', DATE '2000-01-01' + (n / 40), '09:00',
+                   TIME '09:00' + (n %% 40) * INTERVAL '15 minutes', 45, %s, 35.00, 'Concluído', TRUE
+            FROM generate_series(1, %s) AS n;
+        """, (CLIENT_NAME, args.rows))
+        conn.commit()
+
+    try:
+        modes = ['stream', 'csv', 'xlsx'] + ([] if args.skip_materialize else ['materialize'])
+        for mode in modes:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, '--rows', str(args.rows)],
+                                    check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+            lines, total_bytes, elapsed, delta_mb, peak_mb = output.split()
+            print(f'{mode:>11}: {lines} linhas, {int(total_bytes) / 1e6:.1f} MB em {elapsed}s, '
+                  f'pico de RSS {peak_mb} MB (+{delta_mb} MB durante a exportação)')
+    finally:
+        with backend.db_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM appointments WHERE client_name = %s AND is_archived = TRUE;", (CLIENT_NAME,))
+            conn.commit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""Gera uma massa de dados sintética e realista (appointments e monthly_expenses) via COPY FROM STDIN.
+
+Os agendamentos cobrem os últimos N anos e as próximas semanas, com:
+- sazonalidade por mês (dezembro cheio, janeiro/fevereiro fracos), por dia da semana (sábado é o
+  dia mais cheio, domingo fechado) e crescimento do movimento ao longo dos anos;
+- muitos barbeiros (barber1..barberN) com agendas sem sobreposição, dentro do horário de
+  funcionamento e alinhadas a SLOT_INTERVAL_MINUTES;
+- o mix de serviços da tabela services (os primeiros cadastrados são os mais pedidos), com preços
+  corrigidos pela inflação para datas antigas;
+- distribuição de status (passado: Concluído/Cancelado/falta; futuro: Agendado/Cancelado), fração
+  arquivada e clientes recorrentes.
+
+As linhas são produzidas sob demanda por um objeto "arquivo" lido pelo copy_expert, em lotes de
+--chunk-rows linhas (um COPY e um commit por lote): a memória fica constante independentemente
+do total. Antes da carga são criadas as partições mensais do período; depois, ANALYZE e o rollup
+daily_revenue é recalculado.
+
+Os dados sintéticos usam o domínio de e-mail synthetic.example.com e o sufixo '(Sintético)' nas
+despesas; --clear apaga uma carga anterior.
+
+Uso:
+    python benchmarks/generate_dataset.py --appointments 10000000 --years 3
+    python benchmarks/generate_dataset.py --clear --appointments 0
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import resource
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barberflow_backend as backend  # noqa: E402
+
+EMAIL_DOMAIN = 'synthetic.example.com'
+EXPENSE_SUFFIX = ' (Sintético)'
+FUTURE_DAYS = 30                       # agendamentos futuros até N dias à frente
+AVG_APPOINTMENTS_PER_BARBER_DAY = 9    # usado para calcular --barbers automaticamente
+ANNUAL_GROWTH = 0.10                   # o movimento cresce 10% ao ano
+ANNUAL_INFLATION = 0.05                # preços 5% menores a cada ano para trás
+
+MONTH_WEIGHTS = {1: 0.80, 2: 0.85, 3: 0.95, 4: 0.95, 5: 1.00, 6: 1.00,
+                 7: 1.05, 8: 0.95, 9: 0.95, 10: 1.00, 11: 1.10, 12: 1.35}
+WEEKDAY_WEIGHTS = (0.60, 0.85, 0.90, 1.00, 1.30, 1.50, 0.0)   # segunda..domingo (fechado)
+
+# Status por período: (status, probabilidade acumulada)
+PAST_STATUSES = (('Concluído', 0.82), ('Cancelado', 0.94), ('Agendado', 1.0))   # 'Agendado' no passado = falta
+FUTURE_STATUSES = (('Agendado', 0.93), ('Cancelado', 1.0))
+
+FIRST_NAMES = ('Ana', 'Bruno', 'Carlos', 'Daniel', 'Eduardo', 'Felipe', 'Gabriel', 'Gustavo', 'Henrique', 'Igor',
+               'João', 'José', 'Lucas', 'Marcos', 'Mateus', 'Miguel', 'Paulo', 'Pedro', 'Rafael', 'Ricardo',
+               'Rodrigo', 'Samuel', 'Thiago', 'Vinícius', 'Victor', 'Leonardo', 'André', 'Diego', 'Fábio', 'Renato')
+LAST_NAMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa')
+
+# Despesas mensais recorrentes: (descrição, valor base no mês atual, variação relativa)
+RECURRING_EXPENSES = (('Aluguel', 1200.00, 0.0), ('Energia', 200.00, 0.25), ('Água', 80.00, 0.20),
+                      ('Internet', 120.00, 0.0), ('Produtos', 450.00, 0.30))
+OCCASIONAL_EXPENSES = (('Manutenção de equipamentos', 300.00, 0.25), ('Marketing', 250.00, 0.5))   # probabilidade por mês
+
+APPOINTMENT_COLUMNS = ('barber_id', 'service_name', 'appointment_date', 'appointment_time', 'start_time',
+                       'duration_minutes', 'client_name', 'client_phone', 'client_email', 'service_price',
+                       'status', 'created_at', 'is_archived')
+EXPENSE_COLUMNS = ('description', 'amount', 'expense_date')
+
+# Formato texto do COPY: barra invertida, tab e quebras de linha precisam de escape
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+class CopyStream:
+    """Objeto "arquivo" para cursor.copy_expert: gera as linhas sob demanda a cada read()."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.pending = b''
+
+    def read(self, size=-1):
+        parts, length = [self.pending], len(self.pending)
+        while size < 0 or length < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            data = line.encode('utf-8')
+            parts.append(data)
+            length += len(data)
+        data = b''.join(parts)
+        if size < 0:
+            self.pending = b''
+            return data
+        self.pending = data[size:]
+        return data[:size]
+
+def copy_line(values):
+    return '\t'.join(str(value).translate(COPY_ESCAPES) for value in values) + '\n'
+
+def minutes(hhmm):
+    hours, mins = hhmm.split(':')
+    return int(hours) * 60 + int(mins)
+
+def make_clients(rng, count):
+    clients = []
+    for n in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        clients.append((f'{first} {last}',
+                        f'11 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}',
+                        f'{first.lower()}.{last.lower()}.{n}@{EMAIL_DOMAIN}'))
+    return clients
+
+def day_weight(day, start):
+    return (MONTH_WEIGHTS[day.month] * WEEKDAY_WEIGHTS[day.weekday()]
+            * (1 + ANNUAL_GROWTH) ** ((day - start).days / 365))
+
+def pick_status(rng, table):
+    r = rng.random()
+    for status, cumulative in table:
+        if r < cumulative:
+            return status
+    return table[-1][0]
+
+def barber_day(rng, count, services, service_weights, open_minutes):
+    """Agenda sem sobreposição de um barbeiro num dia: [(minuto de início, serviço)]."""
+    chosen = rng.choices(services, service_weights, k=count)
+    while chosen and sum(service['duration'] for service in chosen) > open_minutes:
+        chosen.pop()
+    free_slots = (open_minutes - sum(service['duration'] for service in chosen)) // backend.SLOT_INTERVAL_MINUTES
+    # Sobra do dia repartida em intervalos aleatórios entre os atendimentos
+    cuts = sorted(rng.randint(0, free_slots) for _ in chosen)
+    schedule, offset, previous_cut = [], 0, 0
+    for cut, service in zip(cuts, chosen):
+        offset += (cut - previous_cut) * backend.SLOT_INTERVAL_MINUTES
+        previous_cut = cut
+        schedule.append((offset, service))
+        offset += service['duration']
+    return schedule
+
+def appointment_lines(args, rng, services, clients, start, end, today):
+    """Gera as linhas (formato texto do COPY) de todos os agendamentos, dia a dia."""
+    service_weights = [1 / rank for rank in range(1, len(services) + 1)]   # Zipf: os primeiros são mais pedidos
+    opening = minutes(backend.OPENING_TIME)
+    open_minutes = minutes(backend.CLOSING_TIME) - opening
+    archive_before = today - timedelta(days=backend.AUTO_ARCHIVE_AFTER_DAYS)
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    weights = [day_weight(day, start) for day in days]
+    scale = args.appointments / sum(weights)
+    barbers = [f'barber{n}' for n in range(1, args.barbers + 1)]
+    # Clientes recorrentes: índices baixos aparecem muito mais (distribuição exponencial)
+    client_scale = len(clients) / 5
+    # Partes fixas das linhas escapadas uma única vez (o laço abaixo roda milhões de vezes)
+    client_fields = ['\t'.join(field.translate(COPY_ESCAPES) for field in client) for client in clients]
+    service_names = {service['name']: service['name'].translate(COPY_ESCAPES) for service in services}
+
+    for day, weight in zip(days, weights):
+        expected = weight * scale
+        count = int(expected) + (rng.random() < expected - int(expected))
+        if not count:
+            continue
+        years_back = (today - day).days / 365
+        price_factor = (1 + ANNUAL_INFLATION) ** -max(years_back, 0)
+        prices = {service['name']: f"{float(service['price']) * price_factor:.2f}" for service in services}
+        statuses = PAST_STATUSES if day < today else FUTURE_STATUSES
+        archivable = day < archive_before
+        day_text = day.isoformat()
+        lead_dates = [(day - timedelta(days=lead)).isoformat() for lead in range(61)]   # antecedência -> data
+        per_barber, remainder = divmod(count, len(barbers))
+        lucky = set(rng.sample(range(len(barbers)), remainder))
+        for index, barber in enumerate(barbers):
+            for offset, service in barber_day(rng, per_barber + (index in lucky), services, service_weights, open_minutes):
+                start_minutes = opening + offset
+                start_text = f'{start_minutes // 60:02d}:{start_minutes % 60:02d}'
+                status = pick_status(rng, statuses)
+                archived = archivable and status != 'Agendado' and rng.random() < args.archived_fraction
+                client = client_fields[min(int(rng.expovariate(1 / client_scale)), len(clients) - 1)]
+                # Criado alguns dias antes (média de 4), em horário comercial
+                created_minutes = rng.randint(8 * 60, 21 * 60)
+                created_at = (f'{lead_dates[min(int(rng.expovariate(0.25)) + 1, 60)]} '
+                              f'{created_minutes // 60:02d}:{created_minutes % 60:02d}:00')
+                yield (f"{barber}\t{service_names[service['name']]}\t{day_text}\t{start_text}\t{start_text}:00\t"
+                       f"{service['duration']}\t{client}\t{prices[service['name']]}\t{status}\t{created_at}\t"
+                       f"{'t' if archived else 'f'}\n")
+
+def expense_lines(rng, start, today):
+    month = start.replace(day=1)
+    while month <= today:
+        years_back = (today - month).days / 365
+        factor = (1 + ANNUAL_INFLATION) ** -years_back
+        items = [(description, base, spread) for description, base, spread in RECURRING_EXPENSES]
+        items += [(description, base, 0.3) for description, base, probability in OCCASIONAL_EXPENSES
+                  if rng.random() < probability]
+        for description, base, spread in items:
+            amount = base * factor * (1 + rng.uniform(-spread, spread))
+            if description == 'Energia' and month.month in (12, 1, 2):
+                amount *= 1.3   # verão: ar-condicionado
+            expense_date = month + timedelta(days=rng.randint(0, 27))
+            if expense_date <= today:
+                yield copy_line((description + EXPENSE_SUFFIX, f'{amount:.2f}', expense_date.isoformat()))
+        month = backend._add_months(month, 1)
+
+def copy_in_chunks(conn, table, columns, lines, chunk_rows):
+    """Carrega `lines` com um COPY FROM STDIN por lote de chunk_rows linhas (commit a cada lote)."""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    total, started = 0, time.perf_counter()
+    while True:
+        chunk = itertools.islice(lines, chunk_rows)
+        with conn.cursor() as cur:
+            cur.copy_expert(sql, CopyStream(chunk), size=1 << 16)
+            loaded = cur.rowcount
+        conn.commit()
+        total += loaded
+        if loaded:
+            elapsed = time.perf_counter() - started
+            print(f"  {table}: {total:,} linhas ({total / elapsed:,.0f} linhas/s, "
+                  f"RSS máx {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MiB)")
+        if loaded < chunk_rows:
+            return total
+
+def clear_synthetic(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM appointments WHERE client_email LIKE %s;", ('%@' + EMAIL_DOMAIN,))
+        appointments = cur.rowcount
+        cur.execute("DELETE FROM monthly_expenses WHERE description LIKE %s;", ('%' + EXPENSE_SUFFIX,))
+        expenses = cur.rowcount
+    conn.commit()
+    print(f"Carga anterior apagada: {appointments:,} agendamentos e {expenses:,} despesas.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--appointments', type=int, default=1_000_000, help='total aproximado de agendamentos')
+    parser.add_argument('--years', type=float, default=3, help='anos de histórico')
+    parser.add_argument('--barbers', type=int, default=None,
+                        help=f'quantidade de barbeiros (padrão: o suficiente para ~{AVG_APPOINTMENTS_PER_BARBER_DAY} atendimentos/dia cada)')
+    parser.add_argument('--clients', type=int, default=None, help='clientes distintos (padrão: agendamentos / 20)')
+    parser.add_argument('--archived-fraction', type=float, default=0.9,
+                        help='fração dos Concluído/Cancelado antigos que estão arquivados')
+    parser.add_argument('--chunk-rows', type=int, default=100_000, help='linhas por COPY/commit')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--clear', action='store_true', help='apaga uma carga sintética anterior antes')
+    args = parser.parse_args()
+
+    if not backend.initialize_db():
+        sys.exit('Não foi possível preparar o banco de dados.')
+    conn = backend.get_db_connection()
+    if conn is None:
+        sys.exit('Sem conexão com o PostgreSQL.')
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    start = today - timedelta(days=round(args.years * 365))
+    end = today + timedelta(days=FUTURE_DAYS)
+    if args.barbers is None:
+        open_days = sum(1 for n in range((end - start).days + 1) if WEEKDAY_WEIGHTS[(start + timedelta(days=n)).weekday()])
+        args.barbers = max(len(backend.BARBERS), math.ceil(args.appointments / open_days / AVG_APPOINTMENTS_PER_BARBER_DAY))
+    if args.clients is None:
+        args.clients = max(100, args.appointments // 20)
+
+    try:
+        if args.clear:
+            clear_synthetic(conn)
+        with conn.cursor(cursor_factory=backend.psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("SELECT name, price, duration FROM services ORDER BY id;")
+            services = cur.fetchall()
+        if not services:
+            sys.exit('Nenhum serviço cadastrado em services.')
+
+        created = backend.create_appointment_partitions(conn, start, end)
+        conn.commit()
+        print(f"{len(created)} partições mensais criadas ({start:%Y-%m} a {end:%Y-%m}).")
+        print(f"Gerando ~{args.appointments:,} agendamentos: {args.barbers} barbeiros, {args.clients:,} clientes, "
+              f"{len(services)} serviços, {start} a {end}.")
+
+        started = time.perf_counter()
+        if args.appointments:
+            clients = make_clients(rng, args.clients)
+            lines = appointment_lines(args, rng, services, clients, start, end, today)
+            copy_in_chunks(conn, 'appointments', APPOINTMENT_COLUMNS, lines, args.chunk_rows)
+            copy_in_chunks(conn, 'monthly_expenses', EXPENSE_COLUMNS, expense_lines(rng, start, today), args.chunk_rows)
+        loaded_at = time.perf_counter()
+
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE appointments;")
+            cur.execute("ANALYZE monthly_expenses;")
+        conn.autocommit = False
+        rows = backend.rebuild_daily_revenue(conn)
+        backend.bump_cache_version(conn, 'dashboard')
+        conn.commit()
+        print(f"Carga em {loaded_at - started:.1f}s; ANALYZE e daily_revenue ({rows:,} linhas) em "
+              f"{time.perf_counter() - loaded_at:.1f}s.")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Requisições/s da página inicial: render_template_string por requisição x página pré-renderizada.
+
+Registra uma rota temporária com o comportamento antigo (render_template_string(HTML_TEMPLATE) a
+cada acesso) e compara com a rota '/' atual, que serve bytes prontos (com gzip/brotli conforme o
+Accept-Encoding). Também mede o caso de revalidação (If-None-Match -> 304). Usa o test client do
+Flask, então mede apenas o custo do processo Python (sem rede).
+
+Uso:
+    python benchmarks/index_page.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template_string  # noqa: E402
+
+import barberflow_backend as backend  # noqa: E402
+
+def render_per_request():
+    return render_template_string(backend.HTML_TEMPLATE)
+
+app = backend.create_app()
+app.add_url_rule('/__bench/render-per-request', 'bench_render_per_request', render_per_request)
+
+def measure(client, path, total, headers):
+    """Executa `total` GETs e retorna (req/s, bytes do último corpo, status do último)."""
+    response = client.get(path, headers=headers)
+    started = time.perf_counter()
+    for _ in range(total):
+        response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - started
+    return total / elapsed, len(response.data), response.status_code
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='requisições por cenário')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    scenarios = [
+        ('antes: render_template_string', '/__bench/render-per-request', {}),
+        ('depois: pré-renderizada (identity)', '/', {}),
+        ('depois: pré-renderizada (gzip)', '/', {'Accept-Encoding': 'gzip'}),
+        ('depois: pré-renderizada (br)', '/', {'Accept-Encoding': 'gzip, br'}),
+        ('depois: revalidação (304)', '/', {'Accept-Encoding': 'gzip', 'If-None-Match': etag}),
+    ]
+    if 'br' not in backend.get_index_page().variants:
+        print("Aviso: módulo brotli não instalado; o cenário 'br' cai para gzip.")
+
+    print(f"{'cenário':<40} {'req/s':>10} {'bytes':>8} {'status':>7}")
+    for label, path, headers in scenarios:
+        rps, size, status = measure(client, path, args.requests, headers)
+        print(f"{label:<40} {rps:>10.0f} {size:>8} {status:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""Teste de carga com tráfego misto contra um PostgreSQL local, com resultados em JSON.
+
+Para cada modo de servidor, aplica as migrações (initialize_db), sobe o app num subprocesso e
+dispara, a partir de N threads cliente (conexões keep-alive), uma mistura de cenários realistas:
+
+- booking: fluxo do cliente (página inicial, catálogo de serviços, disponibilidade de um barbeiro
+  num dia e reserva de um horário livre);
+- admin: polling do painel (lista de agendamentos, dashboard com If-None-Match e despesas);
+- status: o admin conclui ou cancela um dos agendamentos criados pelo próprio teste.
+
+Mede vazão e latências p50/p95/p99 por endpoint (método + rota) após um aquecimento, imprime a
+tabela e grava um JSON (com o commit do git) em benchmarks/results/, para comparar execuções de
+commits diferentes com --compare. No final, apaga os agendamentos criados e recalcula o rollup
+de receita (use --keep-data para mantê-los).
+
+Modos de servidor:
+- dev: servidor de desenvolvimento do Flask (um processo);
+- gthread: gunicorn -c gunicorn.conf.py com GUNICORN_WORKER_CLASS=gthread;
+- gevent: idem com gevent (exige 'pip install gevent psycogreen').
+
+Uso:
+    python benchmarks/load_test.py --modes gthread --duration 30 --concurrency 16
+    python benchmarks/load_test.py --mix booking=1,admin=0,status=0 --output /tmp/booking.json
+    python benchmarks/load_test.py --compare benchmarks/results/<execução anterior>.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import barberflow_backend as backend  # noqa: E402
+
+HOST = '127.0.0.1'
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+BOOKING_DAYS = 60              # reservas espalhadas pelos próximos N dias (evita lotar a agenda)
+CLIENT_NAME_PREFIX = 'load-test-'
+
+# --- SERVIDOR ---
+
+def server_command(mode, port, workers):
+    if mode == 'dev':
+        code = (f"import barberflow_backend as b; "
+                f"b.create_app().run(host='{HOST}', port={port}, debug=True, use_reloader=False)")
+        return [sys.executable, '-c', code], {}
+    env = {'PORT': str(port), 'GUNICORN_WORKER_CLASS': mode}
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'{HOST}:{port}',
+            '--access-logfile', '/dev/null', 'barberflow_backend:create_app()'], env
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'servidor não respondeu na porta {port}')
+
+# --- CLIENTE HTTP ---
+
+class Client:
+    """Conexão keep-alive de uma thread, com os cookies de sessão do cliente e do admin."""
+
+    def __init__(self, port, recorder):
+        self.port = port
+        self.recorder = recorder
+        self.conn = http.client.HTTPConnection(HOST, port, timeout=30)
+        self.cookies = {}
+        self.dashboard_etag = None
+
+    def login(self, role):
+        body = {'role': role, 'adminKey': backend.ADMIN_KEY if role == 'admin' else None}
+        _, headers, _ = self.request('POST', '/api/login', None, body, record=False)
+        self.cookies[role] = headers.get('Set-Cookie', '').split(';', 1)[0]
+
+    def request(self, method, path, endpoint, body=None, role=None, headers=None, record=True):
+        """Executa a requisição e registra (endpoint, status, ms). Retorna (status, headers, json|None)."""
+        headers = dict(headers or {}, **{'Accept-Encoding': 'gzip'})
+        if role:
+            headers['Cookie'] = self.cookies[role]
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        # Como um navegador, tenta de novo uma vez se a conexão keep-alive foi fechada pelo servidor
+        # (ex.: worker reciclado pelo max_requests do gunicorn)
+        for attempt in (1, 2):
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                raw = response.read()
+                status, response_headers = response.status, dict(response.getheaders())
+                break
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = http.client.HTTPConnection(HOST, self.port, timeout=30)
+                status, response_headers, raw = 0, {}, b''
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if record:
+            self.recorder(endpoint or f'{method} {path}', status, elapsed_ms)
+        data = None
+        if raw and response_headers.get('Content-Type', '').startswith('application/json'):
+            data = json.loads(raw)
+        return status, response_headers, data
+
+# --- CENÁRIOS ---
+
+class SharedState:
+    """Estado compartilhado entre as threads: contador de reservas e ids criados pelo teste."""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.lock = threading.Lock()
+        self.bookings = 0
+        self.booked_ids = []
+
+    def next_client_name(self):
+        with self.lock:
+            self.bookings += 1
+            return f'{CLIENT_NAME_PREFIX}{self.run_id}-{self.bookings}'
+
+    def add_booking(self, appointment_id):
+        with self.lock:
+            self.booked_ids.append(appointment_id)
+
+    def take_booking(self, rng):
+        with self.lock:
+            if not self.booked_ids:
+                return None
+            return self.booked_ids.pop(rng.randrange(len(self.booked_ids)))
+
+def scenario_booking(client, rng, state):
+    """Cliente: abre a página, escolhe serviço, consulta a disponibilidade e reserva um horário livre."""
+    client.request('GET', '/', 'GET /', role='client')
+    _, _, services = client.request('GET', '/api/services', 'GET /api/services', role='client')
+    if not services:
+        return
+    service = rng.choice(services)
+    barber = rng.choice(backend.BARBERS)
+    day = (date.today() + timedelta(days=rng.randint(1, BOOKING_DAYS))).isoformat()
+    _, _, availability = client.request(
+        'GET', f"/api/availability?barberId={barber}&serviceId={service['id']}&date={day}",
+        'GET /api/availability', role='client')
+    if not availability or not availability.get('slots'):
+        return
+    status, _, created = client.request('POST', '/api/appointments', 'POST /api/appointments', body={
+        'barberId': barber,
+        'serviceName': service['name'],
+        'date': day,
+        'time': rng.choice(availability['slots']),
+        'clientName': state.next_client_name(),
+        'clientPhone': '11999990000',
+        'clientEmail': 'load-test@example.com',
+        'servicePrice': float(service['price']),
+    }, role='client')
+    if status == 201:
+        state.add_booking(created['id'])
+
+def scenario_admin(client, rng, state):
+    """Admin: polling da lista de agendamentos, do dashboard (revalidando pelo ETag) e das despesas."""
+    client.request('GET', '/api/appointments?limit=50', 'GET /api/appointments', role='admin')
+    headers = {'If-None-Match': client.dashboard_etag} if client.dashboard_etag else None
+    _, response_headers, _ = client.request('GET', '/api/dashboard', 'GET /api/dashboard', role='admin',
+                                            headers=headers)
+    client.dashboard_etag = response_headers.get('ETag', client.dashboard_etag)
+    client.request('GET', '/api/expenses', 'GET /api/expenses', role='admin')
+
+def scenario_status(client, rng, state):
+    """Admin: conclui ou cancela um agendamento criado pelo teste."""
+    appointment_id = state.take_booking(rng)
+    if appointment_id is None:
+        return
+    client.request('PUT', f'/api/appointments/{appointment_id}/status', 'PUT /api/appointments/<id>/status',
+                   body={'status': rng.choice(['Concluído', 'Concluído', 'Cancelado'])}, role='admin')
+
+SCENARIOS = {
+    'booking': scenario_booking,
+    'admin': scenario_admin,
+    'status': scenario_status,
+}
+
+# --- EXECUÇÃO E RELATÓRIO ---
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summarize(samples, duration):
+    latencies = sorted(ms for _, ms in samples)
+    statuses = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(samples),
+        'throughput': round(len(samples) / duration, 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'max_ms': round(latencies[-1], 2),
+        # Erros: falha de conexão (status 0) ou 5xx. 409 na reserva é concorrência esperada
+        'errors': sum(count for status, count in statuses.items() if status == '0' or status.startswith('5')),
+        'statuses': statuses,
+    }
+
+def worker(port, seed, mix, state, warmup_until, stop_at, samples):
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    collected = []
+
+    def record(endpoint, status, ms):
+        if time.monotonic() >= warmup_until:
+            collected.append((endpoint, status, ms))
+
+    client = Client(port, record)
+    client.login('client')
+    client.login('admin')
+    while time.monotonic() < stop_at:
+        SCENARIOS[rng.choices(names, weights)[0]](client, rng, state)
+    client.conn.close()
+    samples.extend(collected)
+
+def run_mode(mode, args, run_id):
+    port = free_port()
+    command, extra_env = server_command(mode, port, args.workers)
+    server = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **extra_env},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    state = SharedState(f'{run_id}-{mode}')
+    samples = []
+    try:
+        wait_for_port(port)
+        warmup_until = time.monotonic() + args.warmup
+        stop_at = warmup_until + args.duration
+        threads = [threading.Thread(target=worker,
+                                    args=(port, args.seed + n, args.mix, state, warmup_until, stop_at, samples))
+                   for n in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    if not samples:
+        raise RuntimeError(f'nenhuma requisição concluída no modo {mode}')
+    by_endpoint = {}
+    for endpoint, status, ms in samples:
+        by_endpoint.setdefault(endpoint, []).append((status, ms))
+    return {
+        'overall': summarize([(status, ms) for _, status, ms in samples], args.duration),
+        'endpoints': {endpoint: summarize(values, args.duration) for endpoint, values in sorted(by_endpoint.items())},
+        'bookings_created': state.bookings,
+    }
+
+def cleanup_test_data():
+    """Apaga os agendamentos criados pelo teste e recalcula o rollup de receita."""
+    with backend.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM appointments WHERE client_name LIKE %s;", (CLIENT_NAME_PREFIX + '%',))
+        deleted = cur.rowcount
+        backend.rebuild_daily_revenue(conn)
+        backend.bump_cache_version(conn, 'dashboard')
+        conn.commit()
+    return deleted
+
+def print_mode(mode, result):
+    overall = result['overall']
+    print(f"\n[{mode}] {overall['requests']} requisições: {overall['throughput']:.0f} req/s, "
+          f"p50={overall['p50_ms']}ms p95={overall['p95_ms']}ms p99={overall['p99_ms']}ms, erros={overall['errors']}")
+    print(f"  {'endpoint':<40} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'erros':>6}  status")
+    for endpoint, stats in result['endpoints'].items():
+        statuses = ' '.join(f'{status}:{count}' for status, count in sorted(stats['statuses'].items()))
+        print(f"  {endpoint:<40} {stats['throughput']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+              f"{stats['p99_ms']:>8.1f} {stats['errors']:>6}  {statuses}")
+
+def print_comparison(baseline, current):
+    """Variação percentual de vazão e latências em relação a uma execução anterior."""
+    print(f"\nComparação com {(baseline['meta'].get('commit') or '?')[:10]} ({baseline['meta'].get('started_at')}):")
+    for mode, result in current['modes'].items():
+        previous = baseline['modes'].get(mode)
+        if previous is None:
+            continue
+        print(f"  [{mode}]")
+        print(f"  {'endpoint':<40} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+        rows = [('(total)', result['overall'], previous['overall'])]
+        rows += [(endpoint, stats, previous['endpoints'][endpoint])
+                 for endpoint, stats in result['endpoints'].items() if endpoint in previous['endpoints']]
+        for endpoint, now, before in rows:
+            deltas = [f"{(now[key] - before[key]) / before[key] * 100:>+8.1f}%" if before[key] else f"{'-':>9}"
+                      for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms')]
+            print(f"  {endpoint:<40} {' '.join(deltas)}")
+
+def git_revision():
+    """(commit atual, se há alterações não commitadas) — ou (None, None) fora de um repositório git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"cenário desconhecido: {name} (use {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('pelo menos um cenário precisa de peso > 0')
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='gthread', help='dev, gthread e/ou gevent, separados por vírgula')
+    parser.add_argument('--duration', type=int, default=30, help='segundos medidos por modo (após o aquecimento)')
+    parser.add_argument('--warmup', type=int, default=5, help='segundos de aquecimento, fora das estatísticas')
+    parser.add_argument('--concurrency', type=int, default=16, help='threads cliente simultâneas')
+    parser.add_argument('--workers', type=int, default=None, help='workers do gunicorn (padrão: gunicorn.conf.py)')
+    parser.add_argument('--mix', type=parse_mix, default='booking=4,admin=5,status=1',
+                        help='peso de cada cenário (booking, admin, status)')
+    parser.add_argument('--seed', type=int, default=42, help='semente da escolha de cenários e horários')
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: benchmarks/results/<data>-<commit>.json)')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--keep-data', action='store_true', help='não apagar os agendamentos criados')
+    args = parser.parse_args()
+
+    if not backend.initialize_db():
+        sys.exit('Não foi possível preparar o banco de dados.')
+
+    commit, dirty = git_revision()
+    started_at = datetime.now()
+    run_id = started_at.strftime('%Y%m%d%H%M%S')
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'mix': args.mix,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'modes': {},
+    }
+    try:
+        for mode in args.modes.split(','):
+            report['modes'][mode] = run_mode(mode, args, run_id)
+            print_mode(mode, report['modes'][mode])
+    finally:
+        if not args.keep_data:
+            print(f"\n{cleanup_test_data()} agendamentos de teste apagados; daily_revenue recalculada.")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{run_id}-{(commit or 'nogit')[:10]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {os.path.relpath(output, ROOT)}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Latência das consultas quentes de appointments conforme o histórico cresce (tabela particionada).
+
+Dentro de uma única transação: cria as partições mensais dos últimos N meses (padrão 36), insere
+uma semana recente fixa de agendamentos ativos e depois faz o histórico arquivado crescer em etapas
+(por padrão até 2 milhões de linhas), rodando ANALYZE e medindo a mediana de cada consulta a cada
+etapa. Também mostra quantas partições o plano de uma consulta filtrada por um dia toca (pruning).
+No final faz ROLLBACK: nada fica no banco. Com o particionamento, as latências devem ficar
+praticamente estáveis entre as etapas.
+
+Uso:
+    python benchmarks/partition_latency.py --steps 250000,1000000,2000000 --months 36
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2.extras  # noqa: E402
+
+import barberflow_backend as backend  # noqa: E402
+
+DICT = psycopg2.extras.RealDictCursor
+
+# Semana recente: RECENT_ROWS_PER_DAY agendamentos ativos por dia nos últimos 7 dias
+RECENT_ROWS_PER_DAY = 300
+RECENT_ROWS_SQL = """
+    INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, start_time,
+                              duration_minutes, client_name, service_price, status)
+    SELECT
+        'barber' || (1 + k %% 2),
+        'Corte Simples',
+        CURRENT_DATE - d,
+        to_char(TIME '09:00' + (k %% 40) * INTERVAL '15 minutes', 'HH24:MI'),
+        TIME '09:00' + (k %% 40) * INTERVAL '15 minutes',
+        45,
+        'partition-bench-recent-' || d || '-' || k,
+        35.00,
+        (ARRAY['Agendado', 'Concluído', 'Concluído', 'Cancelado'])[1 + k %% 4]
+    FROM generate_series(0, 6) AS d, generate_series(1, %s) AS k;
+"""
+
+# Histórico arquivado espalhado entre 7 dias e N meses atrás
+HISTORY_ROWS_SQL = """
+    INSERT INTO appointments (barber_id, service_name, appointment_date, appointment_time, start_time,
+                              duration_minutes, client_name, service_price, status, is_archived)
+    SELECT
+        'barber' || (1 + n %% 2),
+        'Corte Simples',
+        CURRENT_DATE - 7 - (n %% %s),
+        to_char(TIME '09:00' + (n %% 40) * INTERVAL '15 minutes', 'HH24:MI'),
+        TIME '09:00' + (n %% 40) * INTERVAL '15 minutes',
+        45,
+        'partition-bench-' || n,
+        35.00,
+        (ARRAY['Concluído', 'Concluído', 'Concluído', 'Cancelado'])[1 + n %% 4],
+        TRUE
+    FROM generate_series(%s, %s) AS n;
+"""
+
+def hot_queries(today):
+    """(descrição, função(cur), cursor_factory) das consultas do caminho quente da aplicação."""
+    deep_cursor = (today - timedelta(days=400), backend.dt_time(10, 0), 0)
+    return [
+        ('ativos: primeira página',
+         lambda cur: backend.fetch_appointment_page(cur, False, backend.PAGE_SIZE_DEFAULT), DICT),
+        ('arquivados: primeira página',
+         lambda cur: backend.fetch_appointment_page(cur, True, backend.PAGE_SIZE_DEFAULT), DICT),
+        ('arquivados: página de 400 dias atrás',
+         lambda cur: backend.fetch_appointment_page(cur, True, backend.PAGE_SIZE_DEFAULT, deep_cursor), DICT),
+        ('disponibilidade: barbeiro/dia',
+         lambda cur: backend.load_busy_intervals(cur, today, today, 'barber1'), None),
+        ('conflito de horário (&&)',
+         lambda cur: backend.slot_is_taken(cur, 'barber1', today, '10:00', 45), None),
+    ]
+
+def median_ms(conn, query, cursor_factory, repeat):
+    timings = []
+    for _ in range(repeat):
+        with conn.cursor(cursor_factory=cursor_factory) as cur:
+            started = time.perf_counter()
+            query(cur)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def partitions_in_plan(cur, day):
+    """Quantas partições o plano de uma consulta filtrada por um dia varre."""
+    cur.execute("EXPLAIN (FORMAT JSON) SELECT * FROM appointments WHERE appointment_date = %s;", (day,))
+    relations = set()
+
+    def walk(node):
+        if 'Relation Name' in node:
+            relations.add(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+    walk(cur.fetchone()[0][0]['Plan'])
+    return len(relations)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', default='250000,1000000,2000000', help='linhas de histórico em cada etapa')
+    parser.add_argument('--months', type=int, default=36, help='meses de histórico')
+    parser.add_argument('--repeat', type=int, default=25, help='execuções por consulta')
+    args = parser.parse_args()
+    steps = [int(step) for step in args.steps.split(',')]
+
+    backend.initialize_db()
+    conn = backend.get_db_connection()
+    if conn is None:
+        sys.exit('Sem conexão com o PostgreSQL.')
+
+    today = date.today()
+    history_days = args.months * 30 - 7
+    queries = hot_queries(today)
+    try:
+        created = backend.create_appointment_partitions(conn, today - timedelta(days=args.months * 30), today)
+        print(f"{len(created)} partições criadas para {args.months} meses de histórico.")
+        with conn.cursor() as cur:
+            cur.execute(RECENT_ROWS_SQL, (RECENT_ROWS_PER_DAY,))
+        print(f"{'histórico':>10} {'part. (1 dia)':>14} " + ' '.join(f"{label[:24]:>26}" for label, _, _ in queries))
+
+        inserted = 0
+        for total in steps:
+            with conn.cursor() as cur:
+                cur.execute(HISTORY_ROWS_SQL, (history_days, inserted + 1, total))
+                cur.execute("ANALYZE appointments;")
+                scanned = partitions_in_plan(cur, today)
+            inserted = total
+            latencies = [median_ms(conn, query, factory, args.repeat) for _, query, factory in queries]
+            print(f"{total:>10} {scanned:>14} " + ' '.join(f"{ms:>23.2f} ms" for ms in latencies))
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Latência de /api/reports para um ano inteiro, por agrupamento (dia, semana e mês).
+
+Mede em processo (test client do Flask, sem rede) o tempo da rota completa, incluindo a consulta
+única com GROUPING SETS e a serialização do JSON, e o tempo de execução da consulta no PostgreSQL
+(EXPLAIN ANALYZE). Use sobre uma massa de dados realista (benchmarks/generate_dataset.py).
+
+Antes de medir, confere que a receita do relatório (período e período anterior) é igual à soma de
+service_price dos agendamentos Concluídos, arquivados ou não, lida direto de appointments; sai com
+código 1 se o rollup divergir.
+
+Uso:
+    python benchmarks/report_latency.py --year 2025 --requests 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2.extras  # noqa: E402
+
+import barberflow_backend as backend  # noqa: E402
+
+def query_execution_ms(start, end, bucket):
+    """Tempo de execução da consulta do relatório segundo o EXPLAIN ANALYZE."""
+    with backend.db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + backend.REPORT_SQL, {
+            'start': start, 'end': end, 'previous_start': backend.previous_period_start(start, end),
+            'bucket': bucket, 'fixed_expenses': backend.FIXED_EXPENSES,
+        })
+        return cur.fetchone()['QUERY PLAN'][0]['Execution Time']
+
+def completed_revenue(start, end):
+    """Receita e quantidade de Concluídos em [start, end) direto de appointments, sem o rollup."""
+    with backend.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT COALESCE(SUM(service_price), 0), COUNT(*) FROM appointments
+            WHERE status = %s AND appointment_date >= %s AND appointment_date < %s;
+        """, (backend.REVENUE_STATUS, start, end))
+        revenue, count = cur.fetchone()
+        return float(revenue), count
+
+def check_report_totals(report):
+    """Compara os totais do relatório (atual e anterior) com appointments; retorna as divergências."""
+    problems = []
+    for label, period, totals in (('período', report, report['totals']),
+                                  ('período anterior', report['previousPeriod'], report['previousTotals'])):
+        start = datetime.strptime(period['from'], '%Y-%m-%d').date()
+        end = datetime.strptime(period['to'], '%Y-%m-%d').date() + timedelta(days=1)
+        revenue, count = completed_revenue(start, end)
+        if round(totals['revenue'], 2) != round(revenue, 2) or totals['appointments'] != count:
+            problems.append(f"{label} {period['from']}..{period['to']}: relatório {totals['revenue']:.2f} "
+                            f"({totals['appointments']}), appointments {revenue:.2f} ({count})")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--year', type=int, default=date.today().year - 1)
+    parser.add_argument('--requests', type=int, default=50, help='requisições por agrupamento')
+    args = parser.parse_args()
+
+    client = backend.create_app().test_client()
+    client.post('/api/login', json={'role': 'admin', 'adminKey': backend.ADMIN_KEY})
+    start, end = date(args.year, 1, 1), date(args.year + 1, 1, 1)
+
+    print(f"{'agrupamento':<12} {'p50 ms':>8} {'p95 ms':>8} {'consulta ms':>12} {'buckets':>8} {'bytes':>8}")
+    for bucket in backend.REPORT_BUCKETS:
+        url = f'/api/reports?year={args.year}&bucket={bucket}'
+        response = client.get(url)
+        if response.status_code != 200:
+            sys.exit(f'{url}: {response.status_code} {response.get_data(as_text=True)}')
+        problems = check_report_totals(response.json)
+        if problems:
+            sys.exit('Receita do relatório diverge de appointments (rode flask rebuild-revenue?):\n' + '\n'.join(problems))
+        timings = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        print(f"{bucket:<12} {statistics.median(timings):>8.1f} {p95:>8.1f} "
+              f"{query_execution_ms(start, end, bucket):>12.1f} {len(response.json['series']):>8} {len(response.data):>8}")
+
+if __name__ == '__main__':
+    main()
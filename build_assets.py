@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""Pipeline de assets do frontend do BarberFlow.
+
+Gera em static/dist/ arquivos com hash no nome (cache imutável) e grava static/manifest.json,
+lido por barberflow_backend.py na inicialização:
+
+- tailwind.css: CSS do Tailwind compilado com o CLI standalone, só com as classes usadas
+  em barberflow_backend.py (purge) e minificado;
+- chart.js: Chart.js versionado servido pelo próprio app;
+- inter.css: fonte Inter (woff2) auto-hospedada;
+- imagens: barbearia5.jpg e logo.png redimensionados, em WebP e com fallback JPEG/PNG (Pillow).
+
+Ferramentas e arquivos baixados ficam em .asset-cache/. Se uma etapa falhar (ex.: sem rede), ela
+fica fora do manifesto e a página usa a CDN correspondente para aquele asset.
+
+Os arquivos são gerados num diretório temporário e só então movidos para static/dist/; o manifesto
+é trocado por último (os.replace) e só depois os arquivos antigos são apagados. Um build
+interrompido nunca deixa o manifesto apontando para arquivos que não existem.
+
+Uso:
+    python build_assets.py [--allow-fallback]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import re
+import stat
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(STATIC_DIR, 'manifest.json')
+CACHE_DIR = os.path.join(ROOT, '.asset-cache')
+
+TAILWIND_VERSION = '3.4.17'
+CHARTJS_VERSION = '4.4.3'
+CHARTJS_URL = f'https://cdn.jsdelivr.net/npm/chart.js@{CHARTJS_VERSION}/dist/chart.umd.min.js'
+FONT_CSS_URL = 'https://fonts.googleapis.com/css2?family=Inter:wght@100..900&display=swap'
+# O Google Fonts só entrega woff2 para navegadores que ele reconhece
+FONT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+FONT_SUBSETS = ('latin', 'latin-ext')
+
+BACKGROUND_SOURCE = os.path.join(ROOT, 'barbearia5.jpg')
+BACKGROUND_WIDTHS = (768, 1280, 1920)
+LOGO_SOURCE = os.path.join(ROOT, 'logo.png')
+LOGO_SIZES = (96, 192)  # O logo é exibido com 96px (w-24); 192px cobre telas 2x
+
+_build_dir = None  # diretório temporário do build em andamento (ver main)
+
+def download(url, user_agent=None):
+    """Baixa `url` (com cache em .asset-cache/) e retorna os bytes."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached = os.path.join(CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest()[:16])
+    if os.path.exists(cached):
+        with open(cached, 'rb') as f:
+            return f.read()
+    req = urllib.request.Request(url, headers={'User-Agent': user_agent or 'barberflow-build-assets'})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        data = resp.read()
+    with open(cached, 'wb') as f:
+        f.write(data)
+    return data
+
+def emit(manifest, logical_name, data):
+    """Grava `data` como dist/<nome>.<hash>.<ext> (no diretório do build) e registra o caminho no manifesto."""
+    stem, ext = os.path.splitext(logical_name)
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+    with open(os.path.join(_build_dir, filename), 'wb') as f:
+        f.write(data)
+    manifest[logical_name] = f"dist/{filename}"
+    print(f"  {logical_name} -> dist/{filename} ({len(data) / 1024:.1f} KiB)")
+
+def tailwind_binary():
+    """Baixa (uma vez) o CLI standalone do Tailwind para esta plataforma e retorna o caminho."""
+    system = {'Linux': 'linux', 'Darwin': 'macos', 'Windows': 'windows'}[platform.system()]
+    arch = 'arm64' if platform.machine().lower() in ('arm64', 'aarch64') else 'x64'
+    name = f"tailwindcss-{system}-{arch}" + ('.exe' if system == 'windows' else '')
+    path = os.path.join(CACHE_DIR, f"{TAILWIND_VERSION}-{name}")
+    if not os.path.exists(path):
+        url = f"https://github.com/tailwindlabs/tailwindcss/releases/download/v{TAILWIND_VERSION}/{name}"
+        data = download(url)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+def build_tailwind(manifest):
+    """Compila o Tailwind varrendo as classes usadas no HTML/JS embutido no backend."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'input.css')
+        output = os.path.join(tmp, 'tailwind.css')
+        with open(source, 'w') as f:
+            f.write('@tailwind base;\n@tailwind components;\n@tailwind utilities;\n')
+        subprocess.run([tailwind_binary(), '-i', source, '-o', output, '--minify',
+                        '--content', os.path.join(ROOT, 'barberflow_backend.py')], check=True, cwd=ROOT)
+        with open(output, 'rb') as f:
+            emit(manifest, 'tailwind.css', f.read())
+
+def build_chartjs(manifest):
+    emit(manifest, 'chart.js', download(CHARTJS_URL))
+
+def build_fonts(manifest):
+    """Baixa os woff2 da Inter (subsets latinos) e gera um CSS apontando para as cópias locais."""
+    css = download(FONT_CSS_URL, user_agent=FONT_USER_AGENT).decode('utf-8')
+    # A resposta é uma sequência de "/* subset */ @font-face {...}"
+    blocks = re.findall(r'/\* ([\w-]+) \*/\s*(@font-face\s*\{.*?\})', css, re.S)
+    kept = []
+    for subset, block in blocks:
+        if subset not in FONT_SUBSETS:
+            continue
+        for url in re.findall(r'url\((https://[^)]+)\)', block):
+            font_name = f"inter-{subset}.woff2"
+            emit(manifest, font_name, download(url))
+            block = block.replace(url, f"/static/{manifest[font_name]}")
+        kept.append(block)
+    if not kept:
+        raise RuntimeError('nenhum @font-face encontrado na resposta do Google Fonts')
+    emit(manifest, 'inter.css', '\n'.join(kept).encode('utf-8'))
+
+def _encode(image, fmt, **options):
+    buf = io.BytesIO()
+    image.save(buf, fmt, **options)
+    return buf.getvalue()
+
+def build_images(manifest):
+    """Gera as variantes redimensionadas do fundo e do logo (WebP + fallback)."""
+    from PIL import Image  # Dependência apenas do build
+
+    with Image.open(BACKGROUND_SOURCE) as source:
+        background = source.convert('RGB')
+    for width in BACKGROUND_WIDTHS:
+        resized = background.resize((width, round(background.height * width / background.width)), Image.LANCZOS)
+        emit(manifest, f"background-{width}.webp", _encode(resized, 'WEBP', quality=72, method=6))
+    # Fallback para navegadores sem WebP: um único JPEG progressivo na maior largura
+    resized = background.resize((BACKGROUND_WIDTHS[-1], round(background.height * BACKGROUND_WIDTHS[-1] / background.width)), Image.LANCZOS)
+    emit(manifest, f"background-{BACKGROUND_WIDTHS[-1]}.jpg", _encode(resized, 'JPEG', quality=72, optimize=True, progressive=True))
+
+    with Image.open(LOGO_SOURCE) as source:
+        logo = source.convert('RGBA')
+    for size in LOGO_SIZES:
+        resized = logo.resize((size, round(logo.height * size / logo.width)), Image.LANCZOS)
+        emit(manifest, f"logo-{size}.webp", _encode(resized, 'WEBP', quality=85, method=6))
+    resized = logo.resize((LOGO_SIZES[-1], round(logo.height * LOGO_SIZES[-1] / logo.width)), Image.LANCZOS)
+    emit(manifest, f"logo-{LOGO_SIZES[-1]}.png", _encode(resized, 'PNG', optimize=True))
+
+STEPS = [
+    ('Tailwind CSS', build_tailwind),
+    ('Chart.js', build_chartjs),
+    ('Fonte Inter', build_fonts),
+    ('Imagens', build_images),
+]
+
+def publish(manifest):
+    """Move os arquivos do build para static/dist/, troca o manifesto e apaga os arquivos antigos."""
+    os.makedirs(DIST_DIR, exist_ok=True)
+    for filename in os.listdir(_build_dir):
+        # Nomes com hash: um arquivo de mesmo nome tem o mesmo conteúdo
+        os.replace(os.path.join(_build_dir, filename), os.path.join(DIST_DIR, filename))
+
+    fd, tmp_path = tempfile.mkstemp(dir=STATIC_DIR, prefix='.manifest-', suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+    current = {os.path.basename(path) for path in manifest.values()}
+    for filename in os.listdir(DIST_DIR):
+        if filename not in current:
+            os.remove(os.path.join(DIST_DIR, filename))
+
+def main(argv=None):
+    global _build_dir
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--allow-fallback', action='store_true',
+                        help='sai com código 0 mesmo se alguma etapa falhar (o asset fica na CDN); útil no deploy')
+    args = parser.parse_args(argv)
+
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    manifest = {}
+    failed = []
+    with tempfile.TemporaryDirectory(dir=STATIC_DIR, prefix='.dist-') as build_dir:
+        _build_dir = build_dir
+        for label, step in STEPS:
+            print(f"{label}:")
+            try:
+                step(manifest)
+            except Exception as e:
+                print(f"  Aviso: etapa '{label}' falhou ({e}); a página usará a CDN para este asset.")
+                failed.append(label)
+        publish(manifest)
+
+    print(f"Manifesto gravado em {os.path.relpath(MANIFEST_PATH, ROOT)} ({len(manifest)} assets).")
+    return 1 if failed and not args.allow_fallback else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Configuração do gunicorn para produção.
+
+    gunicorn -c gunicorn.conf.py "barberflow_backend:create_app()"
+
+Modo de worker (GUNICORN_WORKER_CLASS):
+- gthread (padrão): processos x threads. Adequado ao BarberFlow, cujas requisições passam a
+  maior parte do tempo esperando o PostgreSQL; cada processo tem seu próprio pool de conexões,
+  então o total de conexões é no máximo workers x PG_POOL_MAX (mantenha threads <= PG_POOL_MAX).
+- gevent: um processo por núcleo com centenas de greenlets (GUNICORN_WORKER_CONNECTIONS). Requer
+  'pip install gevent psycogreen'; o psycopg2 é tornado cooperativo em post_fork. Útil com muitas
+  conexões lentas/ociosas (keep-alive, streaming da exportação). Desativa o preload_app.
+
+Variáveis de ambiente: PORT, WEB_CONCURRENCY (workers), GUNICORN_THREADS, GUNICORN_WORKER_CLASS,
+GUNICORN_WORKER_CONNECTIONS, GUNICORN_TIMEOUT, GUNICORN_KEEPALIVE, GUNICORN_MAX_REQUESTS,
+PROMETHEUS_MULTIPROC_DIR.
+"""
+import glob
+import os
+import tempfile
+
+def _cpu_count():
+    # Respeita o limite de CPUs do container (affinity) quando disponível
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+CORES = _cpu_count()
+
+# Métricas do prometheus_client somadas entre os workers: cada processo grava seus valores em
+# arquivos neste diretório. Precisa existir antes de o app ser importado (preload_app).
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'barberflow-prometheus'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    workers = int(os.environ.get('WEB_CONCURRENCY', CORES))
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '200'))
+    # O monkey patch do gevent acontece no worker; módulos pré-carregados no master não seriam cooperativos
+    preload_app = False
+else:
+    # Requisições limitadas por I/O: 2 x núcleos + 1 processos, algumas threads em cada
+    workers = int(os.environ.get('WEB_CONCURRENCY', CORES * 2 + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+    # Importa o app uma vez no master (workers sobem mais rápido e compartilham memória via fork);
+    # o pool de conexões é criado de forma preguiçosa por PID, depois do fork
+    preload_app = True
+
+# Tempo máximo de uma requisição antes de o worker ser reiniciado, e tempo de encerramento gracioso
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+# Keep-alive um pouco acima do intervalo típico entre requisições do frontend
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Reciclagem gradual dos workers (limita vazamentos de memória); o jitter evita reinícios simultâneos
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+def on_starting(server):
+    # Descarta valores de execuções anteriores do servidor
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+def child_exit(server, worker):
+    # Gauges 'livesum' (requisições em andamento) deixam de contar o worker que saiu
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+def when_ready(server):
+    # Com preload_app o módulo já foi importado no master: monta a página inicial comprimida uma
+    # vez aqui para que os workers a herdem pronta no fork
+    if preload_app:
+        import barberflow_backend
+        barberflow_backend.get_index_page()